@@ -1,11 +1,17 @@
 import os
 import re
-import pandas as pd
+import time
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from dotenv import load_dotenv
-import snowflake.connector
+from snowflake_pool import SnowflakeConnectionPool
 import cortex_chat
+from query_results import pick_result_set, result_dataframe
+from result_export import ExportRegistry, export_request, export_result
+from conversation_memory import memory_from_env
+from response_cache import cache_from_env
+from sql_result_cache import SQLResultCache
+from telemetry import TELEMETRY, start_metrics_server
 
 load_dotenv()
 
@@ -15,6 +21,9 @@ SNOW_PAT = os.getenv("PAT")
 AGENT_ENDPOINT = os.getenv("AGENT_ENDPOINT")
 SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
+STREAM_ANSWER = os.getenv("STREAM_ANSWER", "false").lower() == "true"  # Escribir la respuesta en Slack mientras se genera
+PREVIEW_ROWS = int(os.getenv("PREVIEW_ROWS", "10"))  # Filas que se muestran en el mensaje
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "csv")  # csv | parquet para la descarga completa
 
 app = App(token=SLACK_BOT_TOKEN)
 
@@ -32,6 +41,12 @@ def handle_direct_messages(event, say):
         process_query(event, say)
 
 def process_query(event, say):
+    # Retraso desde que Slack generó el evento hasta que lo atendemos, y duración total
+    TELEMETRY.observe("slack_event_lag", max(0.0, time.time() - float(event.get('event_ts') or time.time())))
+    with TELEMETRY.span("slack_handler"):
+        _process_query(event, say)
+
+def _process_query(event, say):
     raw_text = event.get('text', '').strip()
     query = re.sub(r'<@\w+>', '', raw_text).strip()
     
@@ -41,12 +56,17 @@ def process_query(event, say):
 
     try:
         say("❄️ _Querying Snowflake..._")
-        response = CORTEX_APP.chat(query, role=SNOW_ROLE)
+        # Las respuestas dentro de un hilo de Slack llevan el contexto de las anteriores
+        response = CORTEX_APP.chat(query, role=SNOW_ROLE, channel_id=event.get('channel'),
+                                   thread_ts=event.get('thread_ts') or event.get('ts'),
+                                   slack_say=say if STREAM_ANSWER else None,
+                                   slack_app=app if STREAM_ANSWER else None)
         
         blocks = []
         
         # 1. Preparar el resumen de texto
-        if response.get('text'):
+        # Con STREAM_ANSWER el texto ya se fue escribiendo en Slack durante la generación
+        if response.get('text') and not STREAM_ANSWER:
             summary = format_for_slack(response['text'])
             blocks.append({
                 "type": "section",
@@ -56,14 +76,16 @@ def process_query(event, say):
         # 2. Lógica Inteligente para la Tabla
         sql_queries = response.get('sql_queries')
         if sql_queries:
-            with CONN.cursor() as cur:
-                cur.execute(sql_queries[0])
-                df = pd.DataFrame(cur.fetchall(), columns=[col[0] for col in cur.description])
+            # Reutiliza el resultado que ya devolvió el agente; solo re-ejecuta si no vino
+            # y en ese caso Snowflake corta en las filas que se muestran (LIMIT) y cuenta el total
+            limit = PREVIEW_ROWS
+            df = result_dataframe(response, POOL, sql_cache=SQL_CACHE, max_rows=limit,
+                                  row_limit=limit, count_total=True)
+            total_rows = df.attrs.get('total_rows', len(df))
             
             # Solo mostrar tabla si hay más de un dato o es una lista
             # Si el resultado es una sola celda (ej. un Total), el texto suele ser suficiente
             if not df.empty and df.size > 1:
-                limit = 10
                 table_text = df.head(limit).to_string(index=False)
                 
                 blocks.append({
@@ -71,11 +93,23 @@ def process_query(event, say):
                     "text": {"type": "mrkdwn", "text": f"```\n{table_text}\n```"}
                 })
                 
-                if len(df) > limit:
+                if total_rows > limit:
                     blocks.append({
                         "type": "context",
-                        "elements": [{"type": "mrkdwn", "text": f"_Showing first {limit} of {len(df)} rows._"}]
+                        "elements": [{"type": "mrkdwn", "text": f"_Showing first {limit} of {total_rows} rows._"}]
                     })
+                    # El resultado completo solo se genera si el usuario lo pide
+                    export = export_request(response, pick_result_set(response), SNOW_ROLE, total_rows)
+                    if export is not None:
+                        blocks.append({
+                            "type": "actions",
+                            "elements": [{
+                                "type": "button",
+                                "text": {"type": "plain_text", "text": "⬇️ Download full results"},
+                                "action_id": "download_full_results",
+                                "value": EXPORTS.register(export)
+                            }]
+                        })
 
         # 3. Sugerencias
         if response.get('suggestions'):
@@ -86,22 +120,61 @@ def process_query(event, say):
             })
 
         # Enviar un único mensaje consolidado
-        say(blocks=blocks, text="New data response")
+        if blocks:
+            with TELEMETRY.span("slack_post", kind="message"):
+                say(blocks=blocks, text="New data response")
 
     except Exception as e:
         say(f"⚠️ Error: `{str(e)}`")
 
-def get_snowflake_conn():
-    return snowflake.connector.connect(
-        user=os.getenv("SNOW_USER"),
-        password=SNOW_PAT,
-        account=os.getenv("ACCOUNT"),
-        warehouse=os.getenv("WAREHOUSE"),
-        role=SNOW_ROLE
+@app.action("download_full_results")
+def handle_download_full_results(ack, body, client):
+    ack()
+    channel = body['channel']['id']
+    thread_ts = body['message']['ts']
+    export = EXPORTS.get(body['actions'][0]['value'])
+    if export is None:
+        client.chat_postMessage(channel=channel, thread_ts=thread_ts,
+                                text="⚠️ This download has expired, please ask the question again.")
+        return
+
+    try:
+        client.chat_postMessage(channel=channel, thread_ts=thread_ts,
+                                text=f"📦 _Preparing {export.total_rows} rows as {EXPORT_FORMAT.upper()}..._")
+        path = export_result(export, POOL, fmt=EXPORT_FORMAT)
+        try:
+            client.files_upload_v2(
+                channel=channel,
+                thread_ts=thread_ts,
+                file=path,
+                filename=f"results.{EXPORT_FORMAT}"
+            )
+        finally:
+            os.remove(path)
+    except Exception as e:
+        client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=f"⚠️ Error: `{str(e)}`")
+
+def get_snowflake_pool():
+    # Pool de conexiones por (rol, warehouse) compartido por todos los handlers
+    return SnowflakeConnectionPool(
+        connect_params={
+            "user": os.getenv("SNOW_USER"),
+            "password": SNOW_PAT,
+            "account": os.getenv("ACCOUNT"),
+        },
+        default_role=SNOW_ROLE,
+        default_warehouse=os.getenv("WAREHOUSE"),
+        max_size=int(os.getenv("SNOW_POOL_SIZE", "5"))
     )
 
 if __name__ == "__main__":
-    CONN = get_snowflake_conn()
-    CORTEX_APP = cortex_chat.CortexChat(AGENT_ENDPOINT, SNOW_PAT)
+    POOL = get_snowflake_pool()
+    SQL_CACHE = SQLResultCache()
+    EXPORTS = ExportRegistry()
+    # Sin mensaje de planificación: esta app no atiende el botón "show_planning_details"
+    CORTEX_APP = cortex_chat.CortexChat(AGENT_ENDPOINT, SNOW_PAT, cache=cache_from_env(),
+                                        memory=memory_from_env(), stream_answer=STREAM_ANSWER,
+                                        show_planning=False)
+    start_metrics_server()
     handler = SocketModeHandler(app, SLACK_APP_TOKEN)
     handler.start()
\ No newline at end of file
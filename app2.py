@@ -1,19 +1,20 @@
 import os
 import re
+import time
 import pandas as pd
-import io
-
-# --- FIX PARA EL ERROR DE MATPLOTLIB ---
-import matplotlib
-matplotlib.use('Agg') # Esto debe ir ANTES de importar pyplot
-import matplotlib.pyplot as plt
-# ---------------------------------------
 
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from dotenv import load_dotenv
-import snowflake.connector
+from snowflake_pool import SnowflakeConnectionPool
 import cortex_chat
+from chart_cache import ChartCache
+from chart_renderer import ChartRenderer
+from query_results import result_dataframe
+from conversation_memory import memory_from_env
+from response_cache import cache_from_env
+from sql_result_cache import SQLResultCache
+from telemetry import TELEMETRY, start_metrics_server
 
 load_dotenv()
 
@@ -23,53 +24,41 @@ SNOW_PAT = os.getenv("PAT")
 AGENT_ENDPOINT = os.getenv("AGENT_ENDPOINT")
 SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
+STREAM_ANSWER = os.getenv("STREAM_ANSWER", "false").lower() == "true"  # Escribir la respuesta en Slack mientras se genera
+CHART_MAX_ROWS = int(os.getenv("CHART_MAX_ROWS", "10000"))  # Filas que se traen de Snowflake para graficar
 
-app = App(token=SLACK_BOT_TOKEN)
+# La App de Slack se crea en create_app(): los workers de gráficos importan este módulo
+# y no deben conectarse a Slack (App() llama a auth.test)
+app = None
 
 def format_for_slack(text: str) -> str:
     if not text: return ""
     return re.sub(r'\*\*(.*?)\*\*', r'*\1*', text)
 
 def generate_chart(df: pd.DataFrame):
-    """Genera un gráfico basado en los datos del DataFrame"""
-    try:
-        # Detectar columnas
-        num_cols = df.select_dtypes(include=['number']).columns.tolist()
-        cat_cols = df.select_dtypes(include=['object', 'datetime']).columns.tolist()
+    """Genera un gráfico basado en los datos del DataFrame (en el pool de procesos)"""
+    return CHART_RENDERER.render(df)
 
-        if not num_cols or not cat_cols:
-            return None
-
-        # Crear el gráfico
-        fig, ax = plt.subplots(figsize=(10, 6))
-        df.plot(kind='bar', x=cat_cols[0], y=num_cols[0], ax=ax, color='#29B5E8')
-        
-        ax.set_title(f"Análisis de {num_cols[0]}", fontsize=14, pad=20)
-        ax.set_ylabel(num_cols[0])
-        ax.set_xlabel(cat_cols[0])
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-
-        # Guardar en memoria
-        img_data = io.BytesIO()
-        plt.savefig(img_data, format='png')
-        plt.close(fig) # Importante cerrar la figura para liberar memoria
-        img_data.seek(0)
-        return img_data
-    except Exception as e:
-        print(f"Error generando gráfico: {e}")
-        return None
-
-@app.event("app_mention")
 def handle_app_mentions(event, say, client):
     process_query(event, say, client)
 
-@app.message(re.compile(".*"))
 def handle_direct_messages(event, say, client):
     if event.get('channel_type') == 'im':
         process_query(event, say, client)
 
+def create_app() -> App:
+    slack_app = App(token=SLACK_BOT_TOKEN)
+    slack_app.event("app_mention")(handle_app_mentions)
+    slack_app.message(re.compile(".*"))(handle_direct_messages)
+    return slack_app
+
 def process_query(event, say, client):
+    # Retraso desde que Slack generó el evento hasta que lo atendemos, y duración total
+    TELEMETRY.observe("slack_event_lag", max(0.0, time.time() - float(event.get('event_ts') or time.time())))
+    with TELEMETRY.span("slack_handler"):
+        _process_query(event, say, client)
+
+def _process_query(event, say, client):
     raw_text = event.get('text', '').strip()
     query = re.sub(r'<@\w+>', '', raw_text).strip()
     channel = event['channel']
@@ -82,11 +71,16 @@ def process_query(event, say, client):
         # Restauramos el mensaje de espera
         say("❄️ _Querying Snowflake..._")
         
-        response = CORTEX_APP.chat(query, role=SNOW_ROLE)
+        # Las respuestas dentro de un hilo de Slack llevan el contexto de las anteriores
+        response = CORTEX_APP.chat(query, role=SNOW_ROLE, channel_id=event.get('channel'),
+                                   thread_ts=event.get('thread_ts') or event.get('ts'),
+                                   slack_say=say if STREAM_ANSWER else None,
+                                   slack_app=app if STREAM_ANSWER else None)
         blocks = []
         
         # 1. Resumen de texto
-        if response.get('text'):
+        # Con STREAM_ANSWER el texto ya se fue escribiendo en Slack durante la generación
+        if response.get('text') and not STREAM_ANSWER:
             blocks.append({
                 "type": "section",
                 "text": {"type": "mrkdwn", "text": format_for_slack(response['text'])}
@@ -95,22 +89,33 @@ def process_query(event, say, client):
         # 2. Lógica de Datos y Visualización
         sql_queries = response.get('sql_queries')
         if sql_queries:
-            with CONN.cursor() as cur:
-                cur.execute(sql_queries[0])
-                df = pd.DataFrame(cur.fetchall(), columns=[col[0] for col in cur.description])
+            # Reutiliza el resultado que ya devolvió el agente; solo re-ejecuta si no vino
+            # Se trae el resultado completo hasta CHART_MAX_ROWS; el total lo informa Snowflake
+            df = result_dataframe(response, POOL, sql_cache=SQL_CACHE, max_rows=CHART_MAX_ROWS)
             
             if not df.empty:
-                chart_img = generate_chart(df)
+                # Si este mismo gráfico ya se subió al canal, se reutiliza el archivo de Slack
+                chart_key = CHART_RENDERER.chart_key(df)
+                uploaded = CHART_CACHE.get_file(chart_key, channel) if chart_key else None
+                chart_img = None if uploaded else generate_chart(df)
                 
-                if chart_img:
+                if uploaded:
+                    blocks.append({
+                        "type": "image",
+                        "slack_file": {"id": uploaded["id"]},
+                        "alt_text": "chart"
+                    })
+                elif chart_img:
                     # Si hay gráfico, lo subimos y NO ponemos la tabla de texto
-                    client.files_upload_v2(
-                        channel=channel,
-                        file=chart_img,
-                        filename="chart.png"
-                        #title="Resultados Visuales",
-                        #initial_comment="📊 Aquí tienes el gráfico basado en los datos:"
-                    )
+                    with TELEMETRY.span("slack_post", kind="file"):
+                        upload = client.files_upload_v2(
+                            channel=channel,
+                            file=chart_img,
+                            filename="chart.png"
+                            #title="Resultados Visuales",
+                            #initial_comment="📊 Aquí tienes el gráfico basado en los datos:"
+                        )
+                    CHART_CACHE.set_file(chart_key, channel, upload)
                 else:
                     # Si no hay gráfico (ej. son solo IDs), mostramos tabla simple
                     table_text = df.head(5).to_string(index=False)
@@ -119,6 +124,15 @@ def process_query(event, say, client):
                         "text": {"type": "mrkdwn", "text": f"```\n{table_text}\n```"}
                     })
 
+                # Si se adjuntó un gráfico y el resultado superaba CHART_MAX_ROWS, se avisa que es parcial
+                total_rows = df.attrs.get('total_rows', len(df))
+                if (uploaded or chart_img) and total_rows > len(df):
+                    blocks.append({
+                        "type": "context",
+                        "elements": [{"type": "mrkdwn", "text":
+                            f"_Chart built from the first {len(df):,} of {total_rows:,} rows._"}]
+                    })
+
         # 3. Sugerencias compactas
         if response.get('suggestions'):
             suggs = " | ".join([f"_{format_for_slack(s)}_" for s in response['suggestions'][:2]])
@@ -128,22 +142,38 @@ def process_query(event, say, client):
                 "elements": [{"type": "mrkdwn", "text": f"*Suggestions:* {suggs}"}]
             })
 
-        say(blocks=blocks, text="Respuesta de Loans Assistant")
+        if blocks:
+            with TELEMETRY.span("slack_post", kind="message"):
+                say(blocks=blocks, text="Respuesta de Loans Assistant")
 
     except Exception as e:
         say(f"⚠️ Error: `{str(e)}`")
 
-def get_snowflake_conn():
-    return snowflake.connector.connect(
-        user=os.getenv("SNOW_USER"),
-        password=SNOW_PAT,
-        account=os.getenv("ACCOUNT"),
-        warehouse=os.getenv("WAREHOUSE"),
-        role=SNOW_ROLE
+def get_snowflake_pool():
+    # Pool de conexiones por (rol, warehouse) compartido por todos los handlers
+    return SnowflakeConnectionPool(
+        connect_params={
+            "user": os.getenv("SNOW_USER"),
+            "password": SNOW_PAT,
+            "account": os.getenv("ACCOUNT"),
+        },
+        default_role=SNOW_ROLE,
+        default_warehouse=os.getenv("WAREHOUSE"),
+        max_size=int(os.getenv("SNOW_POOL_SIZE", "5"))
     )
 
 if __name__ == "__main__":
-    CONN = get_snowflake_conn()
-    CORTEX_APP = cortex_chat.CortexChat(AGENT_ENDPOINT, SNOW_PAT)
+    app = create_app()
+    POOL = get_snowflake_pool()
+    SQL_CACHE = SQLResultCache()
+    # Workers de matplotlib listos antes de atender el primer mensaje
+    CHART_CACHE = ChartCache(path=os.getenv("CHART_CACHE_PATH"))
+    CHART_RENDERER = ChartRenderer(workers=int(os.getenv("CHART_WORKERS", "2")), cache=CHART_CACHE)
+    CHART_RENDERER.warm()
+    # Sin mensaje de planificación: esta app no atiende el botón "show_planning_details"
+    CORTEX_APP = cortex_chat.CortexChat(AGENT_ENDPOINT, SNOW_PAT, cache=cache_from_env(),
+                                        memory=memory_from_env(), stream_answer=STREAM_ANSWER,
+                                        show_planning=False)
+    start_metrics_server()
     handler = SocketModeHandler(app, SLACK_APP_TOKEN)
     handler.start()
\ No newline at end of file
@@ -0,0 +1,173 @@
+import os
+import re
+import time
+import asyncio
+
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from dotenv import load_dotenv
+from snowflake_pool import SnowflakeConnectionPool
+from async_cortex_chat import AsyncCortexChat
+from chart_cache import ChartCache
+from chart_renderer import ChartRenderer
+from query_results import result_dataframe
+from conversation_memory import conversation_key, memory_from_env
+from response_cache import cache_from_env
+from sql_result_cache import SQLResultCache
+from telemetry import TELEMETRY, start_metrics_server
+
+load_dotenv()
+
+# Configuración
+SNOW_ROLE = os.getenv("SNOW_ROLE")
+SNOW_PAT = os.getenv("PAT")
+AGENT_ENDPOINT = os.getenv("AGENT_ENDPOINT")
+SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
+SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
+CHART_MAX_ROWS = int(os.getenv("CHART_MAX_ROWS", "10000"))  # Filas que se traen de Snowflake para graficar
+
+# Versión asíncrona: un solo proceso atiende muchas menciones simultáneas
+# sin depender del pool de threads de Bolt. La App se crea en create_app(): los
+# workers de gráficos importan este módulo y no deben conectarse a Slack.
+
+def format_for_slack(text: str) -> str:
+    if not text: return ""
+    return re.sub(r'\*\*(.*?)\*\*', r'*\1*', text)
+
+async def handle_app_mentions(event, say, client):
+    await process_query(event, say, client)
+
+async def handle_direct_messages(event, say, client):
+    if event.get('channel_type') == 'im':
+        await process_query(event, say, client)
+
+def create_app() -> AsyncApp:
+    app = AsyncApp(token=SLACK_BOT_TOKEN)
+    app.event("app_mention")(handle_app_mentions)
+    app.message(re.compile(".*"))(handle_direct_messages)
+    return app
+
+async def process_query(event, say, client):
+    # Retraso desde que Slack generó el evento hasta que lo atendemos, y duración total
+    TELEMETRY.observe("slack_event_lag", max(0.0, time.time() - float(event.get('event_ts') or time.time())))
+    with TELEMETRY.span("slack_handler"):
+        await _process_query(event, say, client)
+
+async def _process_query(event, say, client):
+    raw_text = event.get('text', '').strip()
+    query = re.sub(r'<@\w+>', '', raw_text).strip()
+    channel = event['channel']
+
+    if not query:
+        await say("👋 Hi! I'm your Loans Assistant.")
+        return
+
+    try:
+        await say("❄️ _Querying Snowflake..._")
+
+        # Las respuestas dentro de un hilo de Slack llevan el contexto de las anteriores
+        conversation = conversation_key(channel, event.get('thread_ts') or event.get('ts'), SNOW_ROLE)
+        response = await CORTEX_APP.chat(query, role=SNOW_ROLE, conversation=conversation)
+        blocks = []
+
+        # 1. Resumen de texto
+        if response.get('text'):
+            blocks.append({
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": format_for_slack(response['text'])}
+            })
+
+        # 2. Lógica de Datos y Visualización
+        # El conector de Snowflake es bloqueante (thread); los gráficos van al pool de procesos
+        sql_queries = response.get('sql_queries')
+        if sql_queries:
+            # Reutiliza el resultado que ya devolvió el agente; solo re-ejecuta si no vino
+            # Se trae el resultado completo hasta CHART_MAX_ROWS; el total lo informa Snowflake
+            df = await asyncio.to_thread(result_dataframe, response, POOL, sql_cache=SQL_CACHE,
+                                         max_rows=CHART_MAX_ROWS)
+
+            if df is not None and not df.empty:
+                # Si este mismo gráfico ya se subió al canal, se reutiliza el archivo de Slack
+                chart_key = CHART_RENDERER.chart_key(df)
+                uploaded = CHART_CACHE.get_file(chart_key, channel) if chart_key else None
+                chart_img = None if uploaded else await CHART_RENDERER.render_async(df)
+
+                if uploaded:
+                    blocks.append({
+                        "type": "image",
+                        "slack_file": {"id": uploaded["id"]},
+                        "alt_text": "chart"
+                    })
+                elif chart_img:
+                    # Si hay gráfico, lo subimos y NO ponemos la tabla de texto
+                    with TELEMETRY.span("slack_post", kind="file"):
+                        upload = await client.files_upload_v2(
+                            channel=channel,
+                            file=chart_img,
+                            filename="chart.png"
+                        )
+                    CHART_CACHE.set_file(chart_key, channel, upload)
+                else:
+                    # Si no hay gráfico (ej. son solo IDs), mostramos tabla simple
+                    table_text = df.head(5).to_string(index=False)
+                    blocks.append({
+                        "type": "section",
+                        "text": {"type": "mrkdwn", "text": f"```\n{table_text}\n```"}
+                    })
+
+                # Si se adjuntó un gráfico y el resultado superaba CHART_MAX_ROWS, se avisa que es parcial
+                total_rows = df.attrs.get('total_rows', len(df))
+                if (uploaded or chart_img) and total_rows > len(df):
+                    blocks.append({
+                        "type": "context",
+                        "elements": [{"type": "mrkdwn", "text":
+                            f"_Chart built from the first {len(df):,} of {total_rows:,} rows._"}]
+                    })
+
+        # 3. Sugerencias compactas
+        if response.get('suggestions'):
+            suggs = " | ".join([f"_{format_for_slack(s)}_" for s in response['suggestions'][:2]])
+            blocks.append({"type": "divider"})
+            blocks.append({
+                "type": "context",
+                "elements": [{"type": "mrkdwn", "text": f"*Suggestions:* {suggs}"}]
+            })
+
+        with TELEMETRY.span("slack_post", kind="message"):
+            await say(blocks=blocks, text="Respuesta de Loans Assistant")
+
+    except Exception as e:
+        await say(f"⚠️ Error: `{str(e)}`")
+
+def get_snowflake_pool():
+    # Pool de conexiones por (rol, warehouse) compartido por todos los handlers
+    return SnowflakeConnectionPool(
+        connect_params={
+            "user": os.getenv("SNOW_USER"),
+            "password": SNOW_PAT,
+            "account": os.getenv("ACCOUNT"),
+        },
+        default_role=SNOW_ROLE,
+        default_warehouse=os.getenv("WAREHOUSE"),
+        max_size=int(os.getenv("SNOW_POOL_SIZE", "5"))
+    )
+
+async def main():
+    global POOL, SQL_CACHE, CORTEX_APP, CHART_CACHE, CHART_RENDERER
+    POOL = get_snowflake_pool()
+    SQL_CACHE = SQLResultCache()
+    CHART_CACHE = ChartCache(path=os.getenv("CHART_CACHE_PATH"))
+    CHART_RENDERER = ChartRenderer(workers=int(os.getenv("CHART_WORKERS", "2")), cache=CHART_CACHE)
+    await asyncio.to_thread(CHART_RENDERER.warm)
+    CORTEX_APP = AsyncCortexChat(AGENT_ENDPOINT, SNOW_PAT, cache=cache_from_env(),
+                                 memory=memory_from_env())
+    start_metrics_server()
+    handler = AsyncSocketModeHandler(create_app(), SLACK_APP_TOKEN)
+    try:
+        await handler.start_async()
+    finally:
+        await CORTEX_APP.close()
+        CHART_RENDERER.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,6 +8,7 @@ from snowflake.core import Root
 from dotenv import load_dotenv
 from snowflake.snowpark import Session
 import cortex_chat
+from slack_format import format_text_for_slack
 
 load_dotenv()
 
@@ -133,32 +134,6 @@ def smart_truncate(text, max_length=300, suffix="..."):
     
     return truncated.strip() + suffix if truncated.strip() else text[:max_length-len(suffix)] + suffix
 
-def format_text_for_slack(text):
-    """Convert markdown formatting to Slack's mrkdwn format."""
-    if not text:
-        return text
-    
-    try:
-        # Convert **bold** to *bold* for Slack
-        import re
-        
-        # Replace **text** with *text* (bold)
-        text = re.sub(r'\*\*(.*?)\*\*', r'*\1*', text)
-        
-        # Replace __text__ with *text* (alternative bold syntax)
-        text = re.sub(r'__(.*?)__', r'*\1*', text)
-        
-        # Replace *text* with _text_ (italics) - but only single asterisks
-        # This is tricky because we don't want to mess with our bold conversion
-        # So we'll handle this carefully by looking for single asterisks not preceded/followed by another asterisk
-        text = re.sub(r'(?<!\*)\*(?!\*)([^*]+?)(?<!\*)\*(?!\*)', r'_\1_', text)
-        
-        return text
-        
-    except Exception as e:
-        print(f"❌ Error formatting text: {e}")
-        return text
-
 def format_dataframe_for_slack(df):
     """Format DataFrame for better display in Slack with proper alignment."""
     try:
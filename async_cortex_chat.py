@@ -0,0 +1,400 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+
+from conversation_memory import ConversationMemory
+from cortex_response_parser import CortexResponseParser, CortexStreamParser, StreamEvent
+from response_cache import ResponseCache, cache_key
+from single_flight import AsyncSingleFlight
+from telemetry import StreamTimer
+
+DEBUG = False  # Set to True for detailed logging
+
+REQUEST_TIMEOUT = 120  # Seconds without data before the agent call is abandoned
+
+
+class AgentHTTPError(Exception):
+    """Raised when the Cortex Agent endpoint answers with an HTTP error status."""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], text: str):
+        super().__init__(f"{status_code} error from Cortex Agent: {text[:200]}")
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+    @property
+    def transient(self) -> bool:
+        """Whether the same request may succeed later (timeouts, throttling, server errors)."""
+        return self.status_code in (408, 429) or self.status_code >= 500
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        """Seconds the server asked to wait (Retry-After header), if any."""
+        value = next((v for k, v in self.headers.items() if k.lower() == 'retry-after'), None)
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class AsyncCortexChat:
+    """
+    Native asyncio client for the Cortex Agents REST API.
+
+    A single instance owns one aiohttp session with a pooled keep-alive
+    connector, so one event loop can hold hundreds of concurrent agent streams.
+    The instance is bound to the event loop it is first used on.
+    """
+
+    def __init__(self,
+            agent_url: str,
+            pat: str,
+            limit: int = 100,
+            limit_per_host: int = 0,
+            keepalive_timeout: float = 30,
+            timeout: float = REQUEST_TIMEOUT,
+            cache: ResponseCache = None,
+            memory: ConversationMemory = None,
+            coalesce: bool = True
+        ):
+        """
+        Args:
+            agent_url: Cortex Agent endpoint URL
+            pat: Programmatic access token
+            limit: Maximum simultaneous connections across all hosts
+            limit_per_host: Maximum simultaneous connections per host (0 = no per-host cap)
+            keepalive_timeout: Seconds an idle connection is kept open for reuse
+            timeout: Seconds without data (connect or read) before giving up
+            cache: Optional answer cache keyed by (normalized question, role)
+            memory: Optional per-thread conversation memory for follow-up questions
+            coalesce: Let identical in-flight (question, role) calls share one agent request
+        """
+        self.agent_url = agent_url
+        self.pat = pat
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.cache = cache
+        self.memory = memory
+        self.inflight = AsyncSingleFlight() if coalesce else None
+        self.parser = CortexResponseParser(debug=DEBUG)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stats = {"requests": 0, "new_connections": 0, "reused_connections": 0}
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Create the pooled session lazily, inside the running event loop."""
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self._on_request_start)
+            trace_config.on_connection_create_end.append(self._on_connection_create_end)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    sock_connect=self.timeout,
+                    sock_read=self.timeout
+                ),
+                trace_configs=[trace_config]
+            )
+        return self._session
+
+    async def _on_request_start(self, session, trace_config_ctx, params):
+        self._stats["requests"] += 1
+
+    async def _on_connection_create_end(self, session, trace_config_ctx, params):
+        self._stats["new_connections"] += 1
+
+    async def _on_connection_reuseconn(self, session, trace_config_ctx, params):
+        self._stats["reused_connections"] += 1
+
+    def build_request(self,
+            query: str,
+            role: str,
+            history: Optional[List[Dict[str, Any]]] = None
+        ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Build the agent payload and headers for a question.
+
+        Args:
+            query: User question
+            role: Snowflake role sent as X-Snowflake-Role
+            history: Earlier messages of the conversation, oldest first
+
+        Returns:
+            Tuple of (payload, headers)
+        """
+        payload = {
+            "messages": list(history or []) + [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": query
+                        }
+                    ]
+                }
+            ],
+            "tool_choice": {
+                "type": "auto"
+            },
+            "stream": True  # Enable streaming as expected by the API
+        }
+
+        headers = {
+            "X-Snowflake-Authorization-Token-Type": "PROGRAMMATIC_ACCESS_TOKEN",
+            "Authorization": f"Bearer {self.pat}",
+            "X-Snowflake-Role": role,
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        return payload, headers
+
+    async def stream(self,
+            query: str,
+            role: str,
+            stream_parser: CortexStreamParser = None,
+            history: Optional[List[Dict[str, Any]]] = None
+        ) -> AsyncIterator[StreamEvent]:
+        """
+        Stream decoded agent events as they arrive.
+
+        Args:
+            query: User question
+            role: Snowflake role sent as X-Snowflake-Role
+            stream_parser: Parser that assembles the answer; pass one in to
+                           call finalize() on it once iteration ends
+            history: Earlier messages of the conversation, oldest first
+
+        Yields:
+            StreamEvent objects, ending with the [DONE] event when the agent sends one
+        """
+        stream_parser = stream_parser if stream_parser is not None else CortexStreamParser()
+        payload, headers = self.build_request(query, role, history)
+
+        if DEBUG:
+            print(f"🔍 Making request to: {self.agent_url}")
+            print(f"🔍 Payload: {json.dumps(payload, indent=2)}")
+
+        timer = StreamTimer(role=role)
+        outcome = "error"
+        try:
+            session = await self._get_session()
+            async with session.post(self.agent_url, headers=headers, data=json.dumps(payload)) as response:
+                timer.connected(response.status)
+                if response.status >= 400:
+                    raise AgentHTTPError(response.status, dict(response.headers), await response.text())
+
+                async for chunk in response.content.iter_any():
+                    for event in stream_parser.feed(chunk):
+                        if not event.done:
+                            timer.on_event(event.event, event.data)
+                        yield event
+                        if event.done:
+                            # Read the chunked terminator so the connection goes back to the pool
+                            while await response.content.readany():
+                                pass
+                            outcome = "ok"
+                            return
+                outcome = "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        finally:
+            timer.finish(outcome)
+
+    async def chat(self, query: str, role: str, conversation: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ask a question and wait for the complete answer.
+
+        Args:
+            query: User question
+            role: Snowflake role sent as X-Snowflake-Role
+            conversation: Conversation key (see conversation_memory.conversation_key);
+                          earlier turns are sent along when memory is configured
+
+        Returns: dict with keys: 'text', 'sql_queries', 'citations', 'suggestions', etc.
+        """
+        history, cached = self.lookup(query, role, conversation)
+        if cached is not None:
+            return cached
+
+        key = self.coalesce_key(query, role, history)
+        if self.inflight is not None and key is not None:
+            # Identical questions already being answered share that call
+            summary, shared = await self.inflight.do(key, lambda: self._answer(query, role))
+        else:
+            summary, shared = await self._answer(query, role, history), False
+        self.remember(query, role, conversation, history, summary, shared)
+        return summary
+
+    def lookup(self, query: str, role: str, conversation: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Earlier turns to send with a question, and its cached answer when one applies.
+
+        A cache hit is appended to the conversation right away, as a fresh answer
+        would be by remember().
+
+        Returns:
+            Tuple of (history, cached summary or None)
+        """
+        history = self.memory.history(conversation) if self.memory is not None else []
+        # Follow-ups depend on the earlier turns, so only fresh questions use the cache
+        cached = self.cache.get(query, role) if self.cache is not None and not history else None
+        if cached is not None and self.memory is not None:
+            self.memory.append(conversation, query, cached)
+        return history, cached
+
+    @staticmethod
+    def coalesce_key(query: str, role: str, history: List[Dict[str, Any]]) -> Optional[str]:
+        """Single-flight key of a question, or None when it must not share a call (follow-ups)."""
+        return None if history else cache_key(query, role)
+
+    def remember(self,
+            query: str,
+            role: str,
+            conversation: Optional[str],
+            history: List[Dict[str, Any]],
+            summary: Dict[str, Any],
+            shared: bool
+        ):
+        """Cache a freshly answered question and append the turn to the conversation."""
+        if self.cache is not None and not history and not shared:
+            self.cache.set(query, role, summary)
+        if self.memory is not None:
+            self.memory.append(conversation, query, summary)
+
+    async def _answer(self, query: str, role: str, history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Stream one agent call to completion and summarize it; errors become error summaries."""
+        stream_parser = CortexStreamParser()
+        try:
+            async for _ in self.stream(query, role, stream_parser, history):
+                pass
+            return self.parser.extract_summary(stream_parser.finalize())
+        except Exception as e:
+            return self.error_summary(e)
+
+    def error_summary(self, error: Exception) -> Dict[str, Any]:
+        """Error summary for an exception raised while answering a question."""
+        if isinstance(error, asyncio.TimeoutError):
+            return self._error_summary(f"Request took longer than {self.timeout} seconds", transient=True)
+        if isinstance(error, AgentHTTPError):
+            print(f"🔍 Response status code: {error.status_code}")
+            print(f"🔍 Response body: {error.text}")
+            return self._error_summary(f"Request error: {error}", transient=error.transient,
+                                       status_code=error.status_code, retry_after=error.retry_after)
+        if isinstance(error, aiohttp.ClientError):
+            return self._error_summary(f"Request error: {error}", transient=True)
+        print(f"🔍 General exception caught: {type(error).__name__}: {error}")
+        return self._error_summary(f"Unexpected error: {error}")
+
+    def _error_summary(self,
+            error_msg: str,
+            transient: bool = False,
+            status_code: Optional[int] = None,
+            retry_after: Optional[float] = None
+        ) -> Dict[str, Any]:
+        """
+        Error result in the same shape as a successful summary.
+
+        Args:
+            error_msg: Message shown to the user
+            transient: Whether retrying the same question may succeed
+            status_code: HTTP status of the agent's answer, when it sent one
+            retry_after: Seconds the agent asked to wait before retrying
+        """
+        if DEBUG:
+            print(f"\n{error_msg}")
+        return {"text": f"Error: {error_msg}", "sql_queries": [], "citations": [], "error": True,
+                "transient": transient, "status_code": status_code, "retry_after": retry_after}
+
+    def transport_stats(self) -> Dict[str, int]:
+        """Connection reuse counters: 'requests', 'new_connections' and 'reused_connections'."""
+        return dict(self._stats)
+
+    async def close(self):
+        """Close the pooled session and its connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class BackgroundLoop:
+    """
+    Event loop running on a daemon thread, used by synchronous callers to
+    drive AsyncCortexChat from any number of worker threads.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="cortex-async-loop", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def default(cls) -> "BackgroundLoop":
+        """Process-wide shared loop, started on first use."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def run(self, coro, timeout: float = None):
+        """Run a coroutine on the loop and block until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def iterate(self, async_iterator: AsyncIterator) -> Iterator:
+        """
+        Consume an async iterator from a synchronous thread.
+
+        Items are handed over through a queue as the loop produces them.
+        Closing the returned iterator early cancels the producer.
+        """
+        items = queue.Queue()
+        finished = object()
+
+        async def pump():
+            error = None
+            try:
+                async for item in async_iterator:
+                    items.put((item, None))
+            except Exception as e:
+                error = e
+            except BaseException as e:
+                # Cancelled on the loop side: wake the consumer, then let the task end cancelled
+                error = e
+                raise
+            finally:
+                items.put((finished, error))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                item, error = items.get()
+                if item is finished:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            future.cancel()
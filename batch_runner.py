@@ -0,0 +1,309 @@
+"""
+Bulk question runner.
+
+Reads questions from a JSONL file (one {"id", "question", "role"} object per
+line), sends them to the Cortex Agent concurrently under a concurrency limit
+and a rate limit, and appends one JSONL result per question (text, SQL,
+citations, timings) as soon as it finishes. The output file doubles as the
+checkpoint: re-running with the same output skips questions already answered,
+so an interrupted run resumes where it stopped.
+
+Usage:
+    python batch_runner.py questions.jsonl -o results.jsonl --concurrency 8 --rate 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+from dotenv import load_dotenv
+
+import fast_json
+from async_cortex_chat import AsyncCortexChat
+
+QUESTION_FIELDS = ("question", "query", "text", "body")
+ID_FIELDS = ("id", "request_id")
+
+
+@dataclass
+class BatchQuestion:
+    id: str
+    question: str
+    role: str
+    extra: Dict[str, Any] = field(default_factory=dict)  # Other input fields, copied to the result
+
+
+def load_questions(path: str, default_role: Optional[str] = None,
+                   question_field: Optional[str] = None) -> Iterator[BatchQuestion]:
+    """
+    Read questions from a JSONL file.
+
+    Args:
+        path: Input file; blank lines are ignored, malformed ones are logged and skipped
+        default_role: Role for lines without a "role" field
+        question_field: Field holding the question (default: first of question/query/text/body)
+
+    Yields:
+        BatchQuestion objects; ids default to the line number
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = fast_json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ Line {line_number}: invalid JSON, skipped")
+                continue
+            if not isinstance(record, dict):
+                print(f"⚠️ Line {line_number}: not a JSON object, skipped")
+                continue
+            fields = (question_field,) if question_field else QUESTION_FIELDS
+            question = next((record[name] for name in fields if record.get(name)), None)
+            role = record.get("role") or default_role
+            if not question or not role:
+                print(f"⚠️ Line {line_number}: missing question or role, skipped")
+                continue
+            question_id = next((str(record[name]) for name in ID_FIELDS if record.get(name)), str(line_number))
+            extra = {key: value for key, value in record.items()
+                     if key not in ID_FIELDS and key not in fields and key != "role"}
+            yield BatchQuestion(id=question_id, question=question, role=role, extra=extra)
+
+
+def completed_ids(output_path: str, retry_errors: bool = True) -> Set[str]:
+    """
+    Ids already answered in an output file (the checkpoint).
+
+    A line cut short by an interruption, or one that is not a JSON object, is
+    ignored; with retry_errors, failed questions are not counted as done and
+    run again.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = fast_json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            if retry_errors and record.get("error"):
+                continue
+            done.add(record.get("id"))
+    return done
+
+
+class RateLimiter:
+    """Spaces call starts at most `rate` per second (no limit when rate is falsy)."""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class BatchRunner:
+    """Runs a batch of questions through AsyncCortexChat and streams results to JSONL."""
+
+    def __init__(self,
+            client: AsyncCortexChat,
+            concurrency: int = 4,
+            rate: Optional[float] = None,
+            retries: int = 2,
+            retry_backoff: float = 2.0
+        ):
+        """
+        Args:
+            client: Agent client (its pooled session is shared by all calls)
+            concurrency: Questions in flight at once
+            rate: Maximum question starts per second (None = unlimited)
+            retries: Extra attempts for a question that failed with a transient error
+                     (timeout, connection error, 429 or 5xx)
+            retry_backoff: Seconds before the first retry, doubled on each attempt;
+                           a Retry-After sent by the agent takes precedence
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.stats = {"done": 0, "errors": 0, "skipped": 0, "retries": 0}
+
+    async def ask(self, item: BatchQuestion) -> Dict[str, Any]:
+        """Answer one question (retrying transient errors) and build its result record."""
+        started_at = time.time()
+        started = time.perf_counter()
+        summary = {}
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                delay = summary.get("retry_after")
+                await asyncio.sleep(delay if delay is not None else self.retry_backoff * 2 ** (attempt - 1))
+            await self.rate_limiter.wait()
+            summary = await self.client.chat(item.question, item.role)
+            # Only transient failures are retried; a 4xx would fail the same way again
+            if not summary.get("error") or not summary.get("transient"):
+                break
+
+        return {
+            "id": item.id,
+            "question": item.question,
+            "role": item.role,
+            **item.extra,
+            "text": summary.get("text", ""),
+            "sql_queries": summary.get("sql_queries", []),
+            "citations": summary.get("citations", []),
+            "suggestions": summary.get("suggestions", []),
+            "verified_query_used": summary.get("verified_query_used", False),
+            "result_rows": [result_set.num_rows for result_set in summary.get("result_sets", [])],
+            "error": bool(summary.get("error")),
+            "attempts": attempt + 1,
+            "started_at": started_at,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    @staticmethod
+    def failure_record(item: BatchQuestion, error: Exception) -> Dict[str, Any]:
+        """Result record for a question whose processing raised."""
+        return {
+            "id": item.id,
+            "question": item.question,
+            "role": item.role,
+            **item.extra,
+            "text": f"Error: {type(error).__name__}: {error}",
+            "error": True,
+        }
+
+    async def run(self, questions: Iterable[BatchQuestion], output_path: str,
+                  resume: bool = True, retry_errors: bool = True) -> Dict[str, int]:
+        """
+        Answer every question not already in output_path and append the results.
+
+        Questions are read lazily, so the input can be larger than memory; at
+        most `concurrency` are in flight and results are written as they finish.
+
+        Returns:
+            Counters: 'done', 'errors', 'skipped' and 'retries'
+        """
+        done = completed_ids(output_path, retry_errors) if resume else set()
+        mode = 'a' if resume else 'w'
+        if resume and os.path.exists(output_path) and os.path.getsize(output_path):
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                partial = f.read(1) != b'\n'
+        else:
+            partial = False
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        started = time.monotonic()
+
+        with open(output_path, mode, encoding='utf-8') as out:
+            if partial:
+                out.write("\n")  # Terminate the line cut short by the interruption
+
+            async def worker():
+                while True:
+                    item = await queue.get()
+                    try:
+                        if item is None:
+                            return
+                        try:
+                            record = await self.ask(item)
+                        except Exception as e:
+                            # A failure outside the agent call still gets its result line
+                            print(f"❌ Question {item.id} failed: {type(e).__name__}: {e}")
+                            record = self.failure_record(item, e)
+                        out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                        out.flush()
+                        self.stats["done"] += 1
+                        self.stats["errors"] += record["error"]
+                        if self.stats["done"] % 10 == 0:
+                            elapsed = time.monotonic() - started
+                            print(f"📦 {self.stats['done']} answered ({self.stats['errors']} errors) "
+                                  f"in {elapsed:.0f}s")
+                    finally:
+                        queue.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            try:
+                for item in questions:
+                    if item.id in done:
+                        self.stats["skipped"] += 1
+                        continue
+                    await queue.put(item)
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+
+        print(f"✅ Batch finished: {self.stats}")
+        return dict(self.stats)
+
+
+async def run_batch(input_path: str,
+        output_path: str,
+        agent_url: str,
+        pat: str,
+        default_role: Optional[str] = None,
+        concurrency: int = 4,
+        rate: Optional[float] = None,
+        retries: int = 2,
+        resume: bool = True,
+        question_field: Optional[str] = None
+    ) -> Dict[str, int]:
+    """Run a JSONL question file end to end with a fresh client."""
+    client = AsyncCortexChat(agent_url, pat, limit_per_host=concurrency)
+    try:
+        runner = BatchRunner(client, concurrency=concurrency, rate=rate, retries=retries)
+        return await runner.run(load_questions(input_path, default_role, question_field), output_path, resume)
+    finally:
+        await client.close()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run a JSONL file of questions through the Cortex Agent")
+    parser.add_argument("input", help="JSONL questions: {\"id\", \"question\", \"role\"} per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results; also the resume checkpoint")
+    parser.add_argument("--role", default=os.getenv("SNOW_ROLE"), help="Role for lines without one")
+    parser.add_argument("--question-field", help="Field holding the question text")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions in flight at once")
+    parser.add_argument("--rate", type=float, help="Maximum questions started per second")
+    parser.add_argument("--retries", type=int, default=2, help="Extra attempts for transient failures")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    args = parser.parse_args()
+
+    asyncio.run(run_batch(
+        args.input, args.output,
+        agent_url=os.getenv("AGENT_ENDPOINT"),
+        pat=os.getenv("PAT"),
+        default_role=args.role,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        retries=args.retries,
+        resume=not args.no_resume,
+        question_field=args.question_field
+    ))
+
+
+if __name__ == "__main__":
+    main()
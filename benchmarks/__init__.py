@@ -0,0 +1 @@
+"""Offline benchmarks for the agent stream parser and the streaming client."""
@@ -0,0 +1,87 @@
+"""
+Per-response allocation counts of the parser's response types.
+
+For every stream profile, measured with tracemalloc while the results are
+kept alive (so each number is what one response costs):
+    response   blocks and KB held by one finalized CortexResponse
+    summary    blocks allocated by extract_summary
+    views      blocks allocated per round of derived-view reads (sql_queries,
+               result_sets, search_results, citations, final_text and each
+               tool result's verification), as the apps read them repeatedly
+
+Usage:
+    python -m benchmarks.allocations [--rounds 20] [--json out.json]
+"""
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.recordings import PROFILES, profile_stream
+from cortex_response_parser import CortexResponse, CortexResponseParser, CortexStreamParser
+
+
+def _traced(fn: Callable[[], object]) -> Tuple[object, int, int]:
+    """Run fn under tracemalloc; returns (result, net blocks, net bytes) with the result still alive."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    return result, sum(stat.count_diff for stat in stats), sum(stat.size_diff for stat in stats)
+
+
+def _read_views(response: CortexResponse) -> List[object]:
+    views = [response.sql_queries, response.result_sets, response.search_results,
+             response.citations, response.final_text]
+    for message in response.messages:
+        for tool_result in message.tool_results:
+            views.append(tool_result.verification_info)
+            views.append(tool_result.is_verified_query)
+    return views
+
+
+def measure(lines: List[str], rounds: int = 20) -> Dict[str, float]:
+    parser = CortexResponseParser()
+
+    def build() -> CortexResponse:
+        stream = CortexStreamParser()
+        for line in lines:
+            stream.feed_line(line)
+        return stream.finalize()
+
+    response, response_blocks, response_bytes = _traced(build)
+    _, summary_blocks, _ = _traced(lambda: parser.extract_summary(response))
+    _, view_blocks, _ = _traced(lambda: [_read_views(response) for _ in range(rounds)])
+    return {
+        "response_blocks": response_blocks,
+        "response_kb": response_bytes / 1024,
+        "summary_blocks": summary_blocks,
+        "view_blocks_per_round": view_blocks / rounds,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Allocation counts of parsed Cortex responses")
+    parser.add_argument("--rounds", type=int, default=20, help="Rounds of derived-view reads")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {name: measure(profile_stream(name), args.rounds) for name in PROFILES}
+    print(f"{'stream':<10} {'response blocks':>16} {'response KB':>12} {'summary blocks':>15} {'view blocks/round':>18}")
+    for name, m in results.items():
+        print(f"{name:<10} {m['response_blocks']:>16,} {m['response_kb']:>12,.1f} "
+              f"{m['summary_blocks']:>15,} {m['view_blocks_per_round']:>18,.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Load generator that drives CortexChat.chat at a target concurrency.
+
+By default an in-process mock agent (see mock_agent.py) is started with the
+given pacing and failure rates; --url points the generator at a server that
+is already running instead. Reports throughput, latency percentiles and the
+error mix, to size worker counts without calling the real agent.
+
+Usage:
+    python -m benchmarks.load_test --concurrency 32 --requests 500 --event-delay 0.002
+    python -m benchmarks.load_test --url http://127.0.0.1:8080/agent --duration 60 --concurrency 64
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from async_cortex_chat import AsyncCortexChat
+from benchmarks.mock_agent import MockAgentServer, add_mock_arguments, mock_from_args
+from cortex_chat import CortexChat
+
+_STATUS_PATTERN = re.compile(r"Request error: (\d{3}) error")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def classify(summary: Dict) -> str:
+    """'ok', the HTTP status of an agent error, 'timeout' or 'error'."""
+    if not summary.get('error'):
+        return "ok"
+    text = summary.get('text') or ""
+    match = _STATUS_PATTERN.search(text)
+    if match:
+        return match.group(1)
+    if "longer than" in text:
+        return "timeout"
+    return "error"
+
+
+class LoadGenerator:
+    """Runs chat calls from a fixed number of worker threads and records each outcome."""
+
+    def __init__(self, chat: CortexChat, concurrency: int, role: str = "LOAD_TEST", distinct_questions: int = 0):
+        """
+        Args:
+            chat: Client under test (one instance shared by all workers, as in the apps)
+            concurrency: Worker threads issuing calls back to back
+            role: Role sent with every question
+            distinct_questions: Cycle through this many questions so identical ones
+                                coalesce; 0 makes every question unique
+        """
+        self.chat = chat
+        self.concurrency = concurrency
+        self.role = role
+        self.distinct_questions = distinct_questions
+        self.latencies: Dict[str, List[float]] = {}
+        self._issued = 0
+        self._budget: Optional[int] = None
+        self._deadline: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _next_question(self) -> Optional[str]:
+        with self._lock:
+            if self._budget is not None and self._issued >= self._budget:
+                return None
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                return None
+            self._issued += 1
+            number = self._issued % self.distinct_questions if self.distinct_questions else self._issued
+        return f"What is the total loan amount by region? (load test {number})"
+
+    def _worker(self):
+        while True:
+            question = self._next_question()
+            if question is None:
+                return
+            started = time.perf_counter()
+            try:
+                outcome = classify(self.chat.chat(question, self.role))
+            except Exception as e:
+                outcome = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.latencies.setdefault(outcome, []).append(elapsed)
+
+    def run(self, requests: Optional[int] = None, duration: Optional[float] = None) -> Dict:
+        """
+        Issue calls until `requests` have been sent or `duration` seconds have passed.
+
+        Returns:
+            Report dict (see report())
+        """
+        self._budget = requests
+        self._deadline = time.monotonic() + duration if duration else None
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="load") as executor:
+            for future in [executor.submit(self._worker) for _ in range(self.concurrency)]:
+                future.result()
+        return self.report(time.perf_counter() - started)
+
+    def report(self, elapsed: float) -> Dict:
+        """Throughput, outcome counts and latency percentiles (seconds) of successful and all calls."""
+        all_latencies = sorted(value for values in self.latencies.values() for value in values)
+        ok = sorted(self.latencies.get("ok", []))
+
+        def summary(values: List[float]) -> Dict[str, float]:
+            return {
+                "count": len(values),
+                "mean": sum(values) / len(values) if values else 0.0,
+                "p50": percentile(values, 0.50),
+                "p90": percentile(values, 0.90),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "max": values[-1] if values else 0.0,
+            }
+
+        return {
+            "concurrency": self.concurrency,
+            "elapsed": elapsed,
+            "throughput": len(all_latencies) / elapsed if elapsed else 0.0,
+            "outcomes": dict(Counter({k: len(v) for k, v in self.latencies.items()})),
+            "latency_ok": summary(ok),
+            "latency_all": summary(all_latencies),
+        }
+
+
+def print_report(report: Dict, server_stats: Optional[Dict] = None, transport: Optional[Dict] = None):
+    print(f"\n📊 {report['latency_all']['count']} calls in {report['elapsed']:.1f}s "
+          f"at concurrency {report['concurrency']} → {report['throughput']:.1f} calls/s")
+    print(f"   Outcomes: {report['outcomes']}")
+    for label in ("latency_ok", "latency_all"):
+        s = report[label]
+        print(f"   {label:<12} p50 {s['p50'] * 1000:8.1f} ms  p90 {s['p90'] * 1000:8.1f} ms  "
+              f"p95 {s['p95'] * 1000:8.1f} ms  p99 {s['p99'] * 1000:8.1f} ms  max {s['max'] * 1000:8.1f} ms")
+    if transport:
+        print(f"   Transport: {transport}")
+    if server_stats:
+        print(f"   Mock server: {server_stats}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test CortexChat against a mock Cortex Agent")
+    parser.add_argument("--url", help="Agent URL to target; starts an in-process mock when omitted")
+    parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous chat calls")
+    parser.add_argument("--requests", type=int, help="Total calls to issue (default 200 unless --duration)")
+    parser.add_argument("--duration", type=float, help="Seconds to keep issuing calls")
+    parser.add_argument("--pool-maxsize", type=int, default=16, help="CortexChat connections per host")
+    parser.add_argument("--client-timeout", type=float, default=10, help="Client read timeout in seconds")
+    parser.add_argument("--distinct-questions", type=int, default=0,
+                        help="Cycle through N questions to exercise coalescing (0 = all unique)")
+    parser.add_argument("--json", help="Write the report to this file")
+    add_mock_arguments(parser)
+    args = parser.parse_args(argv)
+    requests = args.requests if args.requests is not None else (None if args.duration else 200)
+
+    server: Optional[MockAgentServer] = None
+    if args.url is None:
+        server = mock_from_args(args).start()
+    url = args.url or server.url
+    print(f"🚀 Load testing {url} with {args.concurrency} workers")
+
+    client = AsyncCortexChat(url, "load-test-pat", limit_per_host=args.pool_maxsize, timeout=args.client_timeout,
+                             coalesce=args.distinct_questions > 0)
+    chat = CortexChat(url, "load-test-pat", client=client, coalesce=args.distinct_questions > 0)
+    try:
+        # CortexChat prints every answer; keep the report readable
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            report = LoadGenerator(chat, args.concurrency, distinct_questions=args.distinct_questions).run(
+                requests, args.duration)
+        report["transport"] = chat.transport_stats()
+    finally:
+        chat.close()
+        if server is not None:
+            server.stop()
+    if server is not None:
+        report["server"] = dict(server.stats)
+
+    print_report(report, report.get("server"), report["transport"])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
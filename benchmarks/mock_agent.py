@@ -0,0 +1,225 @@
+"""
+Mock Cortex Agent server for load testing.
+
+Speaks the Cortex Agents REST SSE protocol (response.status, thinking and
+text deltas, tool results, [DONE]) from a recording or a synthetic profile,
+with configurable pacing and injected failures: 429 with Retry-After, 5xx,
+and requests that stall until the client times out.
+
+Usage:
+    python -m benchmarks.mock_agent --port 8080 --profile typical --event-delay 0.005 \\
+        --rate-limit-rate 0.05 --server-error-rate 0.02 --timeout-rate 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from benchmarks.recordings import PROFILES, load_recording, profile_stream, synthetic_stream
+
+
+@dataclass
+class MockConfig:
+    event_delay: float = 0.0  # Seconds between SSE events
+    first_event_delay: float = 0.0  # Seconds before the first byte (agent planning time)
+    rate_limit_rate: float = 0.0  # Fraction of requests answered with 429
+    retry_after: int = 1  # Retry-After header sent with 429
+    server_error_rate: float = 0.0  # Fraction of requests answered with 500/502/503
+    timeout_rate: float = 0.0  # Fraction of requests that stall mid-stream
+    stall_seconds: float = 600.0  # How long a stalled request holds the connection
+    seed: Optional[int] = None
+
+
+def split_events(lines: List[str]) -> List[bytes]:
+    """Group stream lines into SSE events (event + data lines up to the blank line)."""
+    events, current = [], []
+    for line in lines:
+        if line:
+            current.append(line)
+        # A blank line ends an event; a data line with no event line stands alone ([DONE], trace)
+        if current and (not line or (line.startswith('data: ') and len(current) == 1)):
+            events.append(("\n".join(current) + "\n\n").encode('utf-8'))
+            current = []
+    if current:
+        events.append(("\n".join(current) + "\n\n").encode('utf-8'))
+    return events
+
+
+class MockAgentServer:
+    """aiohttp server replaying an agent stream with pacing and error injection."""
+
+    def __init__(self, lines: List[str], config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            lines: Stream to replay for every request
+            config: Pacing and failure settings
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+        """
+        self.events = split_events(lines)
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.stats: Dict[str, int] = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "stalled": 0, "client_gone": 0}
+        self._random = random.Random(self.config.seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._started = threading.Event()
+        self._stopping = asyncio.Event()  # Releases stalled requests on shutdown
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/agent"
+
+    def _outcome(self) -> str:
+        """Pick what happens to a request according to the configured rates."""
+        draw = self._random.random()
+        for outcome, rate in (("429", self.config.rate_limit_rate),
+                              ("5xx", self.config.server_error_rate),
+                              ("stalled", self.config.timeout_rate)):
+            if draw < rate:
+                return outcome
+            draw -= rate
+        return "ok"
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.read()
+        self.stats["requests"] += 1
+        outcome = self._outcome()
+
+        if outcome == "429":
+            self.stats["429"] += 1
+            return web.json_response({"message": "Too many requests"}, status=429,
+                                     headers={"Retry-After": str(self.config.retry_after)})
+        if outcome == "5xx":
+            self.stats["5xx"] += 1
+            status = self._random.choice((500, 502, 503))
+            return web.json_response({"message": "Internal error"}, status=status)
+
+        question = ""
+        try:
+            question = json.loads(body)["messages"][-1]["content"][0]["text"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            pass
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "X-Mock-Question": question[:80]})
+        await response.prepare(request)
+        try:
+            if self.config.first_event_delay:
+                await asyncio.sleep(self.config.first_event_delay)
+            stall_at = self._random.randrange(len(self.events)) if outcome == "stalled" else None
+            for index, event in enumerate(self.events):
+                if index == stall_at:
+                    # Headers and part of the stream went out; now go silent
+                    self.stats["stalled"] += 1
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), self.config.stall_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    return response
+                await response.write(event)
+                if self.config.event_delay:
+                    await asyncio.sleep(self.config.event_delay)
+            await response.write_eof()
+            self.stats["ok"] += 1
+        except (ConnectionResetError, asyncio.CancelledError):
+            # The client gave up (e.g. its read timeout fired)
+            self.stats["client_gone"] += 1
+            raise
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/agent", self.handle)
+        app.router.add_post("/api/v2/databases/{db}/schemas/{schema}/agents/{agent}:run", self.handle)
+        app.router.add_get("/stats", lambda request: web.json_response(self.stats))
+        return app
+
+    async def _start(self):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._started.set()
+        self._loop.run_forever()
+
+    def start(self) -> "MockAgentServer":
+        """Serve on a daemon thread (for in-process load tests)."""
+        threading.Thread(target=self._run, name="mock-agent", daemon=True).start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def __enter__(self) -> "MockAgentServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """Stream and failure options shared with the load generator."""
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="typical", help="Synthetic stream to serve")
+    parser.add_argument("--recording", help="Recorded .sse file to serve instead of a profile")
+    parser.add_argument("--rows", type=int, help="Override the result-set rows of the profile (payload size)")
+    parser.add_argument("--event-delay", type=float, default=0.0, help="Seconds between events")
+    parser.add_argument("--first-event-delay", type=float, default=0.0, help="Seconds before the first event")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Fraction of 5xx responses")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Fraction of streams that stall")
+    parser.add_argument("--stall-seconds", type=float, default=600.0, help="How long a stalled stream hangs")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible failure patterns")
+
+
+def mock_from_args(args: argparse.Namespace, host: str = "127.0.0.1", port: int = 0) -> MockAgentServer:
+    if args.recording:
+        lines = load_recording(args.recording)
+    elif args.rows is not None:
+        thinking, text, tools, _, search = PROFILES[args.profile]
+        lines = synthetic_stream(thinking, text, tools, args.rows, search)
+    else:
+        lines = profile_stream(args.profile)
+    config = MockConfig(
+        event_delay=args.event_delay,
+        first_event_delay=args.first_event_delay,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        server_error_rate=args.server_error_rate,
+        timeout_rate=args.timeout_rate,
+        stall_seconds=args.stall_seconds,
+        seed=args.seed
+    )
+    return MockAgentServer(lines, config, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Cortex Agent server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = mock_from_args(args, args.host, args.port)
+    print(f"🧪 Mock agent on {server.url} ({len(server.events)} events per answer); stats on /stats")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Capture a live Cortex Agent stream to a file for the benchmarks.
+
+Usage:
+    AGENT_ENDPOINT=... PAT=... python -m benchmarks.record_stream "question" ROLE out.sse
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import aiohttp
+
+from async_cortex_chat import AsyncCortexChat
+
+
+async def record(agent_url: str, pat: str, query: str, role: str, path: str) -> int:
+    """
+    Save the raw SSE bytes of one agent answer.
+
+    Returns:
+        Number of bytes written
+    """
+    payload, headers = AsyncCortexChat(agent_url, pat).build_request(query, role)
+    size = 0
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300)) as session:
+        async with session.post(agent_url, headers=headers, data=json.dumps(payload)) as response:
+            response.raise_for_status()
+            with open(path, 'wb') as f:
+                async for chunk in response.content.iter_any():
+                    f.write(chunk)
+                    size += len(chunk)
+    print(f"💾 Recorded {size} bytes to {path}")
+    return size
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(record(os.getenv("AGENT_ENDPOINT"), os.getenv("PAT"), sys.argv[1], sys.argv[2], sys.argv[3]))
@@ -0,0 +1,97 @@
+"""
+Recorded Cortex Agent SSE streams for replay.
+
+Recordings are plain SSE text, one line per line exactly as the agent sent
+it, so a file captured with record_stream.py replays byte for byte. The
+built-in profiles synthesize streams with the same event mix when no
+recording is at hand.
+"""
+
+import json
+from typing import Dict, List
+
+# name -> (thinking deltas, text deltas, SQL tools, result rows, search results)
+PROFILES: Dict[str, tuple] = {
+    "small": (20, 30, 1, 5, 0),
+    "typical": (300, 400, 2, 50, 3),
+    "huge": (5000, 3000, 6, 2000, 20),
+}
+
+
+def _event(lines: List[str], event: str, data) -> None:
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data))
+    lines.append("")
+
+
+def synthetic_stream(thinking_deltas: int, text_deltas: int, sql_tools: int,
+                     rows: int, search_results: int) -> List[str]:
+    """SSE lines shaped like a Cortex Agents answer (status, thinking, tools, text, [DONE])."""
+    lines: List[str] = []
+    _event(lines, "response.status", {"status": "planning", "message": "Planning the next steps"})
+    for i in range(thinking_deltas):
+        _event(lines, "response.thinking.delta", {"content_index": 0, "text": f"step {i} of the reasoning "})
+    _event(lines, "response.thinking", {"content_index": 0, "text": "<thinking>Reasoning complete</thinking>"})
+
+    for tool in range(sql_tools):
+        tool_id = f"toolu_{tool}"
+        sql = f"SELECT REGION, SUM(LOAN_AMOUNT) AS TOTAL FROM GOLD.FACT_LOANS GROUP BY REGION -- {tool}"
+        _event(lines, "response.status", {"status": "executing_tool", "message": "Executing SQL"})
+        _event(lines, "response.tool_use", {"tool_use_id": tool_id, "type": "cortex_analyst_text_to_sql",
+                                            "name": "loans_analyst", "input": {"query": "loans by region"}})
+        _event(lines, "response.tool_result", {
+            "tool_use_id": tool_id,
+            "type": "cortex_analyst_text_to_sql",
+            "content": [{"type": "json", "json": {
+                "sql": sql,
+                "verified_query_used": tool == 0,
+                "result_set": {
+                    "statementHandle": f"01b2c3d4-0000-{tool:04d}",
+                    "resultSetMetaData": {
+                        "numRows": rows,
+                        "rowType": [{"name": "REGION", "type": "text"},
+                                    {"name": "TOTAL", "type": "fixed", "scale": 2}],
+                    },
+                    "data": [[f"Region {r}", f"{r * 1000.5:.2f}"] for r in range(rows)],
+                },
+            }}],
+        })
+
+    if search_results:
+        _event(lines, "response.tool_result", {
+            "tool_use_id": "toolu_search",
+            "type": "cortex_search",
+            "content": [{"type": "json", "json": {"searchResults": [
+                {"doc_id": str(i), "doc_title": f"Policy {i}", "text": "Loan policy excerpt " * 20}
+                for i in range(search_results)
+            ]}}],
+        })
+
+    _event(lines, "response.status", {"status": "proceeding_to_answer", "message": "Writing the answer"})
+    words = []
+    for i in range(text_deltas):
+        word = f"word{i} "
+        words.append(word)
+        _event(lines, "response.text.delta", {"content_index": 1, "text": word})
+    _event(lines, "response.text", {"content_index": 1, "text": "".join(words)})
+    _event(lines, "response", {"role": "assistant", "content": [{"type": "text", "text": "".join(words)}]})
+    lines.append("data: " + json.dumps([json.dumps({"name": "trace", "attributes": []})]))
+    lines.append("data: [DONE]")
+    return lines
+
+
+def profile_stream(name: str) -> List[str]:
+    """Synthetic stream for one of PROFILES."""
+    return synthetic_stream(*PROFILES[name])
+
+
+def load_recording(path: str) -> List[str]:
+    """Lines of a recorded stream, without line terminators."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def save_recording(lines: List[str], path: str):
+    """Write stream lines so they can be replayed later."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
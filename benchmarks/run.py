@@ -0,0 +1,172 @@
+"""
+Offline benchmark of the agent stream parser and the streaming client.
+
+Each recorded stream is replayed through:
+    parse     CortexResponseParser.parse_sse_response over the recorded lines
+    summary   CortexResponseParser.extract_summary of the parsed response
+    feed      CortexStreamParser.feed over transport-sized byte chunks
+    chat      CortexChat.chat end to end against a local HTTP stand-in
+
+and reported as events/s, allocations (tracemalloc blocks) and peak memory.
+
+Usage:
+    python -m benchmarks.run                          # built-in small/typical/huge profiles
+    python -m benchmarks.run --recording answer.sse   # a captured stream (see record_stream.py)
+    python -m benchmarks.run --json results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.2
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.recordings import PROFILES, load_recording, profile_stream
+from benchmarks.stand_in import StandInServer
+import fast_json
+from cortex_chat import CortexChat
+from cortex_response_parser import CortexResponseParser, CortexStreamParser
+
+CHUNK_BYTES = 16 * 1024
+
+
+def _count_events(lines: List[str]) -> int:
+    return sum(1 for line in lines if line.startswith('data: '))
+
+
+def _measure(fn: Callable[[], object], events: int, repeat: int) -> Dict[str, float]:
+    """Best-of-repeat timing, then one traced run for allocations and peak memory."""
+    fn()  # Warm-up (imports, caches, connection pool)
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del result
+
+    return {
+        "seconds": best,
+        "events_per_s": events / best if best else 0.0,
+        "alloc_blocks": allocated,
+        "peak_kb": peak / 1024,
+    }
+
+
+def benchmark(name: str, lines: List[str], repeat: int = 5, with_chat: bool = True) -> Dict[str, Dict[str, float]]:
+    """
+    Run every stage over one recorded stream.
+
+    Returns:
+        Dict of stage -> metrics
+    """
+    parser = CortexResponseParser()
+    payload = ("\n".join(lines) + "\n").encode('utf-8')
+    chunks = [payload[i:i + CHUNK_BYTES] for i in range(0, len(payload), CHUNK_BYTES)]
+    events = _count_events(lines)
+    response = parser.parse_sse_response(lines)
+
+    def feed():
+        stream = CortexStreamParser()
+        for chunk in chunks:
+            stream.feed(chunk)
+        return stream.finalize()
+
+    results = {
+        "parse": _measure(lambda: parser.parse_sse_response(lines), events, repeat),
+        "summary": _measure(lambda: parser.extract_summary(response), events, repeat),
+        "feed": _measure(feed, events, repeat),
+    }
+    if with_chat:
+        with StandInServer(lines, chunk_bytes=CHUNK_BYTES) as server:
+            chat = CortexChat(server.url, "benchmark-pat", coalesce=False)
+            # CortexChat prints every answer; keep the report readable
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                try:
+                    results["chat"] = _measure(lambda: chat.chat(f"benchmark {name}", "BENCHMARK"), events, repeat)
+                finally:
+                    chat.close()
+    for metrics in results.values():
+        metrics["events"] = events
+        metrics["bytes"] = len(payload)
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, Dict[str, float]]]):
+    print(f"{'stream':<12} {'stage':<8} {'events':>7} {'ms':>9} {'events/s':>12} {'alloc blocks':>13} {'peak KB':>9}")
+    for name, stages in results.items():
+        for stage, m in stages.items():
+            print(f"{name:<12} {stage:<8} {m['events']:>7} {m['seconds'] * 1000:>9.2f} "
+                  f"{m['events_per_s']:>12,.0f} {m['alloc_blocks']:>13,} {m['peak_kb']:>9,.0f}")
+
+
+def regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Stages that got slower or allocate more than the baseline allows."""
+    found = []
+    for name, stages in results.items():
+        for stage, m in stages.items():
+            base = baseline.get(name, {}).get(stage)
+            if not base:
+                continue
+            if m["events_per_s"] < base["events_per_s"] * (1 - tolerance):
+                found.append(f"{name}/{stage}: {m['events_per_s']:,.0f} events/s "
+                             f"(baseline {base['events_per_s']:,.0f})")
+            if m["peak_kb"] > base["peak_kb"] * (1 + tolerance):
+                found.append(f"{name}/{stage}: peak {m['peak_kb']:,.0f} KB (baseline {base['peak_kb']:,.0f})")
+    return found
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the agent stream parser and client")
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES),
+                        help="Built-in synthetic stream(s) to run (default: all)")
+    parser.add_argument("--recording", action="append", default=[], help="Recorded .sse file(s) to replay")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage (best is reported)")
+    parser.add_argument("--no-chat", action="store_true", help="Skip the end-to-end CortexChat stage")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results file to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    streams = {path: load_recording(path) for path in args.recording}
+    if args.profile or not streams:
+        streams.update({name: profile_stream(name) for name in (args.profile or PROFILES)})
+
+    print(f"JSON backend: {fast_json.BACKEND}")
+    results = {name: benchmark(name, lines, args.repeat, not args.no_chat) for name, lines in streams.items()}
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"❌ Regression {line}")
+        if found:
+            return 1
+        print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
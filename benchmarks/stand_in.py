@@ -0,0 +1,76 @@
+"""
+Local HTTP stand-in for the Cortex Agents endpoint that replays a recording.
+
+The server runs on a background thread so synchronous callers (CortexChat)
+can be pointed at it like at the real agent URL.
+"""
+
+import asyncio
+import threading
+from typing import List, Optional
+
+from aiohttp import web
+
+
+class StandInServer:
+    """Serves one recorded SSE stream on POST /agent, as fast as possible."""
+
+    def __init__(self, lines: List[str], port: int = 0, chunk_bytes: int = 16 * 1024):
+        """
+        Args:
+            lines: Recorded stream lines
+            port: Port to listen on (0 picks a free one)
+            chunk_bytes: Size of the writes, to mimic the transport's chunking
+        """
+        payload = ("\n".join(lines) + "\n").encode('utf-8')
+        self.chunks = [payload[i:i + chunk_bytes] for i in range(0, len(payload), chunk_bytes)]
+        self.port = port
+        self.requests = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._started = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/agent"
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        await request.read()
+        self.requests += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for chunk in self.chunks:
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/agent", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._started.set()
+        self._loop.run_forever()
+
+    def start(self) -> "StandInServer":
+        threading.Thread(target=self._run, name="agent-stand-in", daemon=True).start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
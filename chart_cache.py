@@ -0,0 +1,101 @@
+"""
+Content-addressed cache for rendered charts.
+
+A chart is identified by a hash of the plotted data and the chart spec, so
+the same result plotted twice is rendered once. PNG bytes live in an
+in-memory LRU, optionally backed by SQLite on disk, and the Slack file
+uploaded for a chart is remembered per channel so it can be shown again
+without another files_upload_v2.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from response_cache import MemoryCacheBackend, SQLiteCacheBackend
+
+
+def chart_digest(data: pd.DataFrame, spec: Dict[str, Any]) -> str:
+    """Hash of a frame's columns, dtypes and values plus the chart spec."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(spec, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in data.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """PNG bytes and uploaded Slack files keyed by chart digest."""
+
+    def __init__(self,
+            max_bytes: int = 32 * 1024 * 1024,
+            ttl: float = 24 * 60 * 60,
+            path: Optional[str] = None,
+            max_files: int = 5000
+        ):
+        """
+        Args:
+            max_bytes: In-memory budget for PNG bytes
+            ttl: Seconds a chart (and its uploaded file) is reused
+            path: Optional SQLite file that keeps PNGs across restarts
+            max_files: Remembered (chart, channel) uploads
+        """
+        self.ttl = ttl
+        self.memory = MemoryCacheBackend(max_bytes=max_bytes)
+        self.disk = SQLiteCacheBackend(path, max_bytes=max_bytes * 8) if path else None
+        self.files = MemoryCacheBackend(max_bytes=max_files * 256, max_entries=max_files)
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "file_reuses": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_png(self, digest: str) -> Optional[bytes]:
+        """PNG for a chart digest, or None."""
+        png = self.memory.get(digest)
+        if png is not None:
+            self._count("hits")
+            return png
+        if self.disk is not None:
+            png = self.disk.get(digest)
+            if png is not None:
+                self._count("disk_hits")
+                self.memory.set(digest, "", bytes(png), self.ttl)
+                return bytes(png)
+        self._count("misses")
+        return None
+
+    def set_png(self, digest: str, png: bytes):
+        """Store a rendered PNG."""
+        self.memory.set(digest, "", png, self.ttl)
+        if self.disk is not None:
+            self.disk.set(digest, "", png, self.ttl)
+
+    def get_file(self, digest: str, channel: str) -> Optional[Dict[str, str]]:
+        """Slack file ('id', 'permalink') already uploaded to this channel for the chart."""
+        value = self.files.get(f"{digest}:{channel}")
+        if value is None:
+            return None
+        self._count("file_reuses")
+        return json.loads(value)
+
+    def set_file(self, digest: str, channel: str, upload_response: Any):
+        """Remember the file returned by files_upload_v2 for this chart and channel."""
+        try:
+            uploaded = upload_response.get("file") or (upload_response.get("files") or [{}])[0]
+        except AttributeError:
+            return
+        if not uploaded.get("id"):
+            return
+        value = {"id": uploaded["id"], "permalink": uploaded.get("permalink")}
+        self.files.set(f"{digest}:{channel}", "", json.dumps(value).encode('utf-8'), self.ttl)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and in-memory size."""
+        entries, size = self.memory.size()
+        with self._lock:
+            return dict(self._stats, entries=entries, bytes=size)
@@ -0,0 +1,278 @@
+"""
+Chart rendering off the Slack handler threads.
+
+Charts are drawn by a small pool of worker processes that import matplotlib
+(Agg backend) once at start-up, so a render never holds the handler's GIL
+and a slow or stuck figure can be abandoned after a timeout. DataFrames are
+reduced to at most max_points bars before they are sent to a worker.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from chart_cache import ChartCache, chart_digest
+from telemetry import TELEMETRY
+
+OTHER_LABEL = "Other"
+
+
+def _init_worker():
+    """Pre-import matplotlib with the Agg backend in each worker."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+
+
+def _ping() -> bool:
+    return True
+
+
+def chart_spec(df: pd.DataFrame) -> Optional[Dict[str, str]]:
+    """
+    Pick what to plot: the first categorical column against the first numeric one.
+
+    Returns:
+        Dict with 'x', 'y' and 'title', or None when the data has no chartable shape
+    """
+    num_cols = df.select_dtypes(include=['number']).columns.tolist()
+    cat_cols = df.select_dtypes(include=['object', 'datetime']).columns.tolist()
+    if not num_cols or not cat_cols:
+        return None
+    return {"x": cat_cols[0], "y": num_cols[0], "title": f"Análisis de {num_cols[0]}"}
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int) -> pd.DataFrame:
+    """
+    Reduce a frame to at most max_points bars.
+
+    Repeated categories are summed; beyond max_points the largest bars are
+    kept and the rest are folded into a single 'Other' bar.
+    """
+    data = df[[x, y]]
+    if len(data) <= max_points:
+        return data
+    data = data.groupby(x, sort=False, as_index=False)[y].sum()
+    if len(data) <= max_points:
+        return data
+    ranked = data.reindex(data[y].abs().sort_values(ascending=False).index)
+    top = ranked.head(max_points - 1)
+    other = pd.DataFrame({x: [OTHER_LABEL], y: [ranked[y].iloc[max_points - 1:].sum()]})
+    return pd.concat([top, other], ignore_index=True)
+
+
+def draw_bar_chart(data: pd.DataFrame, spec: Dict[str, str]) -> bytes:
+    """Render a bar chart to PNG bytes (runs inside a worker process)."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    try:
+        data.plot(kind='bar', x=spec["x"], y=spec["y"], ax=ax, color='#29B5E8')
+        ax.set_title(spec["title"], fontsize=14, pad=20)
+        ax.set_ylabel(spec["y"])
+        ax.set_xlabel(spec["x"])
+        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+        fig.tight_layout()
+
+        img_data = io.BytesIO()
+        fig.savefig(img_data, format='png')
+        return img_data.getvalue()
+    finally:
+        plt.close(fig)  # Importante cerrar la figura para liberar memoria
+
+
+class ChartRenderer:
+    """Process pool that renders charts with a timeout and latency metrics."""
+
+    def __init__(self,
+            workers: int = 2,
+            timeout: float = 20,
+            max_points: int = 50,
+            max_tasks_per_worker: int = 200,
+            cache: ChartCache = None
+        ):
+        """
+        Args:
+            workers: Number of rendering processes
+            timeout: Seconds to wait for a chart before giving up (the pool is recycled)
+            max_points: Maximum bars drawn; larger frames are aggregated first
+            max_tasks_per_worker: Renders before a worker is replaced, to bound memory growth
+            cache: Optional ChartCache; identical charts are then rendered only once
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.max_points = max_points
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._pool = None
+        self._latencies = deque(maxlen=1000)
+        self._stats = {"renders": 0, "skipped": 0, "timeouts": 0, "failures": 0, "downsampled": 0}
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # fork is unsafe once the app runs threads (Slack socket, Snowflake pool, event
+                # loop): a child can inherit a lock held mid-call. forkserver and spawn start
+                # clean workers, and _init_worker pre-imports matplotlib in each of them.
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                context = multiprocessing.get_context(method)
+                if method == "forkserver":
+                    # The fork server preloads only this module, not the app's __main__;
+                    # workers still import the app module, which must stay side-effect free
+                    context.set_forkserver_preload(["chart_renderer"])
+                self._pool = context.Pool(
+                    processes=self.workers,
+                    initializer=_init_worker,
+                    maxtasksperchild=self.max_tasks_per_worker
+                )
+            return self._pool
+
+    def _recycle(self, pool):
+        """Kill a pool with a stuck render; the next call starts a fresh one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.terminate()
+
+    def warm(self):
+        """Start the workers now instead of on the first chart."""
+        pool = self._get_pool()
+        for result in [pool.apply_async(_ping) for _ in range(self.workers)]:
+            result.get(self.timeout)
+
+    def _prepare(self, df: pd.DataFrame, count: bool = True):
+        spec = chart_spec(df)
+        if spec is None:
+            if count:
+                with self._lock:
+                    self._stats["skipped"] += 1
+            return None, None
+        data = downsample(df, spec["x"], spec["y"], self.max_points)
+        if count and len(data) < len(df):
+            with self._lock:
+                self._stats["downsampled"] += 1
+        return data, spec
+
+    def chart_key(self, df: pd.DataFrame) -> Optional[str]:
+        """Content digest of the chart df would produce, or None when there is nothing to chart."""
+        data, spec = self._prepare(df, count=False)
+        return chart_digest(data, spec) if data is not None else None
+
+    def _cached(self, data: pd.DataFrame, spec: Dict[str, str]):
+        """(digest, cached PNG) for prepared data; both None without a cache."""
+        if self.cache is None:
+            return None, None
+        digest = chart_digest(data, spec)
+        return digest, self.cache.get_png(digest)
+
+    def _store(self, digest: Optional[str], png: bytes):
+        if digest is not None:
+            self.cache.set_png(digest, png)
+
+    def _record(self, outcome: str, started: float):
+        elapsed = time.monotonic() - started
+        TELEMETRY.observe("chart_render", elapsed, outcome=outcome)
+        with self._lock:
+            self._stats[outcome] += 1
+            if outcome == "renders":
+                self._latencies.append(elapsed)
+
+    def render(self, df: pd.DataFrame) -> Optional[io.BytesIO]:
+        """
+        Render a chart for df, blocking the calling thread only.
+
+        Returns:
+            PNG in a BytesIO (ready for files_upload_v2), or None when there is
+            nothing to chart, the render failed or it timed out
+        """
+        data, spec = self._prepare(df)
+        if data is None:
+            return None
+        digest, png = self._cached(data, spec)
+        if png is not None:
+            TELEMETRY.observe("chart_render", 0.0, outcome="cached")
+            return io.BytesIO(png)
+        started = time.monotonic()
+        pool = self._get_pool()
+        try:
+            png = pool.apply_async(draw_bar_chart, (data, spec)).get(self.timeout)
+        except multiprocessing.TimeoutError:
+            print(f"⏱️ Chart render timed out after {self.timeout}s")
+            self._record("timeouts", started)
+            self._recycle(pool)
+            return None
+        except Exception as e:
+            print(f"Error generando gráfico: {e}")
+            self._record("failures", started)
+            return None
+        self._record("renders", started)
+        self._store(digest, png)
+        return io.BytesIO(png)
+
+    async def render_async(self, df: pd.DataFrame) -> Optional[io.BytesIO]:
+        """Same as render(), awaited without blocking the event loop."""
+        data, spec = self._prepare(df)
+        if data is None:
+            return None
+        digest, png = self._cached(data, spec)
+        if png is not None:
+            TELEMETRY.observe("chart_render", 0.0, outcome="cached")
+            return io.BytesIO(png)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def deliver(setter, value):
+            if not future.done():
+                setter(value)
+
+        started = time.monotonic()
+        pool = self._get_pool()
+        pool.apply_async(
+            draw_bar_chart, (data, spec),
+            callback=lambda png: loop.call_soon_threadsafe(deliver, future.set_result, png),
+            error_callback=lambda e: loop.call_soon_threadsafe(deliver, future.set_exception, e)
+        )
+        try:
+            png = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            print(f"⏱️ Chart render timed out after {self.timeout}s")
+            self._record("timeouts", started)
+            # terminate() joins the workers; keep it off the event loop
+            await asyncio.to_thread(self._recycle, pool)
+            return None
+        except Exception as e:
+            print(f"Error generando gráfico: {e}")
+            self._record("failures", started)
+            return None
+        self._record("renders", started)
+        self._store(digest, png)
+        return io.BytesIO(png)
+
+    def stats(self) -> Dict[str, Any]:
+        """Render counters plus latency (seconds) over the last 1000 renders."""
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        if latencies:
+            stats.update(
+                latency_avg=sum(latencies) / len(latencies),
+                latency_p50=latencies[len(latencies) // 2],
+                latency_p95=latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                latency_max=latencies[-1]
+            )
+        return stats
+
+    def close(self):
+        """Stop the worker processes."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
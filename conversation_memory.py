@@ -0,0 +1,211 @@
+"""
+Per-thread conversation memory for multi-turn agent questions.
+
+Each Slack thread keeps its previous questions and answers so a follow-up
+("and for Miami only?") is sent to the agent together with the earlier
+turns. The history sent with a request is bounded by a byte budget: the
+newest turns are kept verbatim and older ones are folded into a short
+running summary. Idle conversations are evicted least-recently-used once the
+whole store exceeds its memory ceiling.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Rough size of a model token in bytes, for budgets expressed in tokens
+BYTES_PER_TOKEN = 4
+
+
+def conversation_key(channel: Optional[str], thread_ts: Optional[str], role: Optional[str]) -> Optional[str]:
+    """Key of the conversation a message belongs to, or None outside a thread."""
+    if not channel or not thread_ts:
+        return None
+    return f"{role or ''}:{channel}:{thread_ts}"
+
+
+def _clip(text: str, max_bytes: int) -> str:
+    encoded = (text or '').encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return text or ''
+    return encoded[:max_bytes].decode('utf-8', errors='ignore').rstrip() + "…"
+
+
+def _message(role: str, *texts: str) -> Dict[str, Any]:
+    """Agent API message with one text content item per non-empty text."""
+    return {"role": role, "content": [{"type": "text", "text": text} for text in texts if text]}
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+    size: int = 0
+
+    def __post_init__(self):
+        self.size = len(self.question.encode('utf-8')) + len(self.answer.encode('utf-8'))
+
+
+@dataclass
+class Conversation:
+    turns: List[Turn] = field(default_factory=list)
+    summary: str = ""
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def size(self) -> int:
+        return sum(turn.size for turn in self.turns) + len(self.summary.encode('utf-8'))
+
+
+class ConversationMemory:
+    """Thread-safe store of Slack thread conversations with bounded context."""
+
+    def __init__(self,
+            max_context_bytes: int = 8 * 1024,
+            max_summary_bytes: int = 1024,
+            max_answer_bytes: int = 2048,
+            max_total_bytes: int = 16 * 1024 * 1024,
+            idle_timeout: float = 2 * 60 * 60
+        ):
+        """
+        Args:
+            max_context_bytes: History sent with a request (about max_context_bytes / 4 tokens)
+            max_summary_bytes: Size of the running summary of older turns
+            max_answer_bytes: Each stored answer is clipped to this size
+            max_total_bytes: Memory ceiling for all conversations; least recently used go first
+            idle_timeout: Seconds after which an untouched conversation is dropped
+        """
+        self.max_context_bytes = max_context_bytes
+        self.max_summary_bytes = max_summary_bytes
+        self.max_answer_bytes = max_answer_bytes
+        self.max_total_bytes = max_total_bytes
+        self.idle_timeout = idle_timeout
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"turns": 0, "folded_turns": 0, "evicted": 0}
+        self._lock = threading.Lock()
+
+    def history(self, key: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        Prior turns of a conversation as agent API messages, within max_context_bytes.
+
+        Returns:
+            Alternating user/assistant messages (oldest first); empty for a new conversation
+        """
+        if key is None:
+            return []
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            conversation = self._conversations.get(key)
+            if conversation is None:
+                return []
+            self._conversations.move_to_end(key)
+            conversation.last_used = time.monotonic()
+
+            budget = self.max_context_bytes - len(conversation.summary.encode('utf-8'))
+            kept = []
+            for turn in reversed(conversation.turns):
+                if turn.size > budget:
+                    break
+                kept.append(turn)
+                budget -= turn.size
+            kept.reverse()
+            dropped = conversation.turns[:len(conversation.turns) - len(kept)]
+            summary = self._fold(conversation.summary, dropped)
+
+        messages = []
+        for index, turn in enumerate(kept):
+            preamble = f"Earlier in this conversation: {summary}" if index == 0 and summary else ""
+            messages.append(_message("user", preamble, turn.question))
+            messages.append(_message("assistant", turn.answer))
+        if summary and not kept:
+            # Nothing fits verbatim; the summary alone travels with the new question
+            messages.append(_message("user", f"Earlier in this conversation: {summary}"))
+            messages.append(_message("assistant", "Understood."))
+        return messages
+
+    def append(self, key: Optional[str], question: str, response: Dict[str, Any]):
+        """Record a completed turn; error answers are not remembered."""
+        if key is None or response.get('error'):
+            return
+        answer = response.get('text') or ""
+        sql_queries = response.get('sql_queries') or []
+        if sql_queries:
+            # The SQL lets the agent refine the previous query instead of re-planning
+            answer = f"{answer}\n\nSQL used:\n{sql_queries[0]}"
+        turn = Turn(question=question, answer=_clip(answer, self.max_answer_bytes))
+
+        with self._lock:
+            conversation = self._conversations.get(key)
+            if conversation is None:
+                conversation = self._conversations[key] = Conversation()
+            before = conversation.size
+            conversation.turns.append(turn)
+            conversation.last_used = time.monotonic()
+            self._conversations.move_to_end(key)
+
+            # Keep stored turns within the context budget; older ones become summary
+            while len(conversation.turns) > 1 and conversation.size > self.max_context_bytes:
+                conversation.summary = self._fold(conversation.summary, [conversation.turns.pop(0)])
+                self._stats["folded_turns"] += 1
+
+            self._bytes += conversation.size - before
+            self._stats["turns"] += 1
+            while self._bytes > self.max_total_bytes and len(self._conversations) > 1:
+                self._remove(next(iter(self._conversations)))
+                self._stats["evicted"] += 1
+
+    def forget(self, key: str):
+        """Drop a conversation."""
+        with self._lock:
+            if key in self._conversations:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters plus current conversations and bytes."""
+        with self._lock:
+            return dict(self._stats, conversations=len(self._conversations), bytes=self._bytes)
+
+    def _fold(self, summary: str, turns: List[Turn]) -> str:
+        """Append condensed turns to the running summary, keeping its newest part."""
+        if not turns:
+            return summary
+        parts = [summary] if summary else []
+        for turn in turns:
+            first_sentence = turn.answer.split("\n", 1)[0].split(". ", 1)[0]
+            parts.append(f"Q: {_clip(turn.question, 200)} A: {_clip(first_sentence, 200)}")
+        folded = " | ".join(parts)
+        encoded = folded.encode('utf-8')
+        if len(encoded) > self.max_summary_bytes:
+            folded = "…" + encoded[-self.max_summary_bytes:].decode('utf-8', errors='ignore')
+        return folded
+
+    def _evict_idle(self, now: float):
+        while self._conversations:
+            key, conversation = next(iter(self._conversations.items()))
+            if now - conversation.last_used <= self.idle_timeout:
+                break
+            self._remove(key)
+            self._stats["evicted"] += 1
+
+    def _remove(self, key: str):
+        self._bytes -= self._conversations.pop(key).size
+
+
+def memory_from_env() -> Optional[ConversationMemory]:
+    """
+    Build the apps' conversation memory from the environment.
+
+    CONVERSATION_CONTEXT_TOKENS (history sent per request, 0 disables memory)
+    and CONVERSATION_MEMORY_MB (ceiling for all threads).
+    """
+    tokens = int(os.getenv("CONVERSATION_CONTEXT_TOKENS", "2000"))
+    if tokens <= 0:
+        return None
+    return ConversationMemory(
+        max_context_bytes=tokens * BYTES_PER_TOKEN,
+        max_total_bytes=int(float(os.getenv("CONVERSATION_MEMORY_MB", "16")) * 1024 * 1024)
+    )
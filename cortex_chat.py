@@ -1,75 +1,110 @@
-import requests
-import json
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
 
-from cortex_response_parser import CortexResponseParser
+import aiohttp
+
+from async_cortex_chat import AgentHTTPError, AsyncCortexChat, BackgroundLoop
+from conversation_memory import ConversationMemory, conversation_key
+from cortex_response_parser import CortexResponseParser, CortexStreamParser
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+from slack_format import clip_message, format_text_for_slack, markdown_safe_prefix
+from slack_progress import SlackProgressUpdater
 
 DEBUG = False  # Set to True for detailed logging
 
+
+@dataclass
+class ChatRequestContext:
+    """
+    State for a single CortexChat.chat call.
+
+    Everything that used to live on the shared CortexChat instance while a
+    question was being answered (Slack target, planning message, thinking
+    timeline, metrics) is kept here instead, so one CortexChat can serve
+    concurrent conversations without cross-talk.
+    """
+    query: str
+    role: str
+    slack_say: Optional[Callable] = None  # For real-time Slack updates
+    slack_app: Any = None  # For updating messages
+    channel: Optional[str] = None
+    conversation: Optional[str] = None  # Conversation memory key (Slack thread)
+    history: List[Dict[str, Any]] = field(default_factory=list)  # Earlier turns sent with the question
+    planning_message_ts: Optional[str] = None
+    answer_message_ts: Optional[str] = None  # Message the answer is streamed into
+    planning_updates: List[str] = field(default_factory=list)
+    thinking_updates: List[str] = field(default_factory=list)  # Track thinking content for Slack updates
+    timeline: List[Dict[str, Any]] = field(default_factory=list)  # Chronological status and thinking events
+    tools_used: List[str] = field(default_factory=list)
+    metrics: Dict[str, float] = field(default_factory=dict)
+    summary: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def planning_steps(self) -> List[str]:
+        """Planning steps for the collapsible details view."""
+        return self.planning_updates
+
+    @property
+    def thinking_steps(self) -> List[str]:
+        """Non-empty thinking content for the details view."""
+        return [content.strip() for content in self.thinking_updates if content and content.strip()]
+
+
 class CortexChat:
+    """
+    Synchronous Cortex Agent client with real-time Slack planning updates.
+
+    A thin wrapper over AsyncCortexChat: the HTTP stream runs on a shared
+    background event loop and decoded events are consumed here, on the
+    calling thread, to drive the Slack messages.
+    """
+
     def __init__(self, 
             agent_url: str, 
             pat: str,
             slack_say_function=None,
-            slack_app=None
+            slack_app=None,
+            client: AsyncCortexChat = None,
+            pool_maxsize: int = 16,
+            progress_interval: float = 1.0,
+            cache: ResponseCache = None,
+            memory: ConversationMemory = None,
+            coalesce: bool = True,
+            stream_answer: bool = False,
+            show_planning: bool = True
         ):
         self.agent_url = agent_url
         self.pat = pat
         self.parser = CortexResponseParser(debug=DEBUG)
         self.slack_say = slack_say_function  # For real-time Slack updates
         self.slack_app = slack_app  # For updating messages
+        # Coalescing is done here, across threads; the client owns the cache and memory policy
+        self.client = client or AsyncCortexChat(agent_url, pat, limit_per_host=pool_maxsize, coalesce=False)
+        if cache is not None:
+            self.client.cache = cache  # Optional answer cache keyed by (normalized question, role)
+        if memory is not None:
+            self.client.memory = memory  # Optional per-thread history for follow-up questions
+        self.inflight = SingleFlight() if coalesce else None  # Identical in-flight questions share one call
+        self.stream_answer = stream_answer  # Render the answer into Slack while it is generated
+        self.show_planning = show_planning  # Post the "Thinking..." planning message (needs a show_planning_details handler)
+        self._loop = BackgroundLoop.default()
+        self.channel_id = None  # Default channel when chat() is not given one
+        self.progress_interval = progress_interval  # Seconds between Slack planning updates
+        self._progress: Dict[int, SlackProgressUpdater] = {}
+        self._progress_lock = threading.Lock()
 
-    def _retrieve_response(self, query: str, role: str, limit=1) -> dict[str, any]:
+    def _retrieve_response(self, ctx: ChatRequestContext) -> dict[str, any]:
         """Enhanced response retrieval with real-time streaming and planning display."""
 
-        payload = {
-            "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": query
-                    }
-                ]
-            }
-            ],
-            "tool_choice": {
-                "type": "auto"
-            },
-            "stream": True  # Enable streaming as expected by the API
-        }
-
-        headers = {
-            "X-Snowflake-Authorization-Token-Type": "PROGRAMMATIC_ACCESS_TOKEN",
-            "Authorization": f"Bearer {self.pat}",
-            "X-Snowflake-Role": role,
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-        
-        # Debug: Print the request details
-        if DEBUG:
-            print(f"🔍 Making request to: {self.agent_url}")
-            print(f"🔍 Headers: {headers}")
-            print(f"🔍 Payload: {json.dumps(payload, indent=2)}")
-
         try:
-            # Make streaming request
-            response = requests.post(
-                self.agent_url,
-                headers=headers,
-                data=json.dumps(payload),
-                timeout=120,
-                stream=True
-            )
-            response.raise_for_status()
-            
+            ctx.metrics['started_at'] = time.monotonic()
             # Send initial planning status to Slack with collapsible button interface
-            self.planning_message_ts = None
-            self.planning_channel = getattr(self.slack_app, '_channel_id', None) if self.slack_app else None
-            planning_expanded = False  # Track whether details are shown
-            if self.slack_say:
-                result = self.slack_say(
+            if ctx.slack_say and self.show_planning:
+                result = ctx.slack_say(
                     text="🤔 Thinking...",
                     blocks=[
                         {
@@ -83,341 +118,328 @@ class CortexChat:
                 )
                 # Store message timestamp for updates if available
                 if hasattr(result, 'get') and result.get('ts'):
-                    self.planning_message_ts = result['ts']
+                    ctx.planning_message_ts = result['ts']
             
             # Collect streaming response with real-time display
-            response_lines = []
-            tools_used = []
+            stream = CortexStreamParser()
+            tools_used = ctx.tools_used
             current_thinking = ""
-            planning_updates = []
-            thinking_updates = []  # Track thinking content for Slack updates
-            timeline = []  # Chronological timeline of status and thinking events
+            planning_updates = ctx.planning_updates
+            thinking_updates = ctx.thinking_updates
+            timeline = ctx.timeline
             
             if DEBUG:
                 print("\n🤖 AGENT PLANNING & EXECUTION:")
                 print("="*50)
 
-            line_count = 0
-            current_event = None
-            for line in response.iter_lines():
-                line_count += 1
-                if line:
-                    line_decoded = line.decode('utf-8')
-                    response_lines.append(line_decoded)
-                    
-                    # Check for event type first
-                    if line_decoded.startswith('event: '):
-                        current_event = line_decoded[7:].strip()
-                        continue
-                        
-                    if line_decoded.startswith('data: '):
-                        data_content = line_decoded[6:].strip()
-                        
-                        if data_content == '[DONE]':
-                            if DEBUG:
-                                print("\n✅ AGENT PROCESSING COMPLETE")
-                            break
-                        elif not data_content.startswith('['):
+            # Each data line is JSON decoded exactly once, by the stream parser
+            for stream_event in self._loop.iterate(self.client.stream(ctx.query, ctx.role, stream, ctx.history)):
+                ctx.metrics.setdefault('first_event_at', time.monotonic())
+                if stream_event.done:
+                    # Last event; let the loop drain the connection back into the pool
+                    if DEBUG:
+                        print("\n✅ AGENT PROCESSING COMPLETE")
+                    continue
+                current_event = stream_event.event
+                json_data = stream_event.data
+                # Handle status events (planning steps)
+                if current_event == 'response.status':
+                    if 'message' in json_data:
+                        status_msg = json_data['message']
+                        print(f"🔹 STATUS: {status_msg}")
+
+                        # Add all planning steps to the details (now that header is "Thinking")
+                        planning_updates.append(status_msg)
+                        timeline.append({'type': 'status', 'content': status_msg})
+
+                        # Update Slack in real-time for planning steps (keep collapsed by default)
+                        if ctx.slack_app and ctx.planning_message_ts and ctx.channel:
                             try:
-                                json_data = json.loads(data_content)
-                                
-                                # Handle status events (planning steps)
-                                if current_event == 'response.status':
-                                    if 'message' in json_data:
-                                        status_msg = json_data['message']
-                                        print(f"🔹 STATUS: {status_msg}")
-                                        
-                                        # Add all planning steps to the details (now that header is "Thinking")
-                                        planning_updates.append(status_msg)
-                                        timeline.append({'type': 'status', 'content': status_msg})
-                                        
-                                        # Update Slack in real-time for planning steps (keep collapsed by default)
-                                        if self.slack_app and self.planning_message_ts and self.planning_channel:
-                                            try:
-                                                step_count = len(planning_updates)
-                                                latest_step = planning_updates[-1] if planning_updates else "Processing..."
-                                                
-                                                # Show summary with step count and latest step (no button while thinking)
-                                                summary_text = f"*🤔 Thinking...*\n\n_Latest: {latest_step}_"
-                                                
-                                                blocks = [
+                                step_count = len(planning_updates)
+                                latest_step = planning_updates[-1] if planning_updates else "Processing..."
+
+                                # Show summary with step count and latest step (no button while thinking)
+                                summary_text = f"*🤔 Thinking...*\n\n_Latest: {latest_step}_"
+
+                                blocks = [
+                                    {
+                                        "type": "section",
+                                        "text": {
+                                            "type": "mrkdwn",
+                                            "text": summary_text
+                                        }
+                                    }
+                                ]
+
+                                self._progress_updater(ctx.slack_app.client).update(
+                                    ctx.channel,
+                                    ctx.planning_message_ts,
+                                    blocks=blocks
+                                )
+                                print(f"⚡ Queued planning update: {step_count} steps")
+                            except Exception as e:
+                                print(f"❌ Error updating planning message: {e}")
+                                if DEBUG:
+                                    import traceback
+                                    print(f"❌ Full error: {traceback.format_exc()}")
+                    continue
+
+                # Handle thinking events (real-time thinking content)
+                elif current_event == 'response.thinking.delta':
+                    if 'text' in json_data:
+                        thinking_text = json_data['text']
+                        # Extract content from <thinking> tags and print without tags
+                        import re
+                        thinking_match = re.search(r'<thinking>(.*?)</thinking>', thinking_text, re.DOTALL)
+                        if thinking_match:
+                            clean_thinking = thinking_match.group(1).strip()
+                            if clean_thinking:
+                                print(f"THINKING COMPLETE: {clean_thinking}")
+                                # Replace the last thinking update with complete version
+                                if thinking_updates:
+                                    thinking_updates[-1] = clean_thinking
+                                    # Update timeline entry if it exists
+                                    for i in range(len(timeline) - 1, -1, -1):
+                                        if timeline[i]['type'] == 'thinking':
+                                            timeline[i]['content'] = clean_thinking.strip()
+                                            break
+                                else:
+                                    thinking_updates.append(clean_thinking)
+                                    timeline.append({'type': 'thinking', 'content': clean_thinking.strip()})
+                                self._update_slack_with_thinking(ctx)
+                        else:
+                            # Handle streaming text fragments (preserve spacing from API)
+                            clean_text = thinking_text.replace('<thinking>', '').replace('</thinking>', '')
+                            if clean_text:
+                                # Check content_index to handle multiple thinking streams
+                                content_index = json_data.get('content_index', 0)
+
+                                # Ensure we have enough thinking slots
+                                while len(thinking_updates) <= content_index:
+                                    thinking_updates.append("")
+
+                                # For streaming, print text directly
+                                if not thinking_updates[content_index]:
+                                    print(f"\nTHINKING: {clean_text}", end='', flush=True)
+                                    # Add new thinking entry to timeline (strip leading/trailing whitespace)
+                                    timeline.append({'type': 'thinking', 'content': clean_text.strip(), 'content_index': content_index})
+                                else:
+                                    print(f"{clean_text}", end='', flush=True)
+
+                                # Accumulate text exactly as provided by the API (spacing is correct)
+                                thinking_updates[content_index] += clean_text
+
+                                # Update the timeline entry for this content_index
+                                for i in range(len(timeline) - 1, -1, -1):
+                                    if (timeline[i]['type'] == 'thinking' and 
+                                        timeline[i].get('content_index') == content_index):
+                                        timeline[i]['content'] = thinking_updates[content_index].strip()
+                                        break
+
+                                self._update_slack_with_thinking(ctx)
+                    continue
+
+                elif current_event == 'response.thinking':
+                    if 'text' in json_data:
+                        thinking_text = json_data['text']
+                        # Extract content from <thinking> tags
+                        import re
+                        thinking_match = re.search(r'<thinking>(.*?)</thinking>', thinking_text, re.DOTALL)
+                        if thinking_match:
+                            clean_thinking = thinking_match.group(1).strip()
+                            if clean_thinking:
+                                print(f"\n\nTHINKING COMPLETE: {clean_thinking}")
+                                print("=" * 50)
+                                # Use content_index to place in correct slot
+                                content_index = json_data.get('content_index', 0)
+
+                                # Ensure we have enough thinking slots
+                                while len(thinking_updates) <= content_index:
+                                    thinking_updates.append("")
+
+                                # Replace the content at the correct index
+                                thinking_updates[content_index] = clean_thinking
+
+                                # Update or add to timeline
+                                timeline_updated = False
+                                for i in range(len(timeline) - 1, -1, -1):
+                                    if (timeline[i]['type'] == 'thinking' and 
+                                        timeline[i].get('content_index') == content_index):
+                                        timeline[i]['content'] = clean_thinking.strip()
+                                        timeline_updated = True
+                                        break
+
+                                if not timeline_updated:
+                                    timeline.append({'type': 'thinking', 'content': clean_thinking.strip(), 'content_index': content_index})
+
+                                self._update_slack_with_thinking(ctx)
+                    continue
+
+                # Handle answer text deltas: render the partial answer into Slack
+                if current_event == 'response.text.delta':
+                    if self.stream_answer and ctx.slack_say:
+                        now = time.monotonic()
+                        if now - ctx.metrics.get('answer_updated_at', 0) >= self.progress_interval:
+                            ctx.metrics['answer_updated_at'] = now
+                            self._render_answer(ctx, stream.text, final=False)
+                    continue
+
+                # Handle final response event (new format)
+                if current_event == 'response':
+                    print(f"🎯 FINAL RESPONSE EVENT: Found final response data")
+                    continue
+
+                # Handle message deltas (streaming content)
+                if json_data.get('object') == 'message.delta':
+                    delta = json_data.get('delta', {})
+
+                    # Display thinking/planning text as it streams
+                    # Note: response.text.delta contains the final answer delta with SQL results already included
+                    if 'content' in delta:
+                        for content_item in delta['content']:
+                            if content_item.get('type') == 'text':
+                                text_delta = content_item.get('text', '')
+                                if text_delta:
+                                    current_thinking += text_delta
+                                    # Only show first part as thinking
+                                    if len(current_thinking) < 200:
+                                        if DEBUG:
+                                            print(f"🧠 {text_delta}", end='', flush=True)
+
+                            elif content_item.get('type') == 'tool_use':
+                                tool_data = content_item.get('tool_use', {})
+                                tool_name = tool_data.get('name', 'unknown')
+                                if tool_name not in tools_used:
+                                    tools_used.append(tool_name)
+                                    if DEBUG:
+                                        print(f"\n🔧 USING TOOL: {tool_name}")
+                                    planning_updates.append(f"Using {tool_name}")
+                                    timeline.append({'type': 'status', 'content': f"Using {tool_name}"})
+
+                                    # Show tool parameters if available
+                                    if 'input' in tool_data:
+                                        tool_input = tool_data['input']
+                                        if isinstance(tool_input, dict):
+                                            for key, value in tool_input.items():
+                                                if isinstance(value, str) and len(value) < 100:
+                                                    if DEBUG:
+                                                        print(f"   📝 {key}: {value}")
+
+                            elif content_item.get('type') == 'tool_result':
+                                if DEBUG:
+                                    print(f"✅ Tool execution completed")
+
+                                # Check for verification information in tool result
+                                tool_result = content_item.get('tool_result', {})
+                                if tool_result:
+                                    # Check for verification fields (debug only)
+                                    if DEBUG and 'verification' in tool_result:
+                                        print(f"   🔍 Verification: {tool_result['verification']}")
+                                    if DEBUG and 'validated' in tool_result:
+                                        print(f"   ✅ Validated: {tool_result['validated']}")
+                                    if DEBUG and 'query_verified' in tool_result:
+                                        print(f"   🎯 Query Verified: {tool_result['query_verified']}")
+                                    if DEBUG and 'verified_query_used' in tool_result:
+                                        print(f"   ✅ Verified Query Used: {tool_result['verified_query_used']}")
+                                    if DEBUG and 'query_validation' in tool_result:
+                                        print(f"   📋 Query Validation: {tool_result['query_validation']}")
+
+                                    # Also check nested JSON content (debug only)
+                                    if DEBUG and isinstance(tool_result, dict) and 'json' in tool_result:
+                                        json_data = tool_result['json']
+                                        if 'verification' in json_data:
+                                            print(f"   🔍 JSON Verification: {json_data['verification']}")
+                                        if 'validated' in json_data:
+                                            print(f"   ✅ JSON Validated: {json_data['validated']}")
+                                        if 'query_verified' in json_data:
+                                            print(f"   🎯 JSON Query Verified: {json_data['query_verified']}")
+                                        if 'verified_query_used' in json_data:
+                                            print(f"   ✅ JSON Verified Query Used: {json_data['verified_query_used']}")
+
+                # Handle objects without explicit type (status updates, tool metadata)
+                elif json_data.get('object') is None:
+                    if 'status' in json_data:
+                        status = json_data.get('status', '')
+                        status_msg = json_data.get('status_message', '')
+                        if status and status not in ['REASONING_AGENT_STOP']:  # Filter noise
+                            if DEBUG:
+                                print(f"\n🔹 STATUS: {status.replace('_', ' ').title()}")
+                                if status_msg:
+                                    print(f"   📝 {status_msg}")
+
+                            # Always append status messages for Slack updates (regardless of DEBUG)
+                            if status_msg:
+                                planning_updates.append(status_msg)
+                                timeline.append({'type': 'status', 'content': status_msg})
+
+                                # Update planning message with new steps (keep collapsed by default)
+                                if ctx.slack_app and ctx.planning_message_ts and len(planning_updates) % 2 == 0:  # Every 2nd update
+                                    try:
+                                        # Update the existing planning message with current step count
+                                        step_count = len(planning_updates)
+                                        latest_step = planning_updates[-1] if planning_updates else "Processing..."
+
+                                        channel = ctx.channel
+                                        if channel:
+                                            self._progress_updater(ctx.slack_app.client).update(
+                                                channel,
+                                                ctx.planning_message_ts,
+                                                text="🤔 Planning the next steps...",
+                                                blocks=[
                                                     {
                                                         "type": "section",
                                                         "text": {
                                                             "type": "mrkdwn",
-                                                            "text": summary_text
+                                                            "text": f"*🤔 Planning the next steps...* ({step_count} steps)\n\n_Latest: {latest_step}_"
                                                         }
+                                                    },
+                                                    {
+                                                        "type": "actions",
+                                                        "elements": [
+                                                            {
+                                                                "type": "button",
+                                                                "text": {
+                                                                    "type": "plain_text",
+                                                                    "text": "📋 Show Details"
+                                                                },
+                                                                "action_id": "show_planning_details",
+                                                                "value": "show"
+                                                            }
+                                                        ]
                                                     }
                                                 ]
-                                                
-                                                self.slack_app.client.chat_update(
-                                                    channel=self.planning_channel,
-                                                    ts=self.planning_message_ts,
-                                                    blocks=blocks
-                                                )
-                                                print(f"⚡ Updated planning: {step_count} steps")
-                                            except Exception as e:
-                                                print(f"❌ Error updating planning message: {e}")
-                                                if DEBUG:
-                                                    import traceback
-                                                    print(f"❌ Full error: {traceback.format_exc()}")
-                                    continue
-                                
-                                # Handle thinking events (real-time thinking content)
-                                elif current_event == 'response.thinking.delta':
-                                    if 'text' in json_data:
-                                        thinking_text = json_data['text']
-                                        # Extract content from <thinking> tags and print without tags
-                                        import re
-                                        thinking_match = re.search(r'<thinking>(.*?)</thinking>', thinking_text, re.DOTALL)
-                                        if thinking_match:
-                                            clean_thinking = thinking_match.group(1).strip()
-                                            if clean_thinking:
-                                                print(f"THINKING COMPLETE: {clean_thinking}")
-                                                # Replace the last thinking update with complete version
-                                                if thinking_updates:
-                                                    thinking_updates[-1] = clean_thinking
-                                                    # Update timeline entry if it exists
-                                                    for i in range(len(timeline) - 1, -1, -1):
-                                                        if timeline[i]['type'] == 'thinking':
-                                                            timeline[i]['content'] = clean_thinking.strip()
-                                                            break
-                                                else:
-                                                    thinking_updates.append(clean_thinking)
-                                                    timeline.append({'type': 'thinking', 'content': clean_thinking.strip()})
-                                                self._update_slack_with_thinking(planning_updates, thinking_updates)
-                                        else:
-                                            # Handle streaming text fragments (preserve spacing from API)
-                                            clean_text = thinking_text.replace('<thinking>', '').replace('</thinking>', '')
-                                            if clean_text:
-                                                # Check content_index to handle multiple thinking streams
-                                                content_index = json_data.get('content_index', 0)
-                                                
-                                                # Ensure we have enough thinking slots
-                                                while len(thinking_updates) <= content_index:
-                                                    thinking_updates.append("")
-                                                
-                                                # For streaming, print text directly
-                                                if not thinking_updates[content_index]:
-                                                    print(f"\nTHINKING: {clean_text}", end='', flush=True)
-                                                    # Add new thinking entry to timeline (strip leading/trailing whitespace)
-                                                    timeline.append({'type': 'thinking', 'content': clean_text.strip(), 'content_index': content_index})
-                                                else:
-                                                    print(f"{clean_text}", end='', flush=True)
-                                                
-                                                # Accumulate text exactly as provided by the API (spacing is correct)
-                                                thinking_updates[content_index] += clean_text
-                                                
-                                                # Update the timeline entry for this content_index
-                                                for i in range(len(timeline) - 1, -1, -1):
-                                                    if (timeline[i]['type'] == 'thinking' and 
-                                                        timeline[i].get('content_index') == content_index):
-                                                        timeline[i]['content'] = thinking_updates[content_index].strip()
-                                                        break
-                                                
-                                                self._update_slack_with_thinking(planning_updates, thinking_updates)
-                                    continue
-                                
-                                elif current_event == 'response.thinking':
-                                    if 'text' in json_data:
-                                        thinking_text = json_data['text']
-                                        # Extract content from <thinking> tags
-                                        import re
-                                        thinking_match = re.search(r'<thinking>(.*?)</thinking>', thinking_text, re.DOTALL)
-                                        if thinking_match:
-                                            clean_thinking = thinking_match.group(1).strip()
-                                            if clean_thinking:
-                                                print(f"\n\nTHINKING COMPLETE: {clean_thinking}")
-                                                print("=" * 50)
-                                                # Use content_index to place in correct slot
-                                                content_index = json_data.get('content_index', 0)
-                                                
-                                                # Ensure we have enough thinking slots
-                                                while len(thinking_updates) <= content_index:
-                                                    thinking_updates.append("")
-                                                
-                                                # Replace the content at the correct index
-                                                thinking_updates[content_index] = clean_thinking
-                                                
-                                                # Update or add to timeline
-                                                timeline_updated = False
-                                                for i in range(len(timeline) - 1, -1, -1):
-                                                    if (timeline[i]['type'] == 'thinking' and 
-                                                        timeline[i].get('content_index') == content_index):
-                                                        timeline[i]['content'] = clean_thinking.strip()
-                                                        timeline_updated = True
-                                                        break
-                                                
-                                                if not timeline_updated:
-                                                    timeline.append({'type': 'thinking', 'content': clean_thinking.strip(), 'content_index': content_index})
-                                                
-                                                self._update_slack_with_thinking(planning_updates, thinking_updates)
-                                    continue
-                                
-                                # Handle final response event (new format)
-                                if current_event == 'response':
-                                    print(f"🎯 FINAL RESPONSE EVENT: Found final response data")
-                                    continue
-                                
-                                # Handle message deltas (streaming content)
-                                if json_data.get('object') == 'message.delta':
-                                    delta = json_data.get('delta', {})
-                                    
-                                    # Display thinking/planning text as it streams
-                                    # Note: response.text.delta contains the final answer delta with SQL results already included
-                                    if 'content' in delta:
-                                        for content_item in delta['content']:
-                                            if content_item.get('type') == 'text':
-                                                text_delta = content_item.get('text', '')
-                                                if text_delta:
-                                                    current_thinking += text_delta
-                                                    # Only show first part as thinking
-                                                    if len(current_thinking) < 200:
-                                                        if DEBUG:
-                                                            print(f"🧠 {text_delta}", end='', flush=True)
-                                            
-                                            elif content_item.get('type') == 'tool_use':
-                                                tool_data = content_item.get('tool_use', {})
-                                                tool_name = tool_data.get('name', 'unknown')
-                                                if tool_name not in tools_used:
-                                                    tools_used.append(tool_name)
-                                                    if DEBUG:
-                                                        print(f"\n🔧 USING TOOL: {tool_name}")
-                                                    planning_updates.append(f"Using {tool_name}")
-                                                    timeline.append({'type': 'status', 'content': f"Using {tool_name}"})
-                                                    
-                                                    # Show tool parameters if available
-                                                    if 'input' in tool_data:
-                                                        tool_input = tool_data['input']
-                                                        if isinstance(tool_input, dict):
-                                                            for key, value in tool_input.items():
-                                                                if isinstance(value, str) and len(value) < 100:
-                                                                    if DEBUG:
-                                                                        print(f"   📝 {key}: {value}")
-                                            
-                                            elif content_item.get('type') == 'tool_result':
-                                                if DEBUG:
-                                                    print(f"✅ Tool execution completed")
-                                                
-                                                # Check for verification information in tool result
-                                                tool_result = content_item.get('tool_result', {})
-                                                if tool_result:
-                                                    # Check for verification fields (debug only)
-                                                    if DEBUG and 'verification' in tool_result:
-                                                        print(f"   🔍 Verification: {tool_result['verification']}")
-                                                    if DEBUG and 'validated' in tool_result:
-                                                        print(f"   ✅ Validated: {tool_result['validated']}")
-                                                    if DEBUG and 'query_verified' in tool_result:
-                                                        print(f"   🎯 Query Verified: {tool_result['query_verified']}")
-                                                    if DEBUG and 'verified_query_used' in tool_result:
-                                                        print(f"   ✅ Verified Query Used: {tool_result['verified_query_used']}")
-                                                    if DEBUG and 'query_validation' in tool_result:
-                                                        print(f"   📋 Query Validation: {tool_result['query_validation']}")
-                                                    
-                                                    # Also check nested JSON content (debug only)
-                                                    if DEBUG and isinstance(tool_result, dict) and 'json' in tool_result:
-                                                        json_data = tool_result['json']
-                                                        if 'verification' in json_data:
-                                                            print(f"   🔍 JSON Verification: {json_data['verification']}")
-                                                        if 'validated' in json_data:
-                                                            print(f"   ✅ JSON Validated: {json_data['validated']}")
-                                                        if 'query_verified' in json_data:
-                                                            print(f"   🎯 JSON Query Verified: {json_data['query_verified']}")
-                                                        if 'verified_query_used' in json_data:
-                                                            print(f"   ✅ JSON Verified Query Used: {json_data['verified_query_used']}")
-                                
-                                # Handle objects without explicit type (status updates, tool metadata)
-                                elif json_data.get('object') is None:
-                                    if 'status' in json_data:
-                                        status = json_data.get('status', '')
-                                        status_msg = json_data.get('status_message', '')
-                                        if status and status not in ['REASONING_AGENT_STOP']:  # Filter noise
-                                            if DEBUG:
-                                                print(f"\n🔹 STATUS: {status.replace('_', ' ').title()}")
-                                                if status_msg:
-                                                    print(f"   📝 {status_msg}")
-                                            
-                                            # Always append status messages for Slack updates (regardless of DEBUG)
-                                            if status_msg:
-                                                planning_updates.append(status_msg)
-                                                timeline.append({'type': 'status', 'content': status_msg})
-                                                
-                                                # Update planning message with new steps (keep collapsed by default)
-                                                if self.slack_app and self.planning_message_ts and len(planning_updates) % 2 == 0:  # Every 2nd update
-                                                    try:
-                                                        # Update the existing planning message with current step count
-                                                        step_count = len(planning_updates)
-                                                        latest_step = planning_updates[-1] if planning_updates else "Processing..."
-                                                        
-                                                        channel = getattr(self.slack_app, '_channel_id', None)
-                                                        if channel:
-                                                            self.slack_app.client.chat_update(
-                                                                channel=channel,
-                                                                ts=self.planning_message_ts,
-                                                                text="🤔 Planning the next steps...",
-                                                                blocks=[
-                                                                    {
-                                                                        "type": "section",
-                                                                        "text": {
-                                                                            "type": "mrkdwn",
-                                                                            "text": f"*🤔 Planning the next steps...* ({step_count} steps)\n\n_Latest: {latest_step}_"
-                                                                        }
-                                                                    },
-                                                                    {
-                                                                        "type": "actions",
-                                                                        "elements": [
-                                                                            {
-                                                                                "type": "button",
-                                                                                "text": {
-                                                                                    "type": "plain_text",
-                                                                                    "text": "📋 Show Details"
-                                                                                },
-                                                                                "action_id": "show_planning_details",
-                                                                                "value": "show"
-                                                                            }
-                                                                        ]
-                                                                    }
-                                                                ]
-                                                            )
-                                                    except Exception as e:
-                                                        if DEBUG:
-                                                            print(f"Failed to update planning message: {e}")
-                                                        # Fallback to new message
-                                                        if self.slack_say:
-                                                            latest_updates = planning_updates[-3:]
-                                                            update_text = "\n".join(f"• {update}" for update in latest_updates)
-                                                            self.slack_say(
-                                                                text="🔄 Agent working...",
-                                                                blocks=[
-                                                                    {
-                                                                        "type": "section",
-                                                                        "text": {
-                                                                            "type": "mrkdwn",
-                                                                            "text": f"*🔄 Progress Update:*\n{update_text}"
-                                                                        }
-                                                                    }
-                                                                ]
-                                                            )
-                                    
-                                    # Display tool metadata if present
-                                    if 'tool_metadata' in json_data:
-                                        tool_meta = json_data['tool_metadata']
+                                            )
+                                    except Exception as e:
                                         if DEBUG:
-                                            print(f"\n🔧 TOOL METADATA:")
-                                            if isinstance(tool_meta, dict):
-                                                for key, value in tool_meta.items():
-                                                    print(f"   📋 {key}: {value}")
-                                            
-                            except json.JSONDecodeError:
-                                pass
-            
-            # Parse response with CortexResponseParser
-            has_sse_data = any(line.startswith('data: ') for line in response_lines)
-            
-            if has_sse_data:
-                parsed_response = self.parser.parse_sse_response(response_lines)
-            else:
-                parsed_response = self.parser.parse_json_response('\n'.join(response_lines))
+                                            print(f"Failed to update planning message: {e}")
+                                        # Fallback to new message
+                                        if ctx.slack_say:
+                                            latest_updates = planning_updates[-3:]
+                                            update_text = "\n".join(f"• {update}" for update in latest_updates)
+                                            ctx.slack_say(
+                                                text="🔄 Agent working...",
+                                                blocks=[
+                                                    {
+                                                        "type": "section",
+                                                        "text": {
+                                                            "type": "mrkdwn",
+                                                            "text": f"*🔄 Progress Update:*\n{update_text}"
+                                                        }
+                                                    }
+                                                ]
+                                            )
+
+                    # Display tool metadata if present
+                    if 'tool_metadata' in json_data:
+                        tool_meta = json_data['tool_metadata']
+                        if DEBUG:
+                            print(f"\n🔧 TOOL METADATA:")
+                            if isinstance(tool_meta, dict):
+                                for key, value in tool_meta.items():
+                                    print(f"   📋 {key}: {value}")
+
+            # Finalize the answer assembled while streaming
+            parsed_response = stream.finalize()
             
             # Extract summary for business display
             summary = self.parser.extract_summary(parsed_response)
@@ -431,20 +453,19 @@ class CortexChat:
                 print(final_text)
                 print(f"{'='*80}")
             
-            # Store data for collapsible planning details
-            self.planning_steps = planning_updates
-            # Filter out empty thinking content for details display
-            self.thinking_steps = [content.strip() for content in thinking_updates if content and content.strip()]
-            # Store chronological timeline for proper ordering
-            self.timeline = timeline
-            self.sql_queries = summary.get('sql_queries', [])
-            self.verification_info = summary.get('verification_info', {})
-            self.verified_query_used = summary.get('verified_query_used', False)
+            # Replace the streamed partial answer with the complete one
+            if self.stream_answer and final_text:
+                self._render_answer(ctx, final_text, final=True)
+
+            # Keep the summary on the request context for the collapsible planning details
+            ctx.summary = summary
+            ctx.metrics['stream_ended_at'] = time.monotonic()
+            ctx.metrics['event_count'] = stream.event_count
             
             # Update planning message to show completion (now that summary data is available)
-            if planning_updates:
+            if planning_updates and self.show_planning:
                 # Try to update the existing planning message first
-                if self.slack_app and self.planning_message_ts:
+                if ctx.slack_app and ctx.planning_message_ts:
                     try:
                         step_count = len(planning_updates)
                         
@@ -468,10 +489,12 @@ class CortexChat:
                             summary_text += f" • Includes {' and '.join(additional_info)}"
                         summary_text += "_"
                         
-                        if self.planning_channel:
-                            self.slack_app.client.chat_update(
-                                channel=self.planning_channel,
-                                ts=self.planning_message_ts,
+                        if ctx.channel:
+                            # Replaces any throttled update still queued, then waits for delivery
+                            progress = self._progress_updater(ctx.slack_app.client)
+                            progress.update(
+                                ctx.channel,
+                                ctx.planning_message_ts,
                                 text="✅ Thinking completed!",
                                 blocks=[
                                     {
@@ -497,6 +520,8 @@ class CortexChat:
                                     }
                                 ]
                             )
+                            if not progress.flush(ctx.channel, ctx.planning_message_ts):
+                                raise Exception("Completion update was not delivered")
                             print(f"✅ Updated completion message with summary info")
                         else:
                             raise Exception("No channel available")
@@ -504,9 +529,9 @@ class CortexChat:
                         if DEBUG:
                             print(f"Failed to update completion message: {e}")
                         # Fallback to new message
-                        if self.slack_say:
+                        if ctx.slack_say:
                             all_updates = "\n".join(f"• {update}" for update in planning_updates)
-                            self.slack_say(
+                            ctx.slack_say(
                                 text="✅ Thinking completed!",
                                 blocks=[
                                     {
@@ -519,9 +544,9 @@ class CortexChat:
                                 ]
                             )
                 # Fallback to new message if no app available
-                elif self.slack_say:
+                elif ctx.slack_say:
                     all_updates = "\n".join(f"• {update}" for update in planning_updates)
-                    self.slack_say(
+                    ctx.slack_say(
                         text="✅ Thinking completed!",
                         blocks=[
                             {
@@ -551,52 +576,108 @@ class CortexChat:
             
             return summary
             
-        except requests.exceptions.Timeout:
-            print(f"🔍 Timeout error caught")
-            return self._handle_error("Request took longer than 120 seconds", "Request timeout")
-        except requests.exceptions.RequestException as e:
-            print(f"🔍 RequestException error caught: {e}")
-            # Get more detailed error information
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_details = e.response.text
-                    print(f"🔍 Response status code: {e.response.status_code}")
-                    print(f"🔍 Response headers: {dict(e.response.headers)}")
-                    print(f"🔍 Response body: {error_details}")
-                except:
-                    print(f"🔍 Could not get response details")
-            return self._handle_error(f"Request error: {e}", "Request failed")
+        except asyncio.TimeoutError as e:
+            return self._handle_error(ctx, e, "Request timeout")
+        except (AgentHTTPError, aiohttp.ClientError) as e:
+            return self._handle_error(ctx, e, "Request failed")
         except Exception as e:
-            print(f"🔍 General exception caught: {type(e).__name__}: {e}")
-            return self._handle_error(f"Unexpected error: {e}", "Unexpected error")
+            return self._handle_error(ctx, e, "Unexpected error")
 
-    def _handle_error(self, error_msg: str, slack_title: str) -> dict:
-        """Helper method to handle errors consistently."""
-        if DEBUG:
-            print(f"\n{error_msg}")
-        if self.slack_say:
-            self.slack_say(
+    def _handle_error(self, ctx: ChatRequestContext, error: Exception, slack_title: str) -> dict:
+        """Turn an exception into the client's error summary and report it in Slack."""
+        summary = self.client.error_summary(error)
+        self._post_error(ctx, summary, slack_title)
+        return summary
+
+    def _post_error(self, ctx: ChatRequestContext, summary: dict, slack_title: str):
+        """Post an error summary to the request's Slack thread."""
+        if ctx.slack_say:
+            ctx.slack_say(
                 text=f"❌ {slack_title}",
                 blocks=[{
                     "type": "section",
-                    "text": {"type": "plain_text", "text": f"❌ {error_msg}"}
+                    "text": {"type": "plain_text", "text": f"❌ {summary.get('text', '')}"}
                 }]
             )
-        return {"text": f"Error: {error_msg}", "sql_queries": [], "citations": []}
+
+    def _render_answer(self, ctx: ChatRequestContext, text: str, final: bool):
+        """
+        Post or update the answer message with the text generated so far.
+
+        Partial answers are cut at a markdown-safe boundary and marked with a
+        cursor; updates go through the throttled progress updater. The final
+        render waits for delivery and falls back to a new message.
+        """
+        if not text or not text.strip() or not ctx.slack_say:
+            return
+        rendered = clip_message(format_text_for_slack(text if final else markdown_safe_prefix(text) + " ▌"))
+        try:
+            if ctx.answer_message_ts is None:
+                result = ctx.slack_say(text=rendered)
+                ctx.metrics.setdefault('first_answer_at', time.monotonic())
+                if hasattr(result, 'get') and result.get('ts'):
+                    ctx.answer_message_ts = result['ts']
+                return
+            if not (ctx.slack_app and ctx.channel):
+                if final:
+                    ctx.slack_say(text=rendered)
+                return
+            progress = self._progress_updater(ctx.slack_app.client)
+            progress.update(ctx.channel, ctx.answer_message_ts, text=rendered)
+            if final and not progress.flush(ctx.channel, ctx.answer_message_ts):
+                ctx.slack_say(text=rendered)
+        except Exception as e:
+            print(f"❌ Error streaming answer to Slack: {e}")
+
+    def _announce_shared(self, ctx: ChatRequestContext):
+        """Tell a coalesced caller its answer comes from an identical question already running."""
+        if ctx.slack_say and self.show_planning:
+            try:
+                ctx.slack_say(text="🤔 Thinking... (same question is already being answered)")
+            except Exception as e:
+                print(f"❌ Error posting shared-answer notice: {e}")
+
+    def transport_stats(self) -> dict:
+        """Connection reuse counters for the agent transport."""
+        return self.client.transport_stats()
+
+    def close(self):
+        """Close the agent client's pooled connections and the Slack progress senders."""
+        with self._progress_lock:
+            updaters, self._progress = list(self._progress.values()), {}
+        for updater in updaters:
+            updater.close()
+        self._loop.run(self.client.close())
 
     def set_slack_say_function(self, slack_say_function):
         """Set the Slack say function for real-time updates."""
         self.slack_say = slack_say_function
     
     def set_slack_app(self, slack_app, channel_id=None):
-        """Set the Slack app and channel for message updates."""
+        """Set the default Slack app and channel for message updates."""
         self.slack_app = slack_app
         if channel_id:
-            # Handle both channel ID string and channel object
-            if isinstance(channel_id, dict):
-                channel_id = channel_id.get('id', channel_id)
-            setattr(slack_app, '_channel_id', channel_id)
+            self.channel_id = self._normalize_channel(channel_id)
+
+    @staticmethod
+    def _normalize_channel(channel_id):
+        """Handle both channel ID string and channel object."""
+        if isinstance(channel_id, dict):
+            channel_id = channel_id.get('id', channel_id)
+        return channel_id
     
+    def _progress_updater(self, client) -> SlackProgressUpdater:
+        """Throttled chat_update sender for a Slack client, shared by all requests using it."""
+        with self._progress_lock:
+            updater = self._progress.get(id(client))
+            if updater is None or updater.client is not client:
+                if updater is not None:
+                    # The id now belongs to another client; stop the old sender thread
+                    updater.close()
+                updater = SlackProgressUpdater(client, min_interval=self.progress_interval)
+                self._progress[id(client)] = updater
+            return updater
+
     def _smart_truncate(self, text, max_length=200, suffix="..."):
         """Smart truncation that preserves word and sentence boundaries."""
         if len(text) <= max_length:
@@ -627,9 +708,11 @@ class CortexChat:
         
         return result.strip() + suffix if result.strip() else text[:max_length-len(suffix)] + suffix
 
-    def _update_slack_with_thinking(self, planning_updates, thinking_updates):
+    def _update_slack_with_thinking(self, ctx: ChatRequestContext):
         """Update Slack with combined planning and thinking updates in real-time."""
-        if not (self.slack_app and self.planning_message_ts and self.planning_channel):
+        planning_updates = ctx.planning_updates
+        thinking_updates = ctx.thinking_updates
+        if not (ctx.slack_app and ctx.planning_message_ts and ctx.channel):
             return
             
         try:
@@ -692,9 +775,10 @@ class CortexChat:
                 }
             ]
             
-            self.slack_app.client.chat_update(
-                channel=self.planning_channel,
-                ts=self.planning_message_ts,
+            # Coalesced with other deltas and sent off the streaming thread
+            self._progress_updater(ctx.slack_app.client).update(
+                ctx.channel,
+                ctx.planning_message_ts,
                 blocks=blocks
             )
             
@@ -704,10 +788,69 @@ class CortexChat:
                 import traceback
                 print(f"❌ Full error: {traceback.format_exc()}")
 
-    def chat(self, query: str, role: str) -> dict[str, any]:
+    def chat(self,
+            query: str,
+            role: str,
+            slack_say=None,
+            slack_app=None,
+            channel_id=None,
+            thread_ts=None,
+            context: ChatRequestContext = None
+        ) -> dict[str, any]:
         """
         Enhanced chat method with real-time streaming and planning display.
+
+        Reentrant: all per-question state lives in a ChatRequestContext, so a
+        single instance can answer several questions concurrently. Slack
+        targets default to the ones configured on the instance.
+
+        Args:
+            query: User question
+            role: Snowflake role sent as X-Snowflake-Role
+            slack_say: Say function for this request's Slack updates
+            slack_app: Slack app whose client updates the planning message
+            channel_id: Channel of the planning message
+            thread_ts: Slack thread of the question; earlier turns of the thread
+                       are sent along when memory is configured
+            context: Optional context to fill, for callers that want the timeline or metrics
+
         Returns: dict with keys: 'text', 'sql_queries', 'citations', 'suggestions', etc.
         """
-        result = self._retrieve_response(query, role)
+        ctx = context if context is not None else ChatRequestContext(query=query, role=role)
+        ctx.query = query
+        ctx.role = role
+        ctx.slack_say = slack_say or ctx.slack_say or self.slack_say
+        ctx.slack_app = slack_app or ctx.slack_app or self.slack_app
+        ctx.channel = self._normalize_channel(channel_id) if channel_id else (ctx.channel or self.channel_id)
+        if self.client.memory is not None:
+            ctx.conversation = ctx.conversation or conversation_key(ctx.channel, thread_ts, role)
+
+        # Cache, memory and coalescing rules are the client's, shared with AsyncCortexChat.chat
+        ctx.history, cached = self.client.lookup(query, role, ctx.conversation)
+        if cached is not None:
+            print(f"⚡ Cache hit for role {role}")
+            ctx.metrics['cache_hit'] = 1
+            ctx.summary = cached
+            if self.stream_answer:
+                self._render_answer(ctx, cached.get('text', ''), final=True)
+            return cached
+
+        key = self.client.coalesce_key(query, role, ctx.history)
+        if self.inflight is not None and key is not None:
+            result, shared = self.inflight.do(
+                key,
+                lambda: self._retrieve_response(ctx),
+                on_join=lambda: self._announce_shared(ctx)
+            )
+            if shared:
+                ctx.metrics['coalesced'] = 1
+                ctx.summary = result
+                if result.get('error'):
+                    # The leader reported the error in its own thread; tell this caller too
+                    self._post_error(ctx, result, "Request failed")
+                elif self.stream_answer:
+                    self._render_answer(ctx, result.get('text', ''), final=True)
+        else:
+            result, shared = self._retrieve_response(ctx), False
+        self.client.remember(query, role, ctx.conversation, ctx.history, result, shared)
         return result
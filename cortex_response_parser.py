@@ -9,13 +9,18 @@ https://docs.snowflake.com/en/user-guide/snowflake-cortex/cortex-agents-rest-api
 """
 
 import json
+import mmap
+import multiprocessing
+import os
 import re
-from typing import Dict, List, Any, Optional, Union, Iterator
+from typing import Dict, List, Any, Optional, Tuple, Union, Iterator
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import date, datetime, time, timedelta, timezone
 
+import fast_json
 
-@dataclass
+
+@dataclass(slots=True)
 class ToolUse:
     """Represents a tool use in a Cortex response."""
     id: str
@@ -24,12 +29,193 @@ class ToolUse:
     arguments: Dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
+class ResultSet:
+    """
+    Columnar copy of a result set returned by the agent in a tool result.
+
+    The agent already executed the SQL; when it ships the rows back (SQL API
+    format: resultSetMetaData + data) they can be rendered without running
+    the query again. statement_handle allows fetching the result by query id
+    when only the handle is present.
+    """
+    sql: Optional[str] = None
+    statement_handle: Optional[str] = None
+    columns: List[str] = field(default_factory=list)
+    column_types: List[str] = field(default_factory=list)
+    data: Optional[Dict[str, List[Any]]] = None  # column name -> values
+    num_rows: int = 0
+
+    @property
+    def has_data(self) -> bool:
+        """True when the rows themselves were returned, not just a handle."""
+        return self.data is not None and bool(self.columns)
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], sql: Optional[str] = None) -> "ResultSet":
+        """Build from a SQL API style payload ({'statementHandle', 'resultSetMetaData', 'data'})."""
+        metadata = payload.get('resultSetMetaData', {}) or {}
+        row_type = metadata.get('rowType', []) or []
+        columns = [column.get('name', f'COL_{i}') for i, column in enumerate(row_type)]
+        rows = payload.get('data')
+
+        data = None
+        if rows is not None and columns:
+            converters = [_column_converter(column) for column in row_type]
+            data = {name: [] for name in columns}
+            values = [data[name] for name in columns]
+            for row in rows:
+                for i, convert in enumerate(converters):
+                    values[i].append(convert(row[i]) if i < len(row) else None)
+
+        return cls(
+            sql=sql,
+            statement_handle=payload.get('statementHandle'),
+            columns=columns,
+            column_types=[column.get('type', '') for column in row_type],
+            data=data,
+            num_rows=metadata.get('numRows', len(rows) if rows is not None else 0)
+        )
+
+
+def _column_converter(column: Dict[str, Any]):
+    """Return a function converting SQL API string cells to Python values for a column."""
+    column_type = (column.get('type') or '').lower()
+
+    def convert_fixed(value):
+        if value is None:
+            return None
+        return int(value) if column.get('scale', 0) == 0 else float(value)
+
+    def convert_real(value):
+        return None if value is None else float(value)
+
+    def convert_boolean(value):
+        if value is None or isinstance(value, bool):
+            return value
+        return str(value).lower() in ('true', '1')
+
+    if column_type == 'fixed':
+        return convert_fixed
+    if column_type == 'real':
+        return convert_real
+    if column_type == 'boolean':
+        return convert_boolean
+    if column_type in _TEMPORAL_CONVERTERS:
+        return _temporal_converter(_TEMPORAL_CONVERTERS[column_type])
+    return lambda value: value
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch_parts(value: str) -> Tuple[int, int]:
+    """Split a 'seconds.fraction' SQL API cell into whole seconds and microseconds."""
+    seconds, _, fraction = value.partition('.')
+    micros = int((fraction + '000000')[:6]) if fraction else 0
+    if seconds.startswith('-') and micros:
+        return int(seconds) - 1, 1000000 - micros
+    return int(seconds), micros
+
+
+def _convert_date(value: str) -> date:
+    # Days since the epoch
+    return (_EPOCH + timedelta(days=int(value))).date()
+
+
+def _convert_time(value: str) -> time:
+    # Seconds since midnight
+    seconds, micros = _epoch_parts(value)
+    return (_EPOCH + timedelta(seconds=seconds, microseconds=micros)).time()
+
+
+def _convert_timestamp_ntz(value: str) -> datetime:
+    # Seconds since the epoch, wall-clock time without a time zone
+    seconds, micros = _epoch_parts(value)
+    return _EPOCH + timedelta(seconds=seconds, microseconds=micros)
+
+
+def _convert_timestamp_ltz(value: str) -> datetime:
+    # Seconds since the epoch of an instant; shown in UTC
+    return _convert_timestamp_ntz(value).replace(tzinfo=timezone.utc)
+
+
+def _convert_timestamp_tz(value: str) -> datetime:
+    # 'seconds offset', where offset is the zone's UTC offset in minutes plus 1440
+    epoch, _, offset = value.partition(' ')
+    instant = _convert_timestamp_ltz(epoch)
+    if not offset:
+        return instant
+    return instant.astimezone(timezone(timedelta(minutes=int(offset) - 1440)))
+
+
+_TEMPORAL_CONVERTERS = {
+    'date': _convert_date,
+    'time': _convert_time,
+    'timestamp_ntz': _convert_timestamp_ntz,
+    'timestamp_ltz': _convert_timestamp_ltz,
+    'timestamp_tz': _convert_timestamp_tz,
+}
+
+
+def _temporal_converter(convert):
+    """Wrap a date/time converter so nulls pass through and cells already formatted are kept."""
+    def converter(value):
+        if value is None:
+            return None
+        try:
+            return convert(str(value))
+        except (ValueError, OverflowError):
+            return value
+    return converter
+
+
+def _memo():
+    """Slot for a derived view that is computed on first access (not part of init, repr or eq)."""
+    return field(default=None, init=False, repr=False, compare=False)
+
+
+@dataclass(slots=True)
 class ToolResult:
-    """Represents a tool result in a Cortex response."""
+    """
+    Represents a tool result in a Cortex response.
+
+    The derived views (SQL, search results, verification, result set) are
+    computed on first access and memoized; content is not modified after
+    construction.
+    """
     tool_use_id: str
     content: List[Dict[str, Any]] = field(default_factory=list)
-    
+    _scanned: bool = field(default=False, init=False, repr=False, compare=False)
+    _sql_query: Optional[str] = _memo()
+    _search_results: Optional[List[Dict[str, Any]]] = _memo()
+    _verification: Optional[Dict[str, Any]] = _memo()
+    _result_set_done: bool = field(default=False, init=False, repr=False, compare=False)
+    _result_set: Optional[ResultSet] = _memo()
+
+    def _scan(self):
+        """Collect SQL, search results and verification fields in one pass over the content."""
+        if self._scanned:
+            return
+        sql_query = None
+        search_results = []
+        verification = {}
+        for item in self.content:
+            if isinstance(item, dict) and 'json' in item:
+                json_data = item['json']
+                if sql_query is None and 'sql' in json_data:
+                    sql_query = json_data['sql']
+                if 'searchResults' in json_data:
+                    search_results.extend(json_data['searchResults'])
+                # Check for various verification fields
+                for key in _VERIFICATION_KEYS:
+                    if key in json_data:
+                        verification[key] = json_data[key]
+        self._sql_query = sql_query
+        self._search_results = search_results
+        self._verification = verification
+        self._scanned = True
+
     @property
     def sql_query(self) -> Optional[str]:
         """
@@ -39,41 +225,43 @@ class ToolResult:
         The results are included in the final text response (response.text.delta).
         This method extracts queries for transparency/logging purposes only.
         """
-        for item in self.content:
-            if isinstance(item, dict) and 'json' in item:
-                if 'sql' in item['json']:
-                    return item['json']['sql']
-        return None
+        self._scan()
+        return self._sql_query
+    
+    @property
+    def result_set(self) -> Optional[ResultSet]:
+        """
+        Extract the result set of the executed SQL, when the agent returned one.
+
+        Accepts both 'result_set' and 'resultSet' keys; a bare statement handle
+        yields a ResultSet without data.
+        """
+        if not self._result_set_done:
+            self._result_set_done = True
+            for item in self.content:
+                if isinstance(item, dict) and 'json' in item:
+                    json_data = item['json']
+                    payload = json_data.get('result_set') or json_data.get('resultSet')
+                    if isinstance(payload, dict):
+                        self._result_set = ResultSet.from_payload(payload, sql=json_data.get('sql'))
+                        break
+                    if json_data.get('statementHandle'):
+                        self._result_set = ResultSet(sql=json_data.get('sql'),
+                                                     statement_handle=json_data['statementHandle'])
+                        break
+        return self._result_set
     
     @property
     def search_results(self) -> List[Dict[str, Any]]:
         """Extract search results from tool results."""
-        results = []
-        for item in self.content:
-            if isinstance(item, dict) and 'json' in item:
-                if 'searchResults' in item['json']:
-                    results.extend(item['json']['searchResults'])
-        return results
+        self._scan()
+        return self._search_results
     
     @property
     def verification_info(self) -> Dict[str, Any]:
         """Extract verification information from tool results."""
-        verification = {}
-        for item in self.content:
-            if isinstance(item, dict) and 'json' in item:
-                json_data = item['json']
-                # Check for various verification fields
-                if 'verification' in json_data:
-                    verification['verification'] = json_data['verification']
-                if 'validated' in json_data:
-                    verification['validated'] = json_data['validated']
-                if 'query_verified' in json_data:
-                    verification['query_verified'] = json_data['query_verified']
-                if 'verified_query_used' in json_data:
-                    verification['verified_query_used'] = json_data['verified_query_used']
-                if 'query_validation' in json_data:
-                    verification['query_validation'] = json_data['query_validation']
-        return verification
+        self._scan()
+        return self._verification
     
     @property
     def is_verified_query(self) -> bool:
@@ -88,70 +276,116 @@ class ToolResult:
         )
 
 
-@dataclass
+_VERIFICATION_KEYS = ('verification', 'validated', 'query_verified', 'verified_query_used', 'query_validation')
+
+
+@dataclass(slots=True)
 class ParsedMessage:
-    """Represents a parsed message from Cortex response."""
+    """
+    Represents a parsed message from Cortex response.
+
+    text_content, tool_uses and tool_results are memoized; add content with
+    add_content() so they are recomputed.
+    """
     role: str
     content: List[Dict[str, Any]] = field(default_factory=list)
+    _text: Optional[str] = _memo()
+    _tool_uses: Optional[List[ToolUse]] = _memo()
+    _tool_results: Optional[List[ToolResult]] = _memo()
+
+    def add_content(self, item: Dict[str, Any]):
+        """Append a content item and drop the memoized views."""
+        self.content.append(item)
+        self._text = self._tool_uses = self._tool_results = None
     
     @property
     def text_content(self) -> str:
         """Extract text content from the message."""
-        text_parts = []
-        for item in self.content:
-            if item.get('type') == 'text':
-                text_parts.append(item.get('text', ''))
-        return ''.join(text_parts)
+        if self._text is None:
+            self._text = ''.join(item.get('text', '') for item in self.content if item.get('type') == 'text')
+        return self._text
     
     @property
     def tool_uses(self) -> List[ToolUse]:
         """Extract tool uses from the message."""
-        tools = []
-        for item in self.content:
-            if item.get('type') == 'tool_use':
-                tool_data = item.get('tool_use', {})
-                tools.append(ToolUse(
-                    id=tool_data.get('id', ''),
-                    name=tool_data.get('name', ''),
-                    type=tool_data.get('type', ''),
-                    arguments=tool_data.get('arguments', {})
-                ))
-        return tools
+        if self._tool_uses is None:
+            tools = []
+            for item in self.content:
+                if item.get('type') == 'tool_use':
+                    tool_data = item.get('tool_use', {})
+                    tools.append(ToolUse(
+                        id=tool_data.get('id', ''),
+                        name=tool_data.get('name', ''),
+                        type=tool_data.get('type', ''),
+                        arguments=tool_data.get('arguments', {})
+                    ))
+            self._tool_uses = tools
+        return self._tool_uses
     
     @property
     def tool_results(self) -> List[ToolResult]:
         """Extract tool results from the message."""
-        results = []
-        for item in self.content:
-            # Handle both old format ('tool_results') and new format ('tool_result')
-            if item.get('type') == 'tool_results':
-                tool_results_data = item.get('tool_results', {})
-                results.append(ToolResult(
-                    tool_use_id=tool_results_data.get('tool_use_id', ''),
-                    content=tool_results_data.get('content', [])
-                ))
-            elif item.get('type') == 'tool_result':
-                tool_result_data = item.get('tool_result', {})
-                results.append(ToolResult(
-                    tool_use_id=tool_result_data.get('tool_use_id', ''),
-                    content=tool_result_data.get('content', [])
-                ))
-        return results
-
-
-@dataclass 
+        if self._tool_results is None:
+            results = []
+            for item in self.content:
+                # Handle both old format ('tool_results') and new format ('tool_result')
+                if item.get('type') == 'tool_results':
+                    tool_results_data = item.get('tool_results', {})
+                    results.append(ToolResult(
+                        tool_use_id=tool_results_data.get('tool_use_id', ''),
+                        content=tool_results_data.get('content', [])
+                    ))
+                elif item.get('type') == 'tool_result':
+                    tool_result_data = item.get('tool_result', {})
+                    results.append(ToolResult(
+                        tool_use_id=tool_result_data.get('tool_use_id', ''),
+                        content=tool_result_data.get('content', [])
+                    ))
+            self._tool_results = results
+        return self._tool_results
+
+
+@dataclass(slots=True)
 class Suggestion:
     """Represents a suggestion in a Cortex response."""
     text: str
 
 
-@dataclass
+@dataclass(slots=True)
 class CortexResponse:
-    """Represents a complete parsed Cortex response."""
+    """
+    Represents a complete parsed Cortex response.
+
+    The views over tool results (sql_queries, result_sets, search_results,
+    citations) are collected in one pass on first access and memoized. Add
+    messages or content through add_message()/add_content(), or call
+    invalidate() after changing messages directly.
+    """
     messages: List[ParsedMessage] = field(default_factory=list)
     suggestions: List[Suggestion] = field(default_factory=list)
     status_messages: List[str] = field(default_factory=list)  # Add status messages for planning steps
     request_id: Optional[str] = None
+    _sql_queries: Optional[List[str]] = _memo()
+    _result_sets: Optional[List[ResultSet]] = _memo()
+    _search_results: Optional[List[Dict[str, Any]]] = _memo()
+    _citations: Optional[List[str]] = _memo()
+
+    def add_message(self, message: ParsedMessage):
+        """Append a message and drop the memoized views."""
+        self.messages.append(message)
+        self.invalidate()
+
+    def add_content(self, item: Dict[str, Any]):
+        """Append a content item to the last message, or to a new assistant message when there is none."""
+        if self.messages:
+            self.messages[-1].add_content(item)
+            self.invalidate()
+        else:
+            self.add_message(ParsedMessage(role='assistant', content=[item]))
+
+    def invalidate(self):
+        """Forget the memoized views (after modifying messages directly)."""
+        self._sql_queries = self._result_sets = self._search_results = self._citations = None
     
     @property
     def final_text(self) -> str:
@@ -160,38 +394,315 @@ class CortexResponse:
             if message.role == 'assistant':
                 return message.text_content
         return ""
-    
-    @property
-    def sql_queries(self) -> List[str]:
-        """Extract all SQL queries from tool results."""
+
+    def _collect(self):
+        """Gather SQL queries, result sets and search results in one pass over the tool results."""
         queries = []
+        result_sets = []
+        all_results = []
         for message in self.messages:
             for tool_result in message.tool_results:
                 sql = tool_result.sql_query
                 if sql:
                     queries.append(sql)
-        return queries
+                result_set = tool_result.result_set
+                if result_set is not None:
+                    result_sets.append(result_set)
+                all_results.extend(tool_result.search_results)
+        self._sql_queries = queries
+        self._result_sets = result_sets
+        self._search_results = all_results
+    
+    @property
+    def sql_queries(self) -> List[str]:
+        """Extract all SQL queries from tool results."""
+        if self._sql_queries is None:
+            self._collect()
+        return self._sql_queries
+    
+    @property
+    def result_sets(self) -> List[ResultSet]:
+        """Extract result sets of the SQL the agent executed, in tool result order."""
+        if self._result_sets is None:
+            self._collect()
+        return self._result_sets
     
     @property
     def search_results(self) -> List[Dict[str, Any]]:
         """Extract all search results from tool results."""
-        all_results = []
-        for message in self.messages:
-            for tool_result in message.tool_results:
-                all_results.extend(tool_result.search_results)
-        return all_results
+        if self._search_results is None:
+            self._collect()
+        return self._search_results
     
     @property
     def citations(self) -> List[str]:
         """Extract citations from search results."""
-        citations = []
-        for result in self.search_results:
-            if 'doc_title' in result and 'text' in result:
-                citation = f"{result['doc_title']}: {result['text']}"
-                if 'doc_id' in result:
-                    citation += f" [Source: {result['doc_id']}]"
-                citations.append(citation)
-        return citations
+        if self._citations is None:
+            citations = []
+            for result in self.search_results:
+                if 'doc_title' in result and 'text' in result:
+                    citation = f"{result['doc_title']}: {result['text']}"
+                    if 'doc_id' in result:
+                        citation += f" [Source: {result['doc_id']}]"
+                    citations.append(citation)
+            self._citations = citations
+        return self._citations
+
+
+@dataclass(slots=True)
+class StreamEvent:
+    """Represents a single decoded SSE event emitted by CortexStreamParser."""
+    event: Optional[str]
+    data: Dict[str, Any] = field(default_factory=dict)
+    done: bool = False
+
+
+THINKING_TAG_PATTERN = re.compile(r'<thinking>(.*?)</thinking>', re.DOTALL)
+
+# Events whose payloads are fully handled by the event branch and must not be
+# accumulated a second time through the message.delta path.
+_EVENT_HANDLED = ('response.text.delta', 'response.text', 'response.thinking.delta',
+                  'response.thinking', 'response.status')
+
+
+class CortexStreamParser:
+    """
+    Push-style incremental parser for Cortex Agent SSE streams.
+
+    Lines (or raw byte chunks) are fed as they arrive; every data line is JSON
+    decoded exactly once and returned as a StreamEvent so live consumers (e.g.
+    Slack progress updates) can react to it. Only the assembled answer is kept,
+    never the raw stream. Call finalize() once the stream ends to obtain the
+    CortexResponse.
+    """
+
+    def __init__(self):
+        self.current_event: Optional[str] = None
+        self.done = False
+        self.saw_sse_data = False
+        self.event_count = 0
+        self._text_parts: List[str] = []
+        self._tool_use: List[Dict[str, Any]] = []
+        self._tool_results: List[Dict[str, Any]] = []
+        self._thinking: List[str] = []
+        self._status_messages: List[str] = []
+        self._raw_lines: List[str] = []  # Only kept for non-SSE (plain JSON) bodies
+        self._pending = b''
+
+    def feed(self, chunk: bytes) -> List[StreamEvent]:
+        """
+        Feed a raw byte chunk, which may contain partial lines.
+
+        Args:
+            chunk: Bytes as received from the transport
+
+        Returns:
+            List of StreamEvent objects for the complete lines in the chunk
+        """
+        data = self._pending + chunk
+        lines = data.split(b'\n')
+        self._pending = lines.pop()
+        events = []
+        for raw in lines:
+            event = self.feed_line(raw.rstrip(b'\r').decode('utf-8'))
+            if event is not None:
+                events.append(event)
+        return events
+
+    def feed_line(self, line: str) -> Optional[StreamEvent]:
+        """
+        Feed a single decoded SSE line.
+
+        Args:
+            line: One line of the stream, without the trailing newline
+
+        Returns:
+            StreamEvent for data lines carrying a JSON object, otherwise None
+        """
+        if self.done or not line:
+            return None
+
+        if line.startswith('event: '):
+            self.current_event = line[7:].strip()
+            return None
+
+        if not line.startswith('data: '):
+            if not self.saw_sse_data:
+                self._raw_lines.append(line)
+            return None
+
+        if not self.saw_sse_data:
+            self.saw_sse_data = True
+            self._raw_lines = []
+
+        data_content = line[6:].strip()
+        if data_content == '[DONE]':
+            self.done = True
+            return StreamEvent(event=self.current_event, done=True)
+
+        # Arrays carry trace data, which the streaming path does not use
+        if data_content.startswith('['):
+            return None
+
+        try:
+            json_data = fast_json.loads(data_content)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(json_data, dict):
+            return None
+
+        self.event_count += 1
+        self._accumulate(self.current_event, json_data)
+        return StreamEvent(event=self.current_event, data=json_data)
+
+    def _accumulate(self, current_event: Optional[str], json_data: Dict[str, Any]):
+        """Fold one decoded payload into the answer being assembled."""
+        # Handle thinking events
+        if current_event == 'response.thinking.delta' or current_event == 'response.thinking':
+            if 'text' in json_data:
+                thinking_match = THINKING_TAG_PATTERN.search(json_data['text'])
+                if thinking_match:
+                    clean_thinking = thinking_match.group(1).strip()
+                    if clean_thinking:
+                        self._thinking.append(clean_thinking)
+
+        # Handle status events (planning steps)
+        elif current_event == 'response.status':
+            if 'message' in json_data:
+                self._status_messages.append(json_data['message'])
+
+        # Handle response text events (final answer content, only from deltas to avoid duplication)
+        elif current_event == 'response.text.delta':
+            if 'text' in json_data:
+                self._text_parts.append(json_data['text'])
+
+        # Handle tool result events (contains SQL queries and verification info)
+        elif current_event == 'response.tool_result':
+            if 'content' in json_data and 'tool_use_id' in json_data:
+                self._tool_results.append({
+                    'tool_use_id': json_data['tool_use_id'],
+                    'content': json_data['content']
+                })
+
+        # Old format: message deltas (skip events already handled above)
+        if current_event not in _EVENT_HANDLED and json_data.get('object') == 'message.delta':
+            delta = json_data.get('delta', {})
+            if 'content' in delta:
+                content = CortexResponseParser._parse_delta_content(delta['content'])
+                self._text_parts.append(content['text'])
+                self._tool_use.extend(content['tool_use'])
+                self._tool_results.extend(content['tool_results'])
+
+    @property
+    def text(self) -> str:
+        """Answer text assembled so far."""
+        return ''.join(self._text_parts)
+
+    def finalize(self) -> CortexResponse:
+        """
+        Build the CortexResponse from everything fed so far.
+
+        Returns:
+            CortexResponse object with parsed data
+        """
+        if self._pending:
+            pending, self._pending = self._pending, b''
+            self.feed_line(pending.rstrip(b'\r').decode('utf-8'))
+
+        if not self.saw_sse_data:
+            # Plain JSON body; an empty or unparseable one yields an empty response
+            body = '\n'.join(self._raw_lines).strip()
+            if not body:
+                return CortexResponse()
+            try:
+                data = fast_json.loads(body)
+            except json.JSONDecodeError:
+                return CortexResponse()
+            if not isinstance(data, dict):
+                return CortexResponse()
+            return CortexResponseParser().parse_json_response(data)
+
+        response = CortexResponse()
+        response.status_messages = list(self._status_messages)
+
+        # Add thinking content as separate messages FIRST
+        for thinking_text in self._thinking:
+            response.add_message(ParsedMessage(
+                role='assistant',
+                content=[{'type': 'thinking', 'text': thinking_text}]
+            ))
+
+        # Accumulated content goes LAST so final_text picks it up
+        text = self.text
+        if text or self._tool_use or self._tool_results:
+            message_content = []
+
+            if text:
+                message_content.append({'type': 'text', 'text': text})
+
+            for tool_use in self._tool_use:
+                message_content.append({'type': 'tool_use', 'tool_use': tool_use})
+
+            for tool_result in self._tool_results:
+                message_content.append({'type': 'tool_results', 'tool_results': tool_result})
+
+            response.add_message(ParsedMessage(role='assistant', content=message_content))
+
+        return response
+
+
+def _file_format(file_path: str, file_format: str) -> str:
+    if file_format != 'auto':
+        return file_format
+    return 'jsonl' if file_path.endswith(('.jsonl', '.ndjson')) else 'text'
+
+
+def _iter_lines(mm: mmap.mmap, start: int, end: int) -> Iterator[bytes]:
+    """Lines of mm[start:end] without their newline."""
+    position = start
+    while position < end:
+        newline = mm.find(b'\n', position, end)
+        if newline == -1:
+            newline = end
+        yield mm[position:newline]
+        position = newline + 1
+
+
+def _shard_ranges(file_path: str, count: int, file_format: str) -> List[Tuple[int, int]]:
+    """Split a file into about `count` byte ranges that start on record boundaries."""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            marker = b'\n' if file_format == 'jsonl' else b'\nSample response'
+            boundaries = [0]
+            for i in range(1, count):
+                found = mm.find(marker, max(size * i // count, boundaries[-1]))
+                if found == -1:
+                    break
+                boundary = found + 1  # Just after the newline
+                if boundary > boundaries[-1]:
+                    boundaries.append(boundary)
+    boundaries.append(size)
+    return [(a, b) for a, b in zip(boundaries, boundaries[1:]) if b > a]
+
+
+def _parse_shard(task: Tuple[str, str, int, int, bool]) -> List[CortexResponse]:
+    """Process-pool worker: parse one byte range of an archive."""
+    file_path, file_format, start, end, debug = task
+    return list(CortexResponseParser(debug=debug).iter_file_responses(file_path, file_format, start, end))
+
+
+class _TraceIndex:
+    """Hash indexes of the answer texts, SQL and search results a response already holds."""
+
+    __slots__ = ('texts', 'sqls', 'search_texts')
+
+    def __init__(self, response: CortexResponse):
+        self.texts = {message.text_content for message in response.messages if message.text_content}
+        self.sqls = set(response.sql_queries)
+        self.search_texts = {result.get('text') for result in response.search_results}
 
 
 class CortexResponseParser:
@@ -210,126 +721,14 @@ class CortexResponseParser:
         Returns:
             CortexResponse object with parsed data
         """
-        response = CortexResponse()
-        accumulated_content = {'text': '', 'tool_use': [], 'tool_results': []}
-        accumulated_thinking = []  # Store thinking content
-        current_event = None
-        
+        stream = CortexStreamParser()
         for line in sse_lines:
-            # Track event types
-            if line.startswith('event: '):
-                current_event = line[7:].strip()
-                continue
-            
-            # Process data lines based on current event
-            if line.startswith('data: '):
-                data_content = line[6:].strip()
-                
-                if data_content == '[DONE]':
-                    break
-                
-                try:
-                    json_data = json.loads(data_content)
-                    
-                    # Handle thinking events
-                    if current_event == 'response.thinking.delta' or current_event == 'response.thinking':
-                        if 'text' in json_data:
-                            thinking_text = json_data['text']
-                            # Extract content from <thinking> tags
-                            import re
-                            thinking_match = re.search(r'<thinking>(.*?)</thinking>', thinking_text, re.DOTALL)
-                            if thinking_match:
-                                clean_thinking = thinking_match.group(1).strip()
-                                if clean_thinking:
-                                    accumulated_thinking.append(clean_thinking)
-                    
-                    # Handle status events (planning steps)
-                    elif current_event == 'response.status':
-                        if 'message' in json_data:
-                            status_msg = json_data['message']
-                            response.status_messages.append(status_msg)
-                    
-                    # Handle response text events (final answer content)
-                    elif current_event == 'response.text.delta':
-                        if 'text' in json_data:
-                            text_content = json_data['text']
-                            # Add text content as accumulated content (only from delta events to avoid duplication)
-                            accumulated_content['text'] += text_content
-                    
-                    elif current_event == 'response.text':
-                        # Skip complete text events since we're building from deltas
-                        # This prevents duplication from both delta and complete events
-                        pass
-                    
-                    # Handle tool result events (contains SQL queries and verification info)
-                    elif current_event == 'response.tool_result':
-                        if 'content' in json_data and 'tool_use_id' in json_data:
-                            tool_result = {
-                                'tool_use_id': json_data['tool_use_id'],
-                                'content': json_data['content']
-                            }
-                            accumulated_content['tool_results'].append(tool_result)
-                    
-                except json.JSONDecodeError:
-                    pass
-            
-            # Also process using original logic for other content (but skip events we already handled)
-            # Skip text events that we already processed above to prevent duplication
-            parsed_line = self._process_sse_line(line)
-            
-            if current_event not in ['response.text.delta', 'response.text', 'response.thinking.delta', 'response.thinking', 'response.status']:
-                if parsed_line.get('type') == 'message':
-                    content = parsed_line['content']
-                    accumulated_content['text'] += content.get('text', '')
-                    accumulated_content['tool_use'].extend(content.get('tool_use', []))
-                    accumulated_content['tool_results'].extend(content.get('tool_results', []))
-            
-            if parsed_line.get('type') == 'final_message':
-                # Skip final message content processing since we're already accumulating from delta events
-                # This prevents duplicate content in the final response
-                # Note: The final message contains the complete assembled content that we've already 
-                # built up from individual response.text.delta events
-                pass
-            
-            elif parsed_line.get('type') == 'done':
+            stream.feed_line(line)
+            if stream.done:
                 break
-        
-        # Add thinking content as separate messages FIRST
-        for thinking_text in accumulated_thinking:
-            if thinking_text.strip():
-                response.messages.append(ParsedMessage(
-                    role='assistant',
-                    content=[{'type': 'thinking', 'text': thinking_text}]
-                ))
-        
-        # Convert accumulated content to message (this should be LAST so final_text picks it up)
-        if accumulated_content['text'] or accumulated_content['tool_use'] or accumulated_content['tool_results']:
-            message_content = []
-            
-            if accumulated_content['text']:
-                message_content.append({
-                    'type': 'text',
-                    'text': accumulated_content['text']
-                })
-            
-            for tool_use in accumulated_content['tool_use']:
-                message_content.append({
-                    'type': 'tool_use',
-                    'tool_use': tool_use
-                })
-            
-            for tool_result in accumulated_content['tool_results']:
-                message_content.append({
-                    'type': 'tool_results',
-                    'tool_results': tool_result
-                })
-            
-            response.messages.append(ParsedMessage(
-                role='assistant',
-                content=message_content
-            ))
-        
-        return response
+        if not stream.saw_sse_data:
+            return CortexResponse()
+        return stream.finalize()
     
     def parse_json_response(self, json_data: Union[str, Dict[str, Any]]) -> CortexResponse:
         """
@@ -342,7 +741,7 @@ class CortexResponseParser:
             CortexResponse object with parsed data
         """
         if isinstance(json_data, str):
-            data = json.loads(json_data)
+            data = fast_json.loads(json_data)
         else:
             data = json_data
         
@@ -352,7 +751,7 @@ class CortexResponseParser:
         # Parse message
         if 'message' in data:
             message_data = data['message']
-            response.messages.append(ParsedMessage(
+            response.add_message(ParsedMessage(
                 role=message_data.get('role', 'assistant'),
                 content=message_data.get('content', [])
             ))
@@ -374,35 +773,142 @@ class CortexResponseParser:
         Returns:
             List of CortexResponse objects
         """
-        responses = []
-        current_response_lines = []
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        in_response = False
-        for line in lines:
-            line = line.strip()
-            
-            if line.startswith('Sample response'):
-                # Start of new response
+        return list(self.iter_file_responses(file_path))
+
+    def iter_file_responses(self,
+            file_path: str,
+            file_format: str = 'auto',
+            start: int = 0,
+            end: Optional[int] = None
+        ) -> Iterator[CortexResponse]:
+        """
+        Yield the responses archived in a file one at a time.
+
+        The file is memory-mapped and read line by line, so only the response
+        being parsed is held in memory. Two layouts are supported:
+          - 'text': blocks introduced by a "Sample response ..." line, each
+            holding the SSE lines of one answer (event stream and/or trace arrays)
+          - 'jsonl': one JSON record per line (see _parse_record)
+
+        Args:
+            file_path: Path to the archive
+            file_format: 'text', 'jsonl' or 'auto' (by extension: .jsonl/.ndjson)
+            start: Byte offset to start at (a record boundary; used for sharding)
+            end: Byte offset to stop at (defaults to the end of the file)
+
+        Yields:
+            CortexResponse objects in file order
+        """
+        file_format = _file_format(file_path, file_format)
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                lines = _iter_lines(mm, start, size if end is None else min(end, size))
+                if file_format == 'jsonl':
+                    for raw in lines:
+                        raw = raw.strip()
+                        if not raw:
+                            continue
+                        try:
+                            record = fast_json.loads(raw)
+                        except json.JSONDecodeError:
+                            self.debug_print(f"Skipping invalid JSONL record at offset ~{start}")
+                            continue
+                        response = self._parse_record(record)
+                        if response is not None:
+                            yield response
+                    return
+
+                current_response_lines = []
+                in_response = False
+                for raw in lines:
+                    line = raw.decode('utf-8', errors='replace').strip()
+
+                    if line.startswith('Sample response'):
+                        # Start of new response
+                        if current_response_lines:
+                            yield self._parse_block(current_response_lines)
+                            current_response_lines = []
+                        in_response = True
+                        continue
+
+                    if in_response and line:
+                        current_response_lines.append(line)
+
+                # Parse last response
                 if current_response_lines:
-                    # Parse previous response
-                    response = self.parse_sse_response(current_response_lines)
-                    responses.append(response)
-                    current_response_lines = []
-                in_response = True
-                continue
-            
-            if in_response and line:
-                current_response_lines.append(line)
-        
-        # Parse last response
-        if current_response_lines:
-            response = self._parse_trace_response(current_response_lines)
-            responses.append(response)
-        
-        return responses
+                    yield self._parse_block(current_response_lines)
+
+    def parse_file_parallel(self,
+            file_path: str,
+            workers: Optional[int] = None,
+            file_format: str = 'auto',
+            shards_per_worker: int = 4
+        ) -> Iterator[CortexResponse]:
+        """
+        Parse a large archive on a process pool, yielding responses in file order.
+
+        The file is cut into byte ranges aligned on record boundaries; each
+        worker memory-maps the file and parses its own range.
+
+        Args:
+            file_path: Path to the archive
+            workers: Worker processes (defaults to the CPU count)
+            file_format: 'text', 'jsonl' or 'auto'
+            shards_per_worker: Ranges per worker, so results stream back before the end
+
+        Yields:
+            CortexResponse objects in file order
+        """
+        workers = workers or os.cpu_count() or 1
+        file_format = _file_format(file_path, file_format)
+        ranges = _shard_ranges(file_path, workers * shards_per_worker, file_format)
+        if workers == 1 or len(ranges) <= 1:
+            yield from self.iter_file_responses(file_path, file_format)
+            return
+
+        tasks = [(file_path, file_format, start, end, self.debug) for start, end in ranges]
+        with multiprocessing.get_context().Pool(processes=min(workers, len(tasks))) as pool:
+            for responses in pool.imap(_parse_shard, tasks):
+                yield from responses
+
+    def _parse_block(self, lines: List[str]) -> CortexResponse:
+        """Parse one archived answer: its event stream, or its trace arrays when it has no events."""
+        response = self.parse_sse_response(lines)
+        if response.messages:
+            return response
+        return self._parse_trace_response(lines)
+
+    def _parse_record(self, record: Any) -> Optional[CortexResponse]:
+        """
+        Parse one JSONL record.
+
+        Accepted shapes: a non-streaming agent response ({'message': ...}),
+        a captured stream ({'sse': [lines] or text} / {'events': ...}) or a
+        wrapper holding either under 'response'. A top-level 'request_id' is
+        kept when the response has none. Other records are skipped.
+        """
+        if not isinstance(record, dict):
+            return None
+        response = None
+        if 'message' in record:
+            response = self.parse_json_response(record)
+        else:
+            stream = record.get('sse', record.get('events'))
+            if isinstance(stream, str):
+                stream = stream.splitlines()
+            if isinstance(stream, list):
+                response = self._parse_block([line.strip() for line in stream if isinstance(line, str) and line.strip()])
+            elif isinstance(record.get('response'), dict):
+                response = self._parse_record(record['response'])
+        if response is None:
+            self.debug_print(f"Skipping JSONL record with keys {sorted(record)[:5]}")
+            return None
+        if not response.request_id and isinstance(record.get('request_id'), str):
+            response.request_id = record['request_id']
+        return response
     
     def _parse_trace_response(self, lines: List[str]) -> CortexResponse:
         """
@@ -415,6 +921,7 @@ class CortexResponseParser:
             CortexResponse object with extracted data
         """
         response = CortexResponse()
+        index = _TraceIndex(response)
         
         for line in lines:
             if not line.startswith('data: '):
@@ -424,18 +931,33 @@ class CortexResponseParser:
                 json_str = line[6:].strip()  # Remove 'data: ' prefix
                 if json_str.startswith('['):
                     # Parse array of trace JSON objects
-                    trace_array = json.loads(json_str)
+                    trace_array = fast_json.loads(json_str)
                     
                     for trace_str in trace_array:
-                        trace_data = json.loads(trace_str)
-                        self._extract_from_trace(trace_data, response)
+                        trace_data = fast_json.loads(trace_str)
+                        self._extract_from_trace(trace_data, response, index)
             except (json.JSONDecodeError, TypeError):
                 continue
         
         return response
     
-    def _extract_from_trace(self, trace_data: Dict[str, Any], response: CortexResponse):
-        """Extract meaningful information from a single trace object."""
+    def _extract_from_trace(self, trace_data: Dict[str, Any], response: CortexResponse,
+                            index: Optional["_TraceIndex"] = None):
+        """
+        Extract meaningful information from a single trace object.
+
+        Duplicates (same answer text, SQL or search result text, as repeated
+        across parent and child spans) are skipped with hash lookups, so a
+        dump of N spans is ingested in O(N).
+
+        Args:
+            trace_data: Decoded trace span
+            response: Response being assembled
+            index: What was already added to response; pass the same index for
+                   every span of a response (built from response when omitted)
+        """
+        if index is None:
+            index = _TraceIndex(response)
         attributes = trace_data.get('attributes', [])
         
         for attr in attributes:
@@ -445,8 +967,9 @@ class CortexResponseParser:
             # Extract final response text (main response from agent)
             if key == 'ai.observability.agent.response':
                 text = value.get('stringValue', '').strip()
-                if text and not any(msg.text_content == text for msg in response.messages):
-                    response.messages.append(ParsedMessage(
+                if text and text not in index.texts:
+                    index.texts.add(text)
+                    response.add_message(ParsedMessage(
                         role='assistant',
                         content=[{'type': 'text', 'text': text}]
                     ))
@@ -454,65 +977,40 @@ class CortexResponseParser:
             # Extract SQL queries from Cortex Analyst
             elif key == 'ai.observability.agent.tool.cortex_analyst.sql_query':
                 sql = value.get('stringValue', '').strip()
-                if sql:
-                    # Check if we already have this SQL
-                    existing_sqls = [tr.sql_query for msg in response.messages for tr in msg.tool_results if tr.sql_query]
-                    if sql not in existing_sqls:
-                        # Add to existing message or create new one
-                        if response.messages:
-                            response.messages[-1].content.append({
-                                'type': 'tool_results',
-                                'tool_results': {
-                                    'tool_use_id': 'cortex_analyst',
-                                    'content': [{'json': {'sql': sql}}]
-                                }
-                            })
-                        else:
-                            response.messages.append(ParsedMessage(
-                                role='assistant',
-                                content=[{
-                                    'type': 'tool_results',
-                                    'tool_results': {
-                                        'tool_use_id': 'cortex_analyst',
-                                        'content': [{'json': {'sql': sql}}]
-                                    }
-                                }]
-                            ))
+                if sql and sql not in index.sqls:
+                    index.sqls.add(sql)
+                    # Add to existing message or create new one
+                    response.add_content({
+                        'type': 'tool_results',
+                        'tool_results': {
+                            'tool_use_id': 'cortex_analyst',
+                            'content': [{'json': {'sql': sql}}]
+                        }
+                    })
             
             # Extract search results from Cortex Search
             elif key == 'ai.observability.agent.tool.cortex_search.results':
                 search_results = value.get('arrayValue', {}).get('values', [])
-                if search_results:
-                    for i, result in enumerate(search_results):
-                        search_text = result.get('stringValue', '')
-                        if search_text:
-                            # Create a search result
-                            search_result = {
-                                'text': search_text[:1000] + '...' if len(search_text) > 1000 else search_text,
+                for i, result in enumerate(search_results):
+                    search_text = result.get('stringValue', '')
+                    if not search_text:
+                        continue
+                    search_text = search_text[:1000] + '...' if len(search_text) > 1000 else search_text
+                    if search_text in index.search_texts:
+                        continue
+                    index.search_texts.add(search_text)
+                    # Add to existing message or create new one
+                    response.add_content({
+                        'type': 'tool_results',
+                        'tool_results': {
+                            'tool_use_id': 'cortex_search',
+                            'content': [{'json': {'searchResults': [{
+                                'text': search_text,
                                 'doc_title': 'Support Cases',
                                 'doc_id': f'search_result_{i+1}'
-                            }
-                            
-                            # Add to existing message or create new one
-                            if response.messages:
-                                response.messages[-1].content.append({
-                                    'type': 'tool_results',
-                                    'tool_results': {
-                                        'tool_use_id': 'cortex_search',
-                                        'content': [{'json': {'searchResults': [search_result]}}]
-                                    }
-                                })
-                            else:
-                                response.messages.append(ParsedMessage(
-                                    role='assistant',
-                                    content=[{
-                                        'type': 'tool_results',
-                                        'tool_results': {
-                                            'tool_use_id': 'cortex_search',
-                                            'content': [{'json': {'searchResults': [search_result]}}]
-                                        }
-                                    }]
-                                ))
+                            }]}}]
+                        }
+                    })
             
             # Extract request ID
             elif key == 'ai.observability.agent.request_id':
@@ -534,7 +1032,7 @@ class CortexResponseParser:
                 # This is trace data, not message data
                 return {'type': 'trace', 'data': json_str}
             
-            data = json.loads(json_str)
+            data = fast_json.loads(json_str)
             
             # Handle new format: final response with content array
             if 'content' in data and 'role' in data and data.get('role') == 'assistant':
@@ -556,7 +1054,8 @@ class CortexResponseParser:
         except json.JSONDecodeError:
             return {'type': 'error', 'message': f'Failed to parse: {line}'}
     
-    def _parse_delta_content(self, content: List[Dict[str, Any]]) -> Dict[str, Any]:
+    @staticmethod
+    def _parse_delta_content(content: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Parse different types of content from the delta."""
         result = {
             'text': '',
@@ -611,6 +1110,7 @@ class CortexResponseParser:
         return {
             'text': response.final_text,
             'sql_queries': response.sql_queries,
+            'result_sets': response.result_sets,
             'citations': response.citations,
             'suggestions': [s.text for s in response.suggestions],
             'tool_uses': len([tool for msg in response.messages for tool in msg.tool_uses]),
@@ -0,0 +1,67 @@
+"""
+JSON decoding backend for the agent stream.
+
+Every SSE data line of an agent answer is JSON decoded, so on long multi-tool
+streams the decoder is a large share of the parsing cost. The fastest
+available backend is picked once at import time: orjson, then msgspec, then
+the standard library. JSON_BACKEND=orjson|msgspec|json forces one.
+
+Inputs the fast decoders reject but the standard library accepts (NaN or
+Infinity literals, integers beyond 64 bits) are retried with json.loads, so
+results and errors (json.JSONDecodeError) are the same whatever the backend.
+"""
+
+import json
+import os
+from typing import Any, Callable, Optional, Tuple, Type, Union
+
+_decode: Optional[Callable[[Union[str, bytes]], Any]] = None
+_errors: Tuple[Type[BaseException], ...] = ()
+BACKEND = "json"
+
+
+def _load_orjson():
+    import orjson
+    return orjson.loads, (orjson.JSONDecodeError,)
+
+
+def _load_msgspec():
+    import msgspec
+    decoder = msgspec.json.Decoder()  # Reused instance: no per-call setup
+    return decoder.decode, (msgspec.DecodeError,)
+
+
+_BACKENDS = {"orjson": _load_orjson, "msgspec": _load_msgspec}
+
+
+def _select(preferred: Optional[str]):
+    global _decode, _errors, BACKEND
+    names = [preferred] if preferred else list(_BACKENDS)
+    for name in names:
+        if name not in _BACKENDS:
+            continue
+        try:
+            _decode, _errors = _BACKENDS[name]()
+        except ImportError:
+            continue
+        BACKEND = name
+        return
+    _decode, _errors, BACKEND = None, (), "json"
+
+
+_select(os.getenv("JSON_BACKEND"))
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Decode a JSON document with the selected backend.
+
+    Raises:
+        json.JSONDecodeError: When the document is not valid JSON
+    """
+    if _decode is not None:
+        try:
+            return _decode(data)
+        except _errors:
+            pass  # Let the standard library accept or reject it
+    return json.loads(data)
@@ -0,0 +1,154 @@
+"""
+Helpers to turn the SQL behind an agent answer into a pandas DataFrame.
+
+The Cortex Agent executes the SQL it generates. When the tool result already
+carries that result set it is used as-is; otherwise the result is fetched by
+statement handle and, as a last resort, the SQL is executed again (through
+the optional SQLResultCache, so identical SQL is only run once per role).
+"""
+
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import pyarrow as pa
+from snowflake.connector.errors import NotSupportedError
+
+from cortex_response_parser import ResultSet
+from snowflake_pool import SnowflakeConnectionPool
+from sql_result_cache import SQLResultCache
+from telemetry import TELEMETRY
+
+
+def pick_result_set(response: Dict[str, Any]) -> Optional[ResultSet]:
+    """Result set matching the first SQL query of a chat() summary, if any."""
+    result_sets = response.get('result_sets') or []
+    sql_queries = response.get('sql_queries') or []
+    if not result_sets:
+        return None
+    if sql_queries:
+        for result_set in result_sets:
+            if result_set.sql == sql_queries[0]:
+                return result_set
+    return result_sets[0]
+
+
+def _subquery(sql: str) -> str:
+    """The agent's SQL as-is, minus trailing semicolons, ready to nest in a FROM clause."""
+    sql = sql.strip()
+    while sql.endswith(';'):
+        sql = sql[:-1].rstrip()
+    return sql
+
+
+def limit_query(sql: str, row_limit: int) -> str:
+    """Wrap a query so Snowflake itself stops after row_limit rows."""
+    # The newline before ')' keeps a trailing -- comment from swallowing it
+    return f"SELECT * FROM (\n{_subquery(sql)}\n) LIMIT {int(row_limit)}"
+
+
+def count_rows(conn, sql: str) -> int:
+    """Total rows of a query, counted server-side without transferring them."""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM (\n{_subquery(sql)}\n)")
+        return cur.fetchone()[0]
+
+
+def fetch_dataframe(cur, max_rows: Optional[int] = None) -> pd.DataFrame:
+    """
+    Build a DataFrame from an executed cursor through the connector's Arrow batches.
+
+    Stops downloading once max_rows rows are in hand instead of materializing
+    every row as Python tuples. df.attrs['total_rows'] carries the full row
+    count reported by Snowflake.
+    """
+    columns = [col[0] for col in cur.description]
+    total_rows = cur.rowcount if cur.rowcount is not None and cur.rowcount >= 0 else None
+    try:
+        tables = []
+        fetched = 0
+        for batch in cur.fetch_arrow_batches():
+            tables.append(batch)
+            fetched += batch.num_rows
+            if max_rows is not None and fetched >= max_rows:
+                break
+        if tables:
+            table = pa.concat_tables(tables)
+            if max_rows is not None:
+                table = table.slice(0, max_rows)
+            df = table.to_pandas()
+        else:
+            df = pd.DataFrame(columns=columns)
+    except NotSupportedError:
+        # Results that are not served as Arrow (e.g. some SHOW/DESCRIBE commands)
+        rows = cur.fetchall() if max_rows is None else cur.fetchmany(max_rows)
+        df = pd.DataFrame(rows, columns=columns)
+    df.attrs['total_rows'] = total_rows if total_rows is not None else len(df)
+    return df
+
+
+def result_dataframe(response: Dict[str, Any], pool: SnowflakeConnectionPool,
+                     role: Optional[str] = None,
+                     sql_cache: Optional[SQLResultCache] = None,
+                     max_rows: Optional[int] = None,
+                     row_limit: Optional[int] = None,
+                     count_total: bool = False) -> Optional[pd.DataFrame]:
+    """
+    DataFrame for the first SQL query of a chat() summary.
+
+    Args:
+        response: Summary returned by CortexChat.chat
+        pool: Connection pool, only borrowed from when the agent sent no rows
+        role: Role to run the fallback query as (defaults to the pool's role)
+        sql_cache: Optional result cache consulted before touching Snowflake
+        max_rows: Rows needed for display; fetching stops there
+        row_limit: Server-side LIMIT applied when the SQL has to be re-executed
+                   (the reported total is then capped at row_limit too)
+        count_total: With row_limit, run a COUNT(*) so total_rows stays exact
+
+    Returns:
+        DataFrame (df.attrs['total_rows'] holds the full row count), or None
+        when the answer involved no SQL
+    """
+    result_set = pick_result_set(response)
+    if result_set is not None and result_set.has_data:
+        df = pd.DataFrame(result_set.data, columns=result_set.columns)
+        if max_rows is not None:
+            df = df.head(max_rows)
+        df.attrs['total_rows'] = result_set.num_rows or len(df)
+        return df
+
+    sql_queries = response.get('sql_queries') or []
+    sql = sql_queries[0] if sql_queries else (result_set.sql if result_set else None)
+    if not sql and not (result_set and result_set.statement_handle):
+        return None
+
+    role = role or pool.default_role
+    if sql_cache is not None and sql:
+        with TELEMETRY.span("sql_fetch", source="cache"):
+            cached = sql_cache.get(sql, role, max_rows)
+        if cached is not None:
+            return cached
+
+    def fetch(conn):
+        with conn.cursor() as cur:
+            fetched = False
+            if result_set is not None and result_set.statement_handle:
+                try:
+                    cur.get_results_from_sfqid(result_set.statement_handle)
+                    fetched = True
+                except Exception as e:
+                    print(f"⚠️ Could not fetch result by statement handle, re-running SQL: {e}")
+            if not fetched:
+                if not sql:
+                    return None
+                cur.execute(limit_query(sql, row_limit) if row_limit else sql)
+            df = fetch_dataframe(cur, max_rows)
+        if not fetched and row_limit and count_total and df.attrs['total_rows'] >= row_limit:
+            df.attrs['total_rows'] = count_rows(conn, sql)
+        return df
+
+    with TELEMETRY.span("sql_fetch", source="snowflake"):
+        df = pool.run(fetch, role=role)
+    if sql_cache is not None and sql and df is not None:
+        sql_cache.set(sql, role, df, max_rows=max_rows)
+    return df
@@ -0,0 +1,250 @@
+"""
+Response cache for Cortex Agent answers.
+
+Answers are keyed by the normalized question text plus the Snowflake role
+sent as X-Snowflake-Role, so ROLE_RISK and ROLE_SALES never share entries.
+Entries expire after a TTL and are evicted least-recently-used once the
+cache exceeds its byte budget. The in-memory backend is the default; the
+SQLite backend keeps answers across restarts.
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[\s?!.¿¡]+$')
+_LEADING_PUNCTUATION = re.compile(r'^[\s¿¡]+')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize question text so trivially different phrasings share a cache entry."""
+    text = unicodedata.normalize('NFKC', query or '').lower()
+    text = re.sub(r'<@\w+>', '', text)  # Slack bot mentions
+    text = _WHITESPACE.sub(' ', text).strip()
+    text = _TRAILING_PUNCTUATION.sub('', text)
+    return _LEADING_PUNCTUATION.sub('', text)
+
+
+def cache_key(query: str, role: str) -> str:
+    """Stable key for a (question, role) pair."""
+    return hashlib.sha256(f"{role or ''}\x1f{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU store bounded by total bytes and entry count."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float, bytes]]" = OrderedDict()  # key -> (role, expires_at, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key: str, role: str, value: bytes, ttl: float):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if len(value) > self.max_bytes:
+                return
+            self._entries[key] = (role, time.time() + ttl, value)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_role(self, role: str) -> int:
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[0] == role]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size(self) -> Tuple[int, int]:
+        """Returns (entries, bytes)."""
+        with self._lock:
+            return len(self._entries), self._bytes
+
+    def _remove(self, key: str):
+        self._bytes -= len(self._entries.pop(key)[2])
+
+
+class SQLiteCacheBackend:
+    """On-disk LRU store that survives restarts, bounded by total bytes."""
+
+    def __init__(self, path: str = "cortex_cache.sqlite3", max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, role TEXT, value BLOB, size INTEGER,"
+            " expires_at REAL, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, role: str, value: bytes, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, role, value, size, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, role, sqlite3.Binary(value), len(value), now + ttl, now)
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # Drop least recently used rows until back under budget
+                freed = 0
+                for old_key, size in self._db.execute(
+                        "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+                    if total - freed <= self.max_bytes:
+                        break
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    freed += size
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def delete_role(self, role: str) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM responses WHERE role = ?", (role,)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def size(self) -> Tuple[int, int]:
+        """Returns (entries, bytes)."""
+        with self._lock:
+            entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            return entries, total
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ResponseCache:
+    """Cache of chat() summaries keyed by (normalized question, role)."""
+
+    def __init__(self, backend=None, ttl: float = 15 * 60):
+        """
+        Args:
+            backend: MemoryCacheBackend (default) or SQLiteCacheBackend
+            ttl: Seconds an answer stays valid
+        """
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self._hooks: List[Callable[[Optional[str], Optional[str]], None]] = []
+        self._stats = {"hits": 0, "misses": 0, "stores": 0}
+        self._lock = threading.Lock()
+
+    def get(self, query: str, role: str) -> Optional[Dict[str, Any]]:
+        """Cached summary for the question, or None. Each call returns a fresh copy."""
+        value = self.backend.get(cache_key(query, role))
+        with self._lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, query: str, role: str, summary: Dict[str, Any], ttl: Optional[float] = None):
+        """Store a summary; error results are never cached."""
+        if summary.get('error'):
+            return
+        self.backend.set(cache_key(query, role), role, pickle.dumps(summary, pickle.HIGHEST_PROTOCOL),
+                         self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def add_invalidation_hook(self, hook: Callable[[Optional[str], Optional[str]], None]):
+        """Register hook(query, role) called after every invalidation (None means 'all')."""
+        self._hooks.append(hook)
+
+    def invalidate(self, query: str, role: str):
+        """Drop one cached answer."""
+        self.backend.delete(cache_key(query, role))
+        self._run_hooks(query, role)
+
+    def invalidate_role(self, role: str) -> int:
+        """Drop every answer cached for a role, e.g. after that role's data was reloaded."""
+        removed = self.backend.delete_role(role)
+        self._run_hooks(None, role)
+        return removed
+
+    def clear(self):
+        """Drop every cached answer."""
+        self.backend.clear()
+        self._run_hooks(None, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/store counters and current size."""
+        entries, size = self.backend.size()
+        with self._lock:
+            return dict(self._stats, entries=entries, bytes=size)
+
+    def _run_hooks(self, query: Optional[str], role: Optional[str]):
+        for hook in self._hooks:
+            try:
+                hook(query, role)
+            except Exception as e:
+                print(f"❌ Cache invalidation hook failed: {e}")
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """
+    Build the apps' response cache from the environment.
+
+    RESPONSE_CACHE_TTL (seconds, 0 disables the cache), RESPONSE_CACHE_MAX_MB
+    and RESPONSE_CACHE_PATH (SQLite file; in-memory when unset).
+    """
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL", "900"))
+    if ttl <= 0:
+        return None
+    max_bytes = int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024)
+    path = os.getenv("RESPONSE_CACHE_PATH")
+    backend = SQLiteCacheBackend(path, max_bytes=max_bytes) if path else MemoryCacheBackend(max_bytes=max_bytes)
+    return ResponseCache(backend, ttl=ttl)
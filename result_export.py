@@ -0,0 +1,195 @@
+"""
+Full-result downloads for answers whose table was only previewed in Slack.
+
+The apps show a small preview window and register the query behind it here.
+Only when the user clicks "Download full results" is the complete result
+streamed from Snowflake, batch by batch, into a CSV or Parquet file that is
+then uploaded to the thread.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from snowflake.connector.errors import NotSupportedError
+
+from cortex_response_parser import ResultSet
+from snowflake_pool import SnowflakeConnectionPool
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+
+class ResultExpired(Exception):
+    """Raised when the stored result is gone and there is no SQL to run again."""
+
+
+@dataclass
+class ExportRequest:
+    """Everything needed to regenerate a full result after the preview was sent."""
+    sql: Optional[str]
+    role: Optional[str]
+    statement_handle: Optional[str] = None
+    result_set: Optional[ResultSet] = None  # Rows the agent already returned, when complete
+    total_rows: Optional[int] = None
+    created_at: float = field(default_factory=time.time)
+
+
+class ExportRegistry:
+    """Pending downloads keyed by the token stored in the Slack button value."""
+
+    def __init__(self, ttl: float = 60 * 60, max_entries: int = 1000):
+        """
+        Args:
+            ttl: Seconds a download button stays usable
+            max_entries: Oldest pending downloads are forgotten beyond this
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ExportRequest]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, request: ExportRequest) -> str:
+        """Store a request and return its token (fits in a Slack button value)."""
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._entries[token] = request
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> Optional[ExportRequest]:
+        """Pending request for a token, or None if unknown or expired."""
+        with self._lock:
+            request = self._entries.get(token)
+            if request is not None and time.time() - request.created_at > self.ttl:
+                del self._entries[token]
+                return None
+            return request
+
+
+def _complete_result_set(result_set: Optional[ResultSet]) -> bool:
+    return (result_set is not None and result_set.has_data
+            and len(next(iter(result_set.data.values()), [])) >= (result_set.num_rows or 0))
+
+
+def export_request(response: dict, result_set: Optional[ResultSet], role: Optional[str],
+                   total_rows: Optional[int] = None) -> Optional[ExportRequest]:
+    """
+    Build the ExportRequest for a chat() summary, or None when there is nothing to download.
+
+    Args:
+        response: Summary returned by CortexChat.chat
+        result_set: Result set picked for the preview (see query_results.pick_result_set)
+        role: Role the preview was fetched with
+        total_rows: Total row count shown in the preview note
+    """
+    sql_queries = response.get('sql_queries') or []
+    sql = sql_queries[0] if sql_queries else (result_set.sql if result_set else None)
+    handle = result_set.statement_handle if result_set else None
+    if not sql and not handle:
+        return None
+    return ExportRequest(
+        sql=sql,
+        role=role,
+        statement_handle=handle,
+        result_set=result_set if _complete_result_set(result_set) else None,
+        total_rows=total_rows
+    )
+
+
+def _cursor_batches(cur, chunk_rows: int) -> Iterator[pa.Table]:
+    """Arrow tables from an executed cursor, one batch at a time."""
+    try:
+        for batch in cur.fetch_arrow_batches():
+            yield batch
+    except NotSupportedError:
+        columns = [col[0] for col in cur.description]
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield pa.Table.from_pandas(pd.DataFrame(rows, columns=columns), preserve_index=False)
+
+
+def _write_batches(batches: Iterator[pa.Table], path: str, fmt: str) -> int:
+    """Write tables as they arrive; only one batch is held in memory. Returns rows written."""
+    writer = None
+    schema = None
+    rows = 0
+    try:
+        for table in batches:
+            if writer is None:
+                schema = table.schema
+                writer = (pq.ParquetWriter(path, schema) if fmt == "parquet"
+                          else pa_csv.CSVWriter(path, schema))
+            elif table.schema != schema:
+                table = table.cast(schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        open(path, "wb").close()
+    return rows
+
+
+def export_result(request: ExportRequest, pool: SnowflakeConnectionPool,
+                  fmt: str = "csv", chunk_rows: int = 50000) -> str:
+    """
+    Stream the full result into a temporary CSV or Parquet file.
+
+    Args:
+        request: Registered ExportRequest
+        pool: Connection pool used when the rows have to come from Snowflake
+        fmt: 'csv' or 'parquet'
+        chunk_rows: Rows per chunk when the connector cannot serve Arrow batches
+
+    Returns:
+        Path of the generated file; the caller removes it after uploading
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    fd, path = tempfile.mkstemp(prefix="cortex_results_", suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        if request.result_set is not None:
+            table = pa.Table.from_pandas(
+                pd.DataFrame(request.result_set.data, columns=request.result_set.columns),
+                preserve_index=False
+            )
+            rows = _write_batches(iter([table]), path, fmt)
+        else:
+            def fetch(conn):
+                with conn.cursor() as cur:
+                    fetched = False
+                    if request.statement_handle:
+                        try:
+                            cur.get_results_from_sfqid(request.statement_handle)
+                            fetched = True
+                        except Exception as e:
+                            print(f"⚠️ Could not fetch result by statement handle: {e}")
+                    if not fetched:
+                        if not request.sql:
+                            raise ResultExpired("The result has expired and there is no SQL to re-run; "
+                                                "please ask the question again.")
+                        cur.execute(request.sql)
+                    return _write_batches(_cursor_batches(cur, chunk_rows), path, fmt)
+
+            rows = pool.run(fetch, role=request.role)
+    except Exception:
+        os.remove(path)
+        raise
+
+    print(f"📦 Exported {rows} rows to {path}")
+    return path
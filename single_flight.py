@@ -0,0 +1,122 @@
+"""
+Single-flight coalescing of identical in-flight agent questions.
+
+When the same (normalized question, role) is asked again while the first
+call is still running, the late callers wait for that call instead of
+starting their own, so N duplicate mentions cost one agent request. Each
+follower receives its own copy of the result.
+"""
+
+import asyncio
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key across threads."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a call for key is currently running."""
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: str, fn: Callable[[], Any], on_join: Optional[Callable[[], None]] = None) -> Tuple[Any, bool]:
+        """
+        Run fn() unless a call with the same key is already running, in which
+        case wait for it and share its outcome.
+
+        Args:
+            key: Identity of the call, e.g. response_cache.cache_key(query, role)
+            fn: Work done by the first caller
+            on_join: Called by followers before they start waiting
+
+        Returns:
+            Tuple of (result, shared), where shared is True for followers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["calls"] += 1
+            else:
+                call.followers += 1
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            if on_join is not None:
+                on_join()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Leader calls, coalesced followers and calls currently in flight."""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent coroutines with the same key on one event loop."""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a call for key is currently running."""
+        return key in self._tasks
+
+    async def do(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await coro_fn() unless a call with the same key is already running.
+
+        The shared call runs as its own task, so a caller that is cancelled
+        (e.g. its Slack handler timed out) does not cancel it for the others.
+
+        Returns:
+            Tuple of (result, shared), where shared is True for followers
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self._stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(coro_fn())
+            self._tasks[key] = task
+            self._stats["calls"] += 1
+            task.add_done_callback(lambda _, key=key, task=task: self._tasks.pop(key, None)
+                                   if self._tasks.get(key) is task else None)
+
+        result = await asyncio.shield(task)
+        return (copy.deepcopy(result), True) if shared else (result, False)
+
+    def stats(self) -> Dict[str, int]:
+        """Leader calls, coalesced followers and calls currently in flight."""
+        return dict(self._stats, in_flight=len(self._tasks))
@@ -0,0 +1,60 @@
+"""
+Slack mrkdwn helpers shared by the bots and the streaming answer renderer.
+"""
+
+# Slack shows about this many characters of a message before truncating
+MAX_MESSAGE_CHARS = 39000
+
+_FENCE = "```"
+
+
+def format_text_for_slack(text):
+    """Convert markdown formatting to Slack's mrkdwn format."""
+    if not text:
+        return text
+    
+    try:
+        # Convert **bold** to *bold* for Slack
+        import re
+        
+        # Replace **text** with *text* (bold)
+        text = re.sub(r'\*\*(.*?)\*\*', r'*\1*', text)
+        
+        # Replace __text__ with *text* (alternative bold syntax)
+        text = re.sub(r'__(.*?)__', r'*\1*', text)
+        
+        # Replace *text* with _text_ (italics) - but only single asterisks
+        # This is tricky because we don't want to mess with our bold conversion
+        # So we'll handle this carefully by looking for single asterisks not preceded/followed by another asterisk
+        text = re.sub(r'(?<!\*)\*(?!\*)([^*]+?)(?<!\*)\*(?!\*)', r'_\1_', text)
+        
+        return text
+        
+    except Exception as e:
+        print(f"❌ Error formatting text: {e}")
+        return text
+
+
+def markdown_safe_prefix(text: str) -> str:
+    """
+    Longest prefix of a partially streamed answer that renders cleanly.
+
+    Cuts at the last whitespace (never mid-word), closes an open code block
+    and drops a trailing inline code span or bold marker that has not been
+    closed yet, so intermediate Slack updates never show broken formatting.
+    """
+    if not text:
+        return ""
+    cut = max(text.rfind(" "), text.rfind("\n"))
+    prefix = text[:cut] if cut > 0 else text
+    if prefix.count(_FENCE) % 2:
+        return prefix.rstrip() + "\n" + _FENCE
+    for marker in ("`", "**", "__"):
+        if prefix.count(marker) % 2:
+            prefix = prefix[:prefix.rfind(marker)]
+    return prefix.rstrip()
+
+
+def clip_message(text: str, max_chars: int = MAX_MESSAGE_CHARS) -> str:
+    """Clip text to what a single Slack message can hold."""
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
@@ -0,0 +1,170 @@
+"""
+Throttled Slack progress updates.
+
+Planning and thinking updates arrive once per streamed token, far faster than
+the Slack Web API accepts chat.update calls. SlackProgressUpdater keeps only
+the latest payload per message, sends it from a background thread at most
+once every `min_interval` seconds, and backs off when Slack answers 429.
+Per-message bookkeeping is dropped once a message is flushed or has been idle
+for `idle_ttl` seconds, so a long-running app does not accumulate it.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from telemetry import TELEMETRY
+
+DEBUG = False  # Set to True for detailed logging
+
+MessageKey = Tuple[str, str]  # (channel, ts)
+
+
+class SlackProgressUpdater:
+    """Coalescing, rate-limited chat_update sender shared by all requests."""
+
+    def __init__(self, client, min_interval: float = 1.0, idle_ttl: float = 600.0):
+        """
+        Args:
+            client: Slack WebClient used for chat_update
+            min_interval: Minimum seconds between two updates of the same message
+            idle_ttl: Seconds after its last update before a message's send
+                      time and outcome are forgotten
+        """
+        self.client = client
+        self.min_interval = min_interval
+        self.idle_ttl = idle_ttl
+        self._pending: Dict[MessageKey, Dict[str, Any]] = {}
+        self._urgent = set()
+        self._in_flight = set()
+        self._abandoned = set()  # In flight when flush gave up; not re-queued after a 429
+        self._last_sent: Dict[MessageKey, float] = {}  # Oldest first, for idle eviction
+        self._last_ok: Dict[MessageKey, bool] = {}
+        self._retry_until = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="slack-progress", daemon=True)
+        self._thread.start()
+
+    def update(self, channel: str, ts: str, **payload):
+        """
+        Queue a chat_update for a message, replacing any update not yet sent.
+
+        Never blocks on Slack; the call returns immediately.
+        """
+        key = (channel, ts)
+        with self._cond:
+            self._pending[key] = payload
+            self._abandoned.discard(key)
+            self._cond.notify()
+
+    def flush(self, channel: str, ts: str, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Send the latest queued update for a message now, ignoring the throttle
+        interval but still honouring Retry-After, and wait for it.
+
+        On timeout the queued update is dropped, so a caller that falls back to
+        posting the content as a new message does not see it delivered twice.
+
+        Returns:
+            True if the last update of this message reached Slack
+        """
+        key = (channel, ts)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if key in self._pending:
+                self._urgent.add(key)
+                self._cond.notify()
+            while key in self._pending or key in self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._pending.pop(key, None)
+                    self._urgent.discard(key)
+                    if key in self._in_flight:
+                        self._abandoned.add(key)
+                    return False
+                self._cond.wait(remaining)
+            self._last_sent.pop(key, None)
+            return self._last_ok.pop(key, False)
+
+    def close(self):
+        """Stop the background sender; unsent updates are dropped."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _next_due(self, now: float) -> Tuple[Optional[MessageKey], float]:
+        """Pick the pending message that may be sent soonest."""
+        best_key, best_due = None, float("inf")
+        for key in self._pending:
+            if key in self._in_flight:
+                continue
+            due = self._retry_until
+            if key not in self._urgent:
+                due = max(due, self._last_sent.get(key, 0.0) + self.min_interval)
+            if due < best_due:
+                best_key, best_due = key, due
+        return best_key, best_due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    now = time.monotonic()
+                    key, due = self._next_due(now)
+                    if key is not None and due <= now:
+                        break
+                    self._cond.wait(None if key is None else due - now)
+                payload = self._pending.pop(key)
+                self._urgent.discard(key)
+                self._in_flight.add(key)
+
+            with TELEMETRY.span("slack_post", kind="update"):
+                ok, retry_after = self._send(key, payload)
+
+            with self._cond:
+                self._in_flight.discard(key)
+                abandoned = key in self._abandoned
+                self._abandoned.discard(key)
+                now = time.monotonic()
+                self._last_sent.pop(key, None)
+                self._last_sent[key] = now
+                self._evict_idle(now)
+                if retry_after is not None:
+                    self._retry_until = time.monotonic() + retry_after
+                    # Keep the payload unless a newer one arrived or flush gave up on it
+                    if not abandoned:
+                        self._pending.setdefault(key, payload)
+                else:
+                    self._last_ok[key] = ok
+                self._cond.notify_all()
+
+    def _evict_idle(self, now: float):
+        """Forget messages not updated for idle_ttl seconds (caller holds the lock)."""
+        cutoff = now - self.idle_ttl
+        while self._last_sent:
+            key, sent = next(iter(self._last_sent.items()))
+            if sent > cutoff:
+                return
+            del self._last_sent[key]
+            self._last_ok.pop(key, None)
+
+    def _send(self, key: MessageKey, payload: Dict[str, Any]) -> Tuple[bool, Optional[float]]:
+        """Issue one chat_update. Returns (ok, retry_after seconds when rate limited)."""
+        channel, ts = key
+        try:
+            self.client.chat_update(channel=channel, ts=ts, **payload)
+            return True, None
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            if response is not None and getattr(response, 'status_code', None) == 429:
+                retry_after = float(response.headers.get('Retry-After', 1))
+                print(f"⏳ Slack rate limited chat_update, retrying in {retry_after}s")
+                return False, retry_after
+            print(f"❌ Error updating Slack message: {e}")
+            if DEBUG:
+                import traceback
+                print(f"❌ Full error: {traceback.format_exc()}")
+            return False, None
@@ -0,0 +1,242 @@
+"""
+Bounded Snowflake connection pool for the Slack apps.
+
+Connections are pooled per (role, warehouse), checked before reuse, evicted
+after sitting idle, kept alive server-side, and transparently re-created with
+the PAT when the session has expired.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import snowflake.connector
+
+PoolKey = Tuple[Optional[str], Optional[str]]  # (role, warehouse)
+
+# Errors meaning the session/token is gone and a fresh login is needed
+SESSION_EXPIRED_ERRNOS = {390111, 390112, 390114}
+
+
+def is_session_expired(error: Exception) -> bool:
+    """Check whether an error means the Snowflake session has to be re-authenticated."""
+    return getattr(error, 'errno', None) in SESSION_EXPIRED_ERRNOS
+
+
+@dataclass
+class _PooledConnection:
+    conn: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within acquire_timeout."""
+
+
+class SnowflakeConnectionPool:
+    """Thread-safe pool of Snowflake connections keyed by (role, warehouse)."""
+
+    def __init__(self,
+            connect_params: Dict[str, Any],
+            default_role: Optional[str] = None,
+            default_warehouse: Optional[str] = None,
+            max_size: int = 5,
+            idle_timeout: float = 600,
+            health_check_after: float = 60,
+            acquire_timeout: float = 30
+        ):
+        """
+        Args:
+            connect_params: Arguments for snowflake.connector.connect (user, password=PAT, account, ...)
+            default_role: Role used when connection() is not given one
+            default_warehouse: Warehouse used when connection() is not given one
+            max_size: Maximum open connections per (role, warehouse)
+            idle_timeout: Seconds after which an unused connection is closed
+            health_check_after: Idle seconds after which a connection is pinged before reuse
+            acquire_timeout: Seconds to wait for a free connection before raising PoolTimeout
+        """
+        self.connect_params = dict(connect_params)
+        self.default_role = default_role
+        self.default_warehouse = default_warehouse
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: Dict[PoolKey, List[_PooledConnection]] = {}
+        self._in_use: Dict[PoolKey, int] = {}
+        self._cond = threading.Condition()
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "reauthenticated": 0,
+            "evicted_idle": 0,
+            "discarded_unhealthy": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+    def _key(self, role: Optional[str], warehouse: Optional[str]) -> PoolKey:
+        return (role or self.default_role, warehouse or self.default_warehouse)
+
+    def _connect(self, key: PoolKey):
+        role, warehouse = key
+        return snowflake.connector.connect(
+            **self.connect_params,
+            role=role,
+            warehouse=warehouse,
+            client_session_keep_alive=True
+        )
+
+    def _close_quietly(self, pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self, now: float) -> List[_PooledConnection]:
+        """Drop idle connections past idle_timeout. Caller holds the lock and closes them."""
+        evicted = []
+        for key, idle in self._idle.items():
+            keep = []
+            for pooled in idle:
+                (evicted if now - pooled.last_used > self.idle_timeout else keep).append(pooled)
+            self._idle[key] = keep
+        self._stats["evicted_idle"] += len(evicted)
+        return evicted
+
+    def _is_healthy(self, pooled: _PooledConnection, now: float) -> bool:
+        if pooled.conn.is_closed():
+            return False
+        if now - pooled.last_used < self.health_check_after:
+            return True
+        try:
+            with pooled.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _acquire(self, key: PoolKey, fresh: bool = False) -> _PooledConnection:
+        """
+        Take a connection for key, waiting up to acquire_timeout for a free slot.
+
+        With fresh, the key's idle connections are closed instead of reused and
+        a new one is opened (new PAT login).
+        """
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        stale_sessions = []
+        with self._cond:
+            while True:
+                evicted = self._evict_idle(time.monotonic())
+                idle = self._idle.setdefault(key, [])
+                if fresh and idle:
+                    # Same login as the connection whose session expired
+                    stale_sessions.extend(idle)
+                    self._stats["discarded_unhealthy"] += len(idle)
+                    idle.clear()
+                if idle or self._in_use.get(key, 0) < self.max_size:
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                    pooled = idle.pop() if idle else None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No Snowflake connection available for {key} after {self.acquire_timeout}s")
+                self._cond.wait(remaining)
+            waited = time.monotonic() - started
+            self._stats["acquired"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+
+        for stale in evicted + stale_sessions:
+            self._close_quietly(stale)
+
+        try:
+            if pooled is not None and not self._is_healthy(pooled, time.monotonic()):
+                self._close_quietly(pooled)
+                with self._cond:
+                    self._stats["discarded_unhealthy"] += 1
+                pooled = None
+            if pooled is None:
+                pooled = _PooledConnection(conn=self._connect(key))
+                with self._cond:
+                    self._stats["created"] += 1
+        except Exception:
+            self._release(key, None)
+            raise
+        return pooled
+
+    def _release(self, key: PoolKey, pooled: Optional[_PooledConnection]):
+        with self._cond:
+            self._in_use[key] -= 1
+            if pooled is not None:
+                pooled.last_used = time.monotonic()
+                self._idle.setdefault(key, []).append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, role: Optional[str] = None, warehouse: Optional[str] = None, fresh: bool = False):
+        """
+        Borrow a connection for the duration of a with block.
+
+        Connections that raise a session-expired error are closed instead of
+        being returned, so the next borrower gets a freshly authenticated one.
+        With fresh, idle connections are discarded and a new login is made.
+        """
+        key = self._key(role, warehouse)
+        pooled = self._acquire(key, fresh)
+        try:
+            yield pooled.conn
+        except Exception as e:
+            if is_session_expired(e) or pooled.conn.is_closed():
+                self._release(key, None)
+                self._close_quietly(pooled)
+            else:
+                self._release(key, pooled)
+            raise
+        else:
+            self._release(key, pooled)
+
+    def run(self, fn: Callable[[Any], Any], role: Optional[str] = None, warehouse: Optional[str] = None):
+        """
+        Call fn(conn) with a pooled connection, retrying once on a fresh
+        connection (new PAT login) if the session had expired.
+        """
+        try:
+            with self.connection(role, warehouse) as conn:
+                return fn(conn)
+        except Exception as e:
+            if not is_session_expired(e):
+                raise
+            print(f"🔑 Snowflake session expired, re-authenticating: {e}")
+            with self._cond:
+                self._stats["reauthenticated"] += 1
+            with self.connection(role, warehouse, fresh=True) as conn:
+                return fn(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters plus current utilization (in-use / capacity) per key."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["wait_time_avg"] = stats["wait_time_total"] / stats["acquired"] if stats["acquired"] else 0.0
+            stats["pools"] = {
+                f"{role}/{warehouse}": {
+                    "in_use": self._in_use.get((role, warehouse), 0),
+                    "idle": len(self._idle.get((role, warehouse), [])),
+                    "utilization": self._in_use.get((role, warehouse), 0) / self.max_size,
+                }
+                for role, warehouse in set(self._idle) | set(self._in_use)
+            }
+            return stats
+
+    def close(self):
+        """Close every idle connection."""
+        with self._cond:
+            idle = [pooled for pooled_list in self._idle.values() for pooled in pooled_list]
+            self._idle.clear()
+        for pooled in idle:
+            self._close_quietly(pooled)
@@ -0,0 +1,132 @@
+"""
+Result-set cache for the SQL behind agent answers.
+
+Identical SQL from different users (same role) is answered from memory
+instead of scanning FACT_LOANS again. Results are stored as compressed Arrow
+IPC streams, a compact columnar encoding, and evicted by TTL and LRU under a
+byte budget.
+"""
+
+import hashlib
+import threading
+from typing import Dict, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from response_cache import MemoryCacheBackend
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Canonical form of a SQL statement for cache keys.
+
+    Comments are removed, whitespace outside quoted literals/identifiers is
+    collapsed and trailing semicolons are dropped. Case is preserved because
+    string literals are case sensitive.
+    """
+    out = []
+    i, n = 0, len(sql or '')
+    pending_space = False
+    while i < n:
+        char = sql[i]
+        if char in ("'", '"'):
+            # Copy the quoted section verbatim ('' and "" are escaped quotes)
+            end = i + 1
+            while end < n:
+                if sql[end] == char:
+                    if end + 1 < n and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            if pending_space and out:
+                out.append(' ')
+            pending_space = False
+            out.append(sql[i:end + 1])
+            i = end + 1
+        elif sql.startswith('--', i):
+            newline = sql.find('\n', i)
+            i = n if newline == -1 else newline
+            pending_space = True
+        elif sql.startswith('/*', i):
+            close = sql.find('*/', i + 2)
+            i = n if close == -1 else close + 2
+            pending_space = True
+        elif char.isspace():
+            pending_space = True
+            i += 1
+        else:
+            if pending_space and out:
+                out.append(' ')
+            pending_space = False
+            out.append(char)
+            i += 1
+    return ''.join(out).rstrip(';').rstrip()
+
+
+def sql_cache_key(sql: str, role: Optional[str], max_rows: Optional[int] = None) -> str:
+    """Stable key for a (canonical SQL, role) pair, per fetched row window."""
+    return hashlib.sha256(
+        f"{role or ''}\x1f{max_rows or ''}\x1f{canonicalize_sql(sql)}".encode('utf-8')
+    ).hexdigest()
+
+
+class SQLResultCache:
+    """Cache of query results keyed by (canonicalized SQL text, role)."""
+
+    def __init__(self,
+            max_bytes: int = 128 * 1024 * 1024,
+            ttl: float = 10 * 60,
+            compression: Optional[str] = 'zstd'
+        ):
+        """
+        Args:
+            max_bytes: Budget for the encoded results; least recently used are evicted first
+            ttl: Seconds a result stays valid
+            compression: Arrow IPC buffer compression ('zstd', 'lz4' or None)
+        """
+        self.ttl = ttl
+        self.backend = MemoryCacheBackend(max_bytes=max_bytes)
+        self._write_options = pa.ipc.IpcWriteOptions(compression=compression)
+        self._stats = {"hits": 0, "misses": 0, "stores": 0}
+        self._lock = threading.Lock()
+
+    def get(self, sql: str, role: Optional[str], max_rows: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """Cached result as a DataFrame, or None."""
+        value = self.backend.get(sql_cache_key(sql, role, max_rows))
+        with self._lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+        if value is None:
+            return None
+        return pa.ipc.open_stream(pa.py_buffer(value)).read_all().to_pandas()
+
+    def set(self, sql: str, role: Optional[str], df: pd.DataFrame,
+            ttl: Optional[float] = None, max_rows: Optional[int] = None):
+        """Encode and store a result (df.attrs, e.g. total_rows, travel with it)."""
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"⚠️ Result not cacheable as Arrow: {e}")
+            return
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema, options=self._write_options) as writer:
+            writer.write_table(table)
+        self.backend.set(sql_cache_key(sql, role, max_rows), role, sink.getvalue().to_pybytes(),
+                         self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def invalidate_role(self, role: str) -> int:
+        """Drop every result cached for a role."""
+        return self.backend.delete_role(role)
+
+    def clear(self):
+        """Drop every cached result."""
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/store counters and current size."""
+        entries, size = self.backend.size()
+        with self._lock:
+            return dict(self._stats, entries=entries, bytes=size)
@@ -0,0 +1,270 @@
+"""
+Latency instrumentation for the request pipeline.
+
+Every stage (Slack event, agent connect, first event, first text delta,
+status phases, tool execution, stream end, SQL fetch, chart render, Slack
+post) is recorded as a span. Durations feed Prometheus-style histograms that
+can be scraped from /metrics. When the opentelemetry API is installed the
+same spans are also emitted as OpenTelemetry traces (exported by whatever
+SDK/exporter the deployment configures).
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # OpenTelemetry is optional
+    otel_trace = None
+
+# Seconds; spans range from sub-millisecond parsing to multi-minute agent calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label set."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[LabelKey, Dict[str, float]]:
+        """Count, sum and approximate p50/p95 per label set."""
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        result = {}
+        for key, values in series.items():
+            counts = values[:-1]
+            total = sum(counts)
+            result[key] = {
+                "count": total,
+                "sum": values[-1],
+                "p50": self._quantile(counts, total, 0.50),
+                "p95": self._quantile(counts, total, 0.95),
+            }
+        return result
+
+    def _quantile(self, counts: List[int], total: int, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf past the last bucket)."""
+        if not total:
+            return 0.0
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= q * total:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def render(self) -> List[str]:
+        """Prometheus text exposition lines."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in key)
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Telemetry:
+    """Span recorder backed by a latency histogram and, optionally, OpenTelemetry."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, use_otel: bool = True):
+        self.latency = Histogram(
+            "cortex_latency_seconds",
+            "Duration of each stage of the Slack -> agent -> Slack pipeline",
+            buckets
+        )
+        self.tracer = otel_trace.get_tracer("snowflake-intelligence") if (use_otel and otel_trace) else None
+
+    def observe(self, span: str, seconds: float, **labels):
+        """Record a duration measured elsewhere (e.g. time to first event)."""
+        self.latency.observe(seconds, span=span, **labels)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Time a block. Labels become histogram labels and span attributes.
+
+        Yields:
+            The OpenTelemetry span, or None when tracing is unavailable
+        """
+        started = time.perf_counter()
+        otel_span = None
+        if self.tracer is not None:
+            with self.tracer.start_as_current_span(
+                    f"cortex.{name}",
+                    attributes={key: str(value) for key, value in labels.items() if value is not None}) as otel_span:
+                try:
+                    yield otel_span
+                finally:
+                    self.observe(name, time.perf_counter() - started, **labels)
+            return
+        try:
+            yield otel_span
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def start_trace(self, name: str, **labels):
+        """Start a trace span that is ended explicitly (for async generators); None without tracing."""
+        if self.tracer is None:
+            return None
+        return self.tracer.start_span(
+            f"cortex.{name}",
+            attributes={key: str(value) for key, value in labels.items() if value is not None}
+        )
+
+    def event(self, otel_span, name: str, **attributes):
+        """Annotate the current trace span (no-op without OpenTelemetry)."""
+        if otel_span is not None:
+            otel_span.add_event(name, attributes={key: str(value) for key, value in attributes.items()})
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Count/sum/p50/p95 per span, keyed by 'span{label=value,...}'."""
+        result = {}
+        for key, stats in self.latency.snapshot().items():
+            labels = dict(key)
+            name = labels.pop("span", "")
+            extra = ",".join(f"{k}={v}" for k, v in labels.items())
+            result[f"{name}{{{extra}}}" if extra else name] = stats
+        return result
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text format."""
+        return "\n".join(self.latency.render()) + "\n"
+
+
+TELEMETRY = Telemetry()  # Process-wide recorder used by the modules
+
+
+class StreamTimer:
+    """
+    Milestones of one agent stream: connect, first event, first text delta,
+    each response.status phase, tool execution and stream end.
+    """
+
+    def __init__(self, telemetry: Telemetry = None, **labels):
+        self.telemetry = telemetry or TELEMETRY
+        self.labels = labels
+        self.started = time.perf_counter()
+        self.trace = self.telemetry.start_trace("agent.stream", **labels)
+        self._first_event = False
+        self._first_text = False
+        self._phase: Optional[Tuple[str, float]] = None
+        self._tool: Optional[Tuple[str, float]] = None
+
+    def _since(self, mark: float) -> float:
+        return time.perf_counter() - mark
+
+    def connected(self, status: int):
+        """Response headers received."""
+        self.telemetry.observe("agent_connect", self._since(self.started), **self.labels)
+        self.telemetry.event(self.trace, "connected", status=status)
+
+    def on_event(self, event_type: Optional[str], data: Dict):
+        """Feed every decoded stream event."""
+        now = time.perf_counter()
+        if not self._first_event:
+            self._first_event = True
+            self.telemetry.observe("agent_first_event", now - self.started, **self.labels)
+            self.telemetry.event(self.trace, "first_event")
+        if event_type == 'response.text.delta' and not self._first_text:
+            self._first_text = True
+            self.telemetry.observe("agent_first_text", now - self.started, **self.labels)
+            self.telemetry.event(self.trace, "first_text")
+        elif event_type == 'response.status':
+            self._end_phase(now)
+            phase = data.get('status') or 'other'  # Status codes only: messages would make unbounded label values
+            self._phase = (phase, now)
+            self.telemetry.event(self.trace, "status", phase=phase)
+        elif event_type == 'response.tool_use':
+            self._tool = (data.get('name') or data.get('type') or 'unknown', now)
+        elif event_type == 'response.tool_result':
+            tool, tool_started = self._tool or (data.get('name') or data.get('type') or 'unknown', self.started)
+            self.telemetry.observe("agent_tool", now - tool_started, tool=tool)
+            self.telemetry.event(self.trace, "tool_result", tool=tool)
+            self._tool = None
+
+    def _end_phase(self, now: float):
+        if self._phase is not None:
+            phase, phase_started = self._phase
+            self.telemetry.observe("agent_status_phase", now - phase_started, phase=phase)
+            self._phase = None
+
+    def finish(self, outcome: str = "ok"):
+        """Stream ended (outcome: 'ok', 'error' or 'cancelled')."""
+        self._end_phase(time.perf_counter())
+        self.telemetry.observe("agent_stream", self._since(self.started), outcome=outcome, **self.labels)
+        if self.trace is not None:
+            self.trace.set_attribute("outcome", outcome)
+            self.trace.end()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = TELEMETRY.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics on a daemon thread.
+
+    Args:
+        port: Port to listen on; defaults to METRICS_PORT and does nothing when unset
+
+    Returns:
+        The running server, or None when disabled
+    """
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0"))
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 Metrics on http://0.0.0.0:{port}/metrics")
+    return server